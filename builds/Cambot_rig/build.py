@@ -109,11 +109,9 @@ def run():
     #=========================
     # Antenna Rig Build
     #=========================
-    ant_up = antenna_setup('cn_antSide', 'cn_antSide_ctl', 'lf_antenna_jnt', aim=[0, 1, 0], up=[0, 0, 1])
-    cmds.parent(ant_up, 'cn_head_ctl')
-
-    ant_up = antenna_setup('cn_antRear', 'cn_antRear_ctl', 'lf_antennaRear_jnt', aim=[0, 1, 0], up=[0, 0, 1])
-    cmds.parent(ant_up, 'cn_head_ctl')
+    ant_ups = antenna_setups([('cn_antSide', 'cn_antSide_ctl', 'lf_antenna_jnt', [0, 1, 0], [0, 0, 1]),
+                              ('cn_antRear', 'cn_antRear_ctl', 'lf_antennaRear_jnt', [0, 1, 0], [0, 0, 1])])
+    cmds.parent(ant_ups, 'cn_head_ctl')
 
     # add_antenna_jiggle()
 
@@ -234,18 +232,19 @@ def antenna_setup(base_name, control, joint, aim=[0, 1, 0], up=[0, 0, 1]):
 
     antenna_setup('cn_antSide', 'cn_antSide_ctl', 'lf_antenna_jnt', aim=[0,1,0], up=[0,0,1])
     """
-    # Create up vectors
-    ant_up = cmds.spaceLocator(name='{}_up'.format(joint))[0]
-    cmds.parent(ant_up, joint)
-    cmds.setAttr('{}.translate'.format(ant_up), *up)
-    cmds.setAttr('{}.rotate'.format(ant_up), 0, 0, 0)
-    cmds.parent(ant_up, world=True)
-    cmds.hide(ant_up)
-
-    # Create aim constraints
-    cmds.aimConstraint(control, joint, wut='object', wuo=ant_up, aimVector=aim, upVector=up)
-
-    return ant_up
+    return antenna_setups([(base_name, control, joint, aim, up)])[0]
+
+
+def antenna_setups(antennas):
+    """Creates aim constraint antenna rigs of every antenna in one pass, see legs.create_aim_rigs()
+
+    antenna_setups([('cn_antSide', 'cn_antSide_ctl', 'lf_antenna_jnt', [0,1,0], [0,0,1])])
+    """
+    ant_ups = legs.create_aim_rigs([(control, joint, aim, up) for base_name, control, joint, aim, up in antennas])
+    if ant_ups:
+        cmds.hide(ant_ups)
+
+    return ant_ups
 
 
 def lock_channels():
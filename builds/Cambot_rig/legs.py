@@ -2,8 +2,24 @@
     Connect ik legs to skin legs
     Cleanup/restrict channels on controls and nodes
 
+    Legs are described in legs.json, any number of legs can be listed:
+
+        {"body_control": "cn_cog_ctl",
+         "legs": [{"name": "lf_legFront",
+                   "joints": ["lf_shoulderFront_jnt", "lf_legFrontUpper_jnt", "lf_legFrontLower_jnt",
+                              "lf_legFrontShin_jnt", "lf_legFrontToeTip_jnt"],
+                   "control": "lf_legFront_ctl",
+                   "shoulder_control": "lf_shoulderFront_ctl",
+                   "soft_ik_control": "lf_legFrontSoftIK_loc",
+                   "soft_ik": 10,
+                   "shin_twist": 90,
+                   "foot_pivots": [0.5, -0.5]}]}
+
 """
+import json
 import logging
+import os
+import timeit
 
 logging.basicConfig()
 LOG = logging.getLogger(__name__)
@@ -11,90 +27,163 @@ LOG.setLevel(logging.INFO)
 
 from maya import cmds
 
-from mechRig_toolkit.utils import utility as util
-reload(util)
-
 from mechRig_toolkit.utils import joints as jnt
 reload(jnt)
 
 from mechRig_toolkit.utils import ik
 reload(ik)
 
-# NODE NAMING VARIABLES
-MASTER_OFFSET = 'cn_masterOffset_ctl'
-COG = 'cn_cog_ctl'
-
-# SUFFIX VARIABLES
-GRP = '_grp'
-OFF = '_off'
-CTL = '_ctl'
+from mechRig_toolkit.utils import locator
+reload(locator)
 
+from mechRig_toolkit.utils import points
+reload(points)
 
-def rig_pistons():
-    """Rig all Cambot pistons"""
-    piston_up = piston_setup('lf_legFront', 'lf_legFrontLowerPiston_jnt', 'lf_legFrontUpperPiston_jnt',
-                                  aim=[0, 1, 0], up=[0, 0, 1])
-    cmds.parent(piston_up[0], 'lf_legFrontLower_ikj')
-    cmds.parent(piston_up[1], 'lf_legFrontUpper_ikj')
+from mechRig_toolkit.utils import chain
+reload(chain)
 
+from mechRig_toolkit.utils import orient
+reload(orient)
 
-    piston_up = piston_setup('rt_legFront', 'rt_legFrontLowerPiston_jnt', 'rt_legFrontUpperPiston_jnt',
-                                  aim=[0, -1, 0], up=[0, 0, -1])
-    cmds.parent(piston_up[0], 'rt_legFrontLower_ikj')
-    cmds.parent(piston_up[1], 'rt_legFrontUpper_ikj')
-    
-
-    piston_up = piston_setup('lf_legRear', 'lf_legRearLowerPiston_jnt', 'lf_legRearUpperPiston_jnt',
-                             aim=[0, -1, 0], up=[0, 0, -1])
-    cmds.parent(piston_up[0], 'lf_legRearLower_ikj')
-    cmds.parent(piston_up[1], 'lf_legRearUpper_ikj')
-    
-
-    piston_up = piston_setup('rt_legRear', 'rt_legRearLowerPiston_jnt', 'rt_legRearUpperPiston_jnt',
-                             aim=[0, 1, 0], up=[0, 0, 1])
-    cmds.parent(piston_up[0], 'rt_legRearLower_ikj')
-    cmds.parent(piston_up[1], 'rt_legRearUpper_ikj')
+# NODE NAMING VARIABLES
+MASTER_OFFSET = 'cn_masterOffset_ctl'
+COG = 'cn_cog_ctl'
 
+LEGS_FILE = os.path.join(os.path.dirname(__file__), 'legs.json')
 
-def rig_legs():
-    """Rig all Cambot legs"""
-    sides = ['lf', 'rt']
-    dirs = ['Front', 'Rear']
+# Soft IK implementation, 'network' utility nodes or the single 'node' plug-in node, see ik.add_softIK
+SOFT_IK_METHOD = 'network'
 
-    for side in sides:
+# Pistons as (base_name, pistonA, pistonB, aim, up, pistonA_up parent, pistonB_up parent)
+PISTONS = [('lf_legFront', 'lf_legFrontLowerPiston_jnt', 'lf_legFrontUpperPiston_jnt', [0, 1, 0], [0, 0, 1],
+            'lf_legFrontLower_ikj', 'lf_legFrontUpper_ikj'),
+           ('rt_legFront', 'rt_legFrontLowerPiston_jnt', 'rt_legFrontUpperPiston_jnt', [0, -1, 0], [0, 0, -1],
+            'rt_legFrontLower_ikj', 'rt_legFrontUpper_ikj'),
+           ('lf_legRear', 'lf_legRearLowerPiston_jnt', 'lf_legRearUpperPiston_jnt', [0, -1, 0], [0, 0, -1],
+            'lf_legRearLower_ikj', 'lf_legRearUpper_ikj'),
+           ('rt_legRear', 'rt_legRearLowerPiston_jnt', 'rt_legRearUpperPiston_jnt', [0, 1, 0], [0, 0, 1],
+            'rt_legRearLower_ikj', 'rt_legRearUpper_ikj')]
 
-        for dir in dirs:
-            shoulder_setup('{}_shoulder{}_ctl'.format(side, dir), '{}_shoulder{}_jnt'.format(side, dir))
+# SUFFIX VARIABLES
+GRP = '_grp'
+OFF = '_off'
+CTL = '_ctl'
 
-            leg_joints = ['{}_shoulder{}_jnt'.format(side, dir), '{}_leg{}Upper_jnt'.format(side, dir),
-                          '{}_leg{}Lower_jnt'.format(side, dir), '{}_leg{}Shin_jnt'.format(side, dir),
-                          '{}_leg{}ToeTip_jnt'.format(side, dir)]
 
-            leg_setup('{}_leg{}'.format(side, dir), leg_joints, '{}_leg{}_ctl'.format(side, dir),
-                           shin_poleVectorTwist=90)
+def rig_pistons(pistons=PISTONS):
+    """Rig all Cambot pistons in one batch, then parent the up locators under the IK joints"""
+    piston_ups = create_pistons([piston[:5] for piston in pistons])
+    for piston, piston_up in zip(pistons, piston_ups):
+        cmds.parent(piston_up[0], piston[5])
+        cmds.parent(piston_up[1], piston[6])
 
-            connect_leg_to_shoulder('{}_leg{}'.format(side, dir), '{}_leg{}_ctl'.format(side, dir),
-                                         '{}_shoulder{}_ctl'.format(side, dir), '{}_shoulder{}_ikj'.format(side, dir))
 
-            connect_leg_to_body('{}_leg{}'.format(side, dir), '{}_leg{}_ctl'.format(side, dir), 'cn_cog_ctl')
+def read_leg_table(path):
+    """Returns the leg description table of a JSON legs file, see the module docstring"""
+    with open(path, 'r') as f:
+        return json.loads(f.read())
 
-            orient_constrain_chain(leg_joints, source_suffix='_jnt', target_suffix='_ikj')
 
-            cmds.hide('{}_shoulder{}_ikj'.format(side, dir))
+def get_leg_nodes(leg):
+    """Returns the scene nodes a leg description needs before its leg can be built"""
+    return leg['joints'] + [leg['control'], leg['shoulder_control'], leg['soft_ik_control']]
 
-            # Add leg softIK
-            ik.add_softIK('{}_leg{}Upper_ikh'.format(side, dir), '{}_leg{}SoftIK_loc'.format(side, dir), '{}_leg{}'.format(side, dir))
-            cmds.setAttr('{}_leg{}SoftIK_loc.softIk'.format(side, dir), 10)
 
-            LOG.info('Successfully rigged leg:  {}'.format('{}_leg{}'.format(side, dir)))
+def rig_legs(path=LEGS_FILE, soft_ik_method=SOFT_IK_METHOD):
+    """Rig every leg described in the legs file, Cambot's legs by default
 
-    # Set shin ik twists to keep shin joints zeroed
-    cmds.setAttr("lf_legFrontLower_ikh.twist", 90)
-    cmds.setAttr("lf_legRearLower_ikh.twist", 180)
-    cmds.setAttr("rt_legRearLower_ikh.twist", 180)
-    cmds.setAttr("rt_legFrontLower_ikh.twist", 180)
+    Every node the table refers to is resolved with a single ls before anything is built, then
+    the legs are built together with build_legs().  Build time, node count and time per leg are
+    logged.
 
+    Args:
+        soft_ik_method:     'network' or 'node', see ik.add_softIK()
 
+    Returns:
+        {phase: seconds}, see build_legs()
+    """
+    table = read_leg_table(path)
+    body_control = table.get('body_control', COG)
+    legs = table['legs']
+
+    required = [body_control]
+    for leg in legs:
+        required.extend(get_leg_nodes(leg))
+    existing = set(cmds.ls(required))
+    missing = [node for node in required if node not in existing]
+    if missing:
+        LOG.error('Cannot rig legs, missing nodes: {}'.format(', '.join(sorted(set(missing)))))
+        return None
+
+    num_nodes = len(cmds.ls())
+    timings = build_legs(legs, body_control, soft_ik_method=soft_ik_method)
+    total = sum(timings.values())
+    LOG.info('Rigged {} legs ({} nodes, {:.3f}s, {:.3f}s per leg)'.format(len(legs), len(cmds.ls()) - num_nodes,
+                                                                          total, total / max(len(legs), 1)))
+    return timings
+
+
+def build_legs(legs, body_control=COG, soft_ik_method=SOFT_IK_METHOD):
+    """Rig many legs from their leg descriptions, each phase is done for every leg before the next
+
+    IK chains, pole vectors and foot pivots are built for all legs at once by leg_setups(), so
+    build time grows linearly with the number of legs.  The other phases run leg by leg and are
+    timed per leg, the batched phase can only be timed as a whole and is logged as an equal share
+    per leg.
+
+    Returns:
+        {phase: seconds}
+
+    Example:
+        build_legs(read_leg_table(LEGS_FILE)['legs'])
+    """
+    timings = dict((phase, 0.0) for phase in ('shoulders', 'ik legs', 'connections', 'soft ik'))
+    leg_times = dict((leg['name'], 0.0) for leg in legs)
+
+    for leg in legs:
+        start = timeit.default_timer()
+        shoulder_setup(leg['shoulder_control'], leg['joints'][0])
+        leg_times[leg['name']] += timeit.default_timer() - start
+    timings['shoulders'] = sum(leg_times.values())
+
+    start = timeit.default_timer()
+    shoulder_ikjs = leg_setups(legs)
+    timings['ik legs'] = timeit.default_timer() - start
+
+    for leg, shoulder_ikj in zip(legs, shoulder_ikjs):
+        start = timeit.default_timer()
+        connect_leg_to_shoulder(leg['name'], leg['control'], leg['shoulder_control'], shoulder_ikj)
+        connect_leg_to_body(leg['name'], leg['control'], body_control)
+        orient_constrain_chain(leg['joints'], source_suffix='_jnt', target_suffix='_ikj')
+        cmds.hide(shoulder_ikj)
+        elapsed = timeit.default_timer() - start
+        leg_times[leg['name']] += elapsed
+        timings['connections'] += elapsed
+
+    # Add leg softIK
+    for leg in legs:
+        start = timeit.default_timer()
+        ik.add_softIK('{}Upper_ikh'.format(leg['name']), leg['soft_ik_control'], leg['name'], method=soft_ik_method)
+        cmds.setAttr('{}.softIk'.format(leg['soft_ik_control']), leg.get('soft_ik', 10))
+        elapsed = timeit.default_timer() - start
+        leg_times[leg['name']] += elapsed
+        timings['soft ik'] += elapsed
+
+    for phase in ('shoulders', 'ik legs', 'connections', 'soft ik'):
+        LOG.info('Rigged leg {:<12} {:.3f}s'.format(phase, timings[phase]))
+    ik_share = timings['ik legs'] / max(len(legs), 1)
+    for leg in legs:
+        LOG.info('Rigged leg {}: {:.3f}s, {:.3f}s with its share of the batched ik legs phase'.format(
+            leg['name'], leg_times[leg['name']], leg_times[leg['name']] + ik_share))
+    return timings
+
+
+def rig_leg(leg, body_control=COG):
+    """Rig one leg from its leg description, see build_legs()
+
+    rig_leg(read_leg_table(LEGS_FILE)['legs'][0])
+    """
+    return build_legs([leg], body_control)
 
 
 def leg_shoulder_setup(base_name, shoulder_control, shoulder_joint, foot_control, side='lf',
@@ -126,56 +215,112 @@ def shoulder_setup(shoulder_control, shoulder_joint):
 
 
 def leg_setup(base_name, leg_joints, foot_control, side='lf', foot_pivots=[0.5, -0.5], shin_poleVectorTwist=180):
-    """
+    """Builds the IK leg of one leg, see leg_setups()
+
     leg_joints = ['lf_frontShoulder_jnt', 'lf_frontUpperLeg_jnt', 'lf_frontLowerLeg_jnt', 'lf_frontShin_jnt', 'lf_frontToeTip_jnt']
     leg_setup('lf_legFront', leg_joints, 'lf_legFront_ctl', shin_poleVectorTwist=90)
     """
-    dir = 1
-    leg_pos = cmds.xform(leg_joints[0], q=True, ws=True, t=True)
-    if leg_pos[2] < 0:
-        dir = -1
-
-    # Create IK joint chain
-    ik_jnts = jnt.duplicate_joint_chain(leg_joints[0], search='_jnt', replace='_ikj')
-
-    # Create Leg IK and Pole Vector
-    leg_ik = cmds.ikHandle(startJoint=leg_joints[1].replace('_jnt', '_ikj'), ee=leg_joints[3].replace('_jnt', '_ikj'),
-                           name='{}Upper_ikh'.format(base_name), solver='ikRPsolver')
-    leg_pv = cmds.spaceLocator(name='{}UpperPV_ctl'.format(base_name))[0]
-    ik.create_pole_vector(leg_pv, leg_ik[0])
-
-    # Create Shin IK and Pole Vector
-    shin_ik = cmds.ikHandle(startJoint=leg_joints[3].replace('_jnt', '_ikj'), ee=leg_joints[4].replace('_jnt', '_ikj'),
-                            name='{}Lower_ikh'.format(base_name), solver='ikRPsolver')
-    shin_pv = cmds.spaceLocator(name='{}LowerPV_ctl'.format(base_name))[0]
-    util.match(shin_pv, leg_joints[3].replace('_jnt', '_ikj'))
-    cmds.parent(shin_pv, leg_joints[3].replace('_jnt', '_ikj'))
-    cmds.select(shin_pv)
-    cmds.move(0, 0, (10*dir), relative=True)
-    cmds.parent(shin_pv, world=True)
-    cmds.poleVectorConstraint(shin_pv, shin_ik[0])[0]
-    cmds.setAttr('{}.twist'.format(shin_ik[0]), shin_poleVectorTwist)
+    leg = {'name': base_name, 'joints': leg_joints, 'control': foot_control, 'foot_pivots': foot_pivots,
+           'shin_twist': shin_poleVectorTwist}
+    return leg_setups([leg])[0]
 
-    # Foot Pivots
-    foot_piv_grp = cmds.duplicate(foot_control, parentOnly=True, name=foot_control.replace(CTL, 'Pivot_grp'))[0]
-    foot_piv_front = cmds.duplicate(foot_control, parentOnly=True, name=foot_control.replace(CTL, 'FrontPivot_grp'))[0]
-    foot_piv_rear = cmds.duplicate(foot_control, parentOnly=True, name=foot_control.replace(CTL, 'RearPivot_grp'))[0]
-    cmds.setAttr('{}.translateZ'.format(foot_piv_front), foot_pivots[0])
-    cmds.setAttr('{}.translateZ'.format(foot_piv_rear), foot_pivots[1])
-    cmds.pointConstraint(foot_control, foot_piv_grp)
-    cmds.parent(foot_piv_front, foot_piv_grp)
-    cmds.parent(foot_piv_rear, foot_piv_front)
 
-    cmds.parent(leg_ik[0], leg_pv.replace('_ctl', '_grp'), shin_ik[0], shin_pv, foot_piv_rear)
-    cmds.hide(foot_piv_rear)
+def duplicate_transforms(nodes, names):
+    """Duplicates nodes without their children with a single duplicate call and renames the copies
 
-    # Foot Pivot Rotation Limits
-    cmds.connectAttr('{}.rotateX'.format(foot_control), '{}.rotateX'.format(foot_piv_front))
-    cmds.connectAttr('{}.rotateX'.format(foot_control), '{}.rotateX'.format(foot_piv_rear))
-    cmds.transformLimits(foot_piv_front, rx=[0, 45], erx=[1, 0])
-    cmds.transformLimits(foot_piv_rear, rx=[-45, 0], erx=[0, 1])
+    duplicate_transforms(['lf_legFront_ctl', 'rt_legFront_ctl'], ['lf_legFrontPivot_grp', 'rt_legFrontPivot_grp'])
+    """
+    copies = cmds.duplicate(nodes, parentOnly=True)
+    return [cmds.rename(copy, name) for copy, name in zip(copies, names)]
 
-    return ik_jnts[0]
+
+def leg_setups(legs):
+    """Builds the IK chains, IK handles, pole vectors and foot pivots of many legs in one pass
+
+    Upper pole vectors are placed with ik.create_pole_vectors(), shin pole vectors are created
+    with a single locator.create_locators() call and each kind of foot pivot group with a single
+    duplicate, instead of one node at a time per leg.
+
+    Args:
+        legs:   Leg descriptions, see the module docstring
+
+    Returns:
+        IK shoulder joint of every leg
+
+    Example:
+        leg_setups(read_leg_table(LEGS_FILE)['legs'])
+    """
+    # Create IK joint chains
+    ik_jnts = [jnt.duplicate_joint_chain(leg['joints'][0], search='_jnt', replace='_ikj')[0] for leg in legs]
+    ikj_joints = [[joint.replace('_jnt', '_ikj') for joint in leg['joints']] for leg in legs]
+
+    # Create Leg and Shin IK
+    leg_iks = list()
+    shin_iks = list()
+    for leg, ikjs in zip(legs, ikj_joints):
+        leg_iks.append(cmds.ikHandle(startJoint=ikjs[1], ee=ikjs[3], name='{}Upper_ikh'.format(leg['name']),
+                                     solver='ikRPsolver')[0])
+        shin_iks.append(cmds.ikHandle(startJoint=ikjs[3], ee=ikjs[4], name='{}Lower_ikh'.format(leg['name']),
+                                      solver='ikRPsolver')[0])
+
+    # Leg Pole Vectors, "lf_legFrontUpper_ikh" -> "lf_legFrontUpperPV_ctl".  Kept at create_pole_vector()'s
+    # distance from the mid joint, the start to end midpoint's distance mirrored past it.  Both lie in
+    # the chain plane so the default pose is unchanged, but the controls now sit along the mid joint's
+    # projection onto the start to end line and aim X at the mid joint with Z towards the handle
+    chain_positions = list(points.iter_points(points.get_positions([joint for ikjs in ikj_joints
+                                                                    for joint in ikjs[1:4]])))
+    pv_distances = list()
+    for i in range(len(legs)):
+        start_pos, mid_pos, end_pos = chain_positions[i * 3:i * 3 + 3]
+        center = [(start_pos[j] + end_pos[j]) * 0.5 for j in range(3)]
+        pv_distances.append(orient.length(orient.subtract(mid_pos, center)))
+    leg_pvs = ik.create_pole_vectors(leg_iks, distance=pv_distances)
+
+    # Shin Pole Vectors, at the shin joint with its rotation, moved 10 units away from the body in world Z
+    shoulder_positions = points.iter_points(points.get_positions([leg['joints'][0] for leg in legs]))
+    shin_matrices = chain.get_chain_data([ikjs[3] for ikjs in ikj_joints])['matrices']
+    positions = list()
+    rotations = list()
+    for shoulder_pos, mtx in zip(shoulder_positions, shin_matrices):
+        dir = -1 if shoulder_pos[2] < 0 else 1
+        positions.extend([mtx[12], mtx[13], mtx[14] + 10 * dir])
+        rotations.extend(orient.matrix_to_euler_xyz(orient.rotation_matrix(mtx)))
+    shin_pvs = locator.create_locators(positions, rotations=rotations,
+                                       names=['{}LowerPV_ctl'.format(leg['name']) for leg in legs])
+    for leg, shin_ik, shin_pv in zip(legs, shin_iks, shin_pvs):
+        cmds.poleVectorConstraint(shin_pv, shin_ik)
+        cmds.setAttr('{}.twist'.format(shin_ik), leg.get('shin_twist', 180))
+
+    # Foot Pivots
+    foot_controls = [leg['control'] for leg in legs]
+    foot_piv_grps = duplicate_transforms(foot_controls, [ctl.replace(CTL, 'Pivot_grp') for ctl in foot_controls])
+    foot_piv_fronts = duplicate_transforms(foot_controls, [ctl.replace(CTL, 'FrontPivot_grp') for ctl in foot_controls])
+    foot_piv_rears = duplicate_transforms(foot_controls, [ctl.replace(CTL, 'RearPivot_grp') for ctl in foot_controls])
+
+    for i, leg in enumerate(legs):
+        foot_control = foot_controls[i]
+        foot_piv_grp, foot_piv_front, foot_piv_rear = foot_piv_grps[i], foot_piv_fronts[i], foot_piv_rears[i]
+        foot_pivots = leg.get('foot_pivots', [0.5, -0.5])
+        cmds.setAttr('{}.translateZ'.format(foot_piv_front), foot_pivots[0])
+        cmds.setAttr('{}.translateZ'.format(foot_piv_rear), foot_pivots[1])
+        cmds.pointConstraint(foot_control, foot_piv_grp)
+        cmds.parent(foot_piv_front, foot_piv_grp)
+        cmds.parent(foot_piv_rear, foot_piv_front)
+
+        # Straight legs have no leg pole vector
+        ik_nodes = [leg_iks[i], shin_iks[i], shin_pvs[i]]
+        if leg_pvs and leg_pvs[i]:
+            ik_nodes.append(cmds.listRelatives(leg_pvs[i], parent=True)[0])
+        cmds.parent(ik_nodes, foot_piv_rear)
+        cmds.hide(foot_piv_rear)
+
+        # Foot Pivot Rotation Limits
+        cmds.connectAttr('{}.rotateX'.format(foot_control), '{}.rotateX'.format(foot_piv_front))
+        cmds.connectAttr('{}.rotateX'.format(foot_control), '{}.rotateX'.format(foot_piv_rear))
+        cmds.transformLimits(foot_piv_front, rx=[0, 45], erx=[1, 0])
+        cmds.transformLimits(foot_piv_rear, rx=[-45, 0], erx=[0, 1])
+
+    return ik_jnts
 
 
 def connect_leg_to_shoulder(base_name, leg_control, shoulder_control, leg_ik_joint):
@@ -215,29 +360,67 @@ def connect_leg_to_body(base_name, leg_control, body_control):
     cmds.parent(leg_grp, MASTER_OFFSET)
 
 
+def create_aim_rigs(aim_rigs):
+    """Creates aim constraint rigs with object up locators in one pass
+
+    Up locators are placed at each constrained node's local up vector offset with
+    locator.create_up_locators(), computed from the nodes' world matrices instead of a
+    parent/set/unparent round trip per locator.  Node count and build time are logged.
+
+    Args:
+        aim_rigs:   List of (target, node, aim, up), node is aim constrained to target using its
+                    up locator as world up object
+
+    Returns:
+        List of up locators, one per aim rig
+
+    Example:
+        create_aim_rigs([('cn_antSide_ctl', 'lf_antenna_jnt', [0, 1, 0], [0, 0, 1])])
+    """
+    if not aim_rigs:
+        return list()
+
+    num_nodes = len(cmds.ls())
+    start = timeit.default_timer()
+
+    nodes = [aim_rig[1] for aim_rig in aim_rigs]
+    up_locs = locator.create_up_locators(nodes, [aim_rig[3] for aim_rig in aim_rigs])
+
+    for (target, node, aim, up), up_loc in zip(aim_rigs, up_locs):
+        cmds.aimConstraint(target, node, wut='object', wuo=up_loc, aimVector=aim, upVector=up)
+    cmds.select(clear=True)
+
+    LOG.info('Created {} aim rigs ({} nodes, {:.3f}s)'.format(len(aim_rigs), len(cmds.ls()) - num_nodes,
+                                                              timeit.default_timer() - start))
+    return up_locs
+
+
+def create_pistons(pistons):
+    """Creates aim constraint piston rigs of every piston pair in one pass, see create_aim_rigs()
+
+    Args:
+        pistons:    List of (base_name, pistonA, pistonB, aim, up)
+
+    Returns:
+        List of [pistonA_up, pistonB_up] per piston
+
+    Example:
+        create_pistons([('lf_legFront', 'lf_legFrontLowerPiston_jnt', 'lf_legFrontUpperPiston_jnt', [0, 1, 0], [0, 0, 1])])
+    """
+    aim_rigs = list()
+    for base_name, pistonA, pistonB, aim, up in pistons:
+        aim_rigs.append((pistonB, pistonA, aim, up))
+        aim_rigs.append((pistonA, pistonB, aim, up))
+    up_locs = create_aim_rigs(aim_rigs)
+    return [up_locs[i:i + 2] for i in range(0, len(up_locs), 2)]
+
+
 def piston_setup(base_name, pistonA, pistonB, aim=[0, 1, 0], up=[0, 0, 1]):
     """Creates aim constraint piston rig
 
     piston_setup('lf_legFront', 'lf_legFrontLowerPiston_jnt', 'lf_legFrontUpperPiston_jnt', aim=[0,1,0], up=[0,0,1])
     """
-    # Create up vectors
-    pistonA_up = cmds.spaceLocator(name='{}_up'.format(pistonA))[0]
-    cmds.parent(pistonA_up, pistonA)
-    cmds.setAttr('{}.translate'.format(pistonA_up), *up)
-    cmds.setAttr('{}.rotate'.format(pistonA_up), 0, 0, 0)
-    cmds.parent(pistonA_up, world=True)
-
-    pistonB_up = cmds.spaceLocator(name='{}_up'.format(pistonB))[0]
-    cmds.parent(pistonB_up, pistonB)
-    cmds.setAttr('{}.translate'.format(pistonB_up), *up)
-    cmds.setAttr('{}.rotate'.format(pistonB_up), 0, 0, 0)
-    cmds.parent(pistonB_up, world=True)
-
-    # Create aim constraints
-    cmds.aimConstraint(pistonB, pistonA, wut='object', wuo=pistonA_up, aimVector=aim, upVector=up)
-    cmds.aimConstraint(pistonA, pistonB, wut='object', wuo=pistonB_up, aimVector=aim, upVector=up)
-
-    return [pistonA_up, pistonB_up]
+    return create_pistons([(base_name, pistonA, pistonB, aim, up)])[0]
 
 
 def orient_constrain_chain(source_chain, source_suffix='_jnt', target_suffix='_ikj'):
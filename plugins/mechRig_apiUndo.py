@@ -0,0 +1,56 @@
+"""
+mechRig_apiUndo.py
+
+Python API 2.0 plug-in with the mechRigApiUndo command, which puts API edits on Maya's undo
+queue.  Not called directly, see utils/apiundo.py.
+
+Loaded by apiundo.load_plugin(), or manually:
+
+    cmds.loadPlugin('<mechRig_toolkit>/plugins/mechRig_apiUndo.py')
+
+"""
+from maya.api import OpenMaya as om
+
+from mechRig_toolkit.utils import apiundo
+
+
+def maya_useNewAPI():
+    """Tells Maya this plug-in uses the Python API 2.0"""
+    pass
+
+
+class ApiUndoCommand(om.MPxCommand):
+    """Records the (undo, redo) pair passed to apiundo.commit(), the edit itself is already done"""
+
+    NAME = 'mechRigApiUndo'
+
+    def __init__(self):
+        om.MPxCommand.__init__(self)
+        self.undo = None
+        self.redo = None
+
+    @staticmethod
+    def creator():
+        return ApiUndoCommand()
+
+    def doIt(self, args):
+        self.undo, self.redo = apiundo.pop_pending()
+
+    def redoIt(self):
+        self.redo()
+
+    def undoIt(self):
+        self.undo()
+
+    def isUndoable(self):
+        return True
+
+
+def initializePlugin(plugin):
+    fn_plugin = om.MFnPlugin(plugin, 'mechRig_toolkit', '1.0')
+    fn_plugin.registerCommand(ApiUndoCommand.NAME, ApiUndoCommand.creator)
+
+
+def uninitializePlugin(plugin):
+    fn_plugin = om.MFnPlugin(plugin)
+    fn_plugin.deregisterCommand(ApiUndoCommand.NAME)
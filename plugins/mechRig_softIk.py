@@ -0,0 +1,127 @@
+"""
+mechRig_softIk.py
+
+Python API 2.0 plug-in with a single node computing ik.add_softIK()'s soft IK, in place of the
+utility node network and its two point constrained transforms.
+
+    mechRigSoftIk node
+        startParentMatrix, startTranslate:  parentMatrix and translate of the first IK joint, the
+                                            joint's own worldMatrix would create a cycle with the IK solve
+        endMatrix:                          worldMatrix of the IK control
+        chainLength, tipLength, softIk, negate
+        -> distance, softValue, effectorTranslate
+
+    distance is measured in the IK control's space, as the network measures it between two
+    transforms parented under the control.
+
+Loaded by ik.load_softIK_plugin(), or manually:
+
+    cmds.loadPlugin('<mechRig_toolkit>/plugins/mechRig_softIk.py')
+
+"""
+from maya.api import OpenMaya as om
+
+from mechRig_toolkit.utils import softik
+
+
+def maya_useNewAPI():
+    """Tells Maya this plug-in uses the Python API 2.0"""
+    pass
+
+
+class SoftIkNode(om.MPxNode):
+    """Soft IK end effector translate, the math of softik.end_effector() in double precision"""
+
+    NAME = 'mechRigSoftIk'
+    ID = om.MTypeId(0x0007F3A1)  # Local use id range, register an id block before sharing rigs
+
+    start_parent_matrix = None
+    start_translate = None
+    end_matrix = None
+    chain_length = None
+    tip_length = None
+    soft_ik = None
+    negate = None
+
+    distance = None
+    soft_value = None
+    effector_translate = None
+
+    @staticmethod
+    def creator():
+        return SoftIkNode()
+
+    @staticmethod
+    def initialize():
+        fn_matrix = om.MFnMatrixAttribute()
+        fn_numeric = om.MFnNumericAttribute()
+
+        SoftIkNode.start_parent_matrix = fn_matrix.create('startParentMatrix', 'spm')
+        SoftIkNode.end_matrix = fn_matrix.create('endMatrix', 'em')
+
+        SoftIkNode.start_translate = fn_numeric.create('startTranslate', 'st', om.MFnNumericData.k3Double)
+
+        SoftIkNode.chain_length = fn_numeric.create('chainLength', 'cl', om.MFnNumericData.kDouble, 0.0)
+        fn_numeric.keyable = True
+        SoftIkNode.tip_length = fn_numeric.create('tipLength', 'tl', om.MFnNumericData.kDouble, 0.0)
+        fn_numeric.keyable = True
+        SoftIkNode.soft_ik = fn_numeric.create('softIk', 'sik', om.MFnNumericData.kDouble, 0.0)
+        fn_numeric.setMin(softik.SOFT_IK_MIN)
+        fn_numeric.setMax(softik.SOFT_IK_MAX)
+        fn_numeric.keyable = True
+        SoftIkNode.negate = fn_numeric.create('negate', 'neg', om.MFnNumericData.kBoolean, False)
+
+        SoftIkNode.distance = fn_numeric.create('distance', 'd', om.MFnNumericData.kDouble, 0.0)
+        fn_numeric.writable = False
+        fn_numeric.storable = False
+        SoftIkNode.soft_value = fn_numeric.create('softValue', 'sv', om.MFnNumericData.kDouble, softik.SOFT_MIN)
+        fn_numeric.writable = False
+        fn_numeric.storable = False
+        SoftIkNode.effector_translate = fn_numeric.create('effectorTranslate', 'et', om.MFnNumericData.kDouble, 0.0)
+        fn_numeric.writable = False
+        fn_numeric.storable = False
+
+        inputs = [SoftIkNode.start_parent_matrix, SoftIkNode.start_translate, SoftIkNode.end_matrix,
+                  SoftIkNode.chain_length, SoftIkNode.tip_length, SoftIkNode.soft_ik, SoftIkNode.negate]
+        outputs = [SoftIkNode.distance, SoftIkNode.soft_value, SoftIkNode.effector_translate]
+        for attr in inputs + outputs:
+            SoftIkNode.addAttribute(attr)
+        for attr in inputs:
+            for output in outputs:
+                SoftIkNode.attributeAffects(attr, output)
+
+    def compute(self, plug, data):
+        if plug not in (SoftIkNode.distance, SoftIkNode.soft_value, SoftIkNode.effector_translate):
+            return None
+
+        start_parent = data.inputValue(SoftIkNode.start_parent_matrix).asMatrix()
+        start = om.MPoint(data.inputValue(SoftIkNode.start_translate).asDouble3()) * start_parent
+        end_mtx = data.inputValue(SoftIkNode.end_matrix).asMatrix()
+        end = om.MPoint(end_mtx.getElement(3, 0), end_mtx.getElement(3, 1), end_mtx.getElement(3, 2))
+
+        # Measured in the IK control's space like the network's transforms parented under it, so
+        # scaling the control or its parents gives the same result
+        end_inverse = end_mtx.inverse()
+        dist = (start * end_inverse).distanceTo(end * end_inverse)
+
+        soft_ik = data.inputValue(SoftIkNode.soft_ik).asDouble()
+        effector = softik.end_effector(dist, soft_ik,
+                                       data.inputValue(SoftIkNode.chain_length).asDouble(),
+                                       data.inputValue(SoftIkNode.tip_length).asDouble(),
+                                       negative=data.inputValue(SoftIkNode.negate).asBool(), precise=True)
+
+        data.outputValue(SoftIkNode.distance).setDouble(dist)
+        data.outputValue(SoftIkNode.soft_value).setDouble(softik.soft_value(soft_ik, precise=True))
+        data.outputValue(SoftIkNode.effector_translate).setDouble(effector)
+        for output in (SoftIkNode.distance, SoftIkNode.soft_value, SoftIkNode.effector_translate):
+            data.setClean(output)
+
+
+def initializePlugin(plugin):
+    fn_plugin = om.MFnPlugin(plugin, 'mechRig_toolkit', '1.0')
+    fn_plugin.registerNode(SoftIkNode.NAME, SoftIkNode.ID, SoftIkNode.creator, SoftIkNode.initialize)
+
+
+def uninitializePlugin(plugin):
+    fn_plugin = om.MFnPlugin(plugin)
+    fn_plugin.deregisterNode(SoftIkNode.ID)
@@ -9,84 +9,496 @@ import os
 # Import Maya modules
 import maya.cmds as cmds
 import maya.OpenMaya as api
+from maya.api import OpenMaya as om
+
+from mechRig_toolkit.utils import anim
+reload(anim)
 
 #from rigging_utils import common, app, transform, attribute
 
 SPACEATTR = 'spaces'
+BACKENDS = ('constraint', 'matrix')
+TRANSFORM_ATTRS = ('tx', 'ty', 'tz', 'rx', 'ry', 'rz')
 
 # Load plug-in dependencies
 if not cmds.pluginInfo('matrixNodes', q=True, loaded=True):
     cmds.loadPlugin('matrixNodes', quiet=True)
 
+# Attribute changes that alter a space network, anything else (setAttr, keys) is ignored by the index
+ATTR_CHANGES = (api.MNodeMessage.kAttributeAdded | api.MNodeMessage.kAttributeRemoved |
+                api.MNodeMessage.kAttributeRenamed)
+CONNECTION_CHANGES = api.MNodeMessage.kConnectionMade | api.MNodeMessage.kConnectionBroken
+NETWORK_ATTRS = ('message', 'spaceNode', 'spaceGrp', 'spaceConstraint', 'spaceSwitch', 'space_network')
+
+# Space network index, built once per rig namespace by scanning the message attributes
+# {namespace: {'controls': {spaceSwitch: network},
+#              'spaceNodes': {spaceNode: network},
+#              'spaceNetworks': {ctrl: space_network main ctrl, the main ctrl maps to itself},
+#              'spaceNetworkMembers': {main ctrl: [ctrls connected to its space_network]}}}
+# network: {'spaceSwitch', 'spaceNode', 'spaceGrp', 'spaceConstraint', 'backend', 'spaces': [enum names],
+#           'targets': [space target transforms, in enum order]}
+# Matrix backend networks have no spaceGrp, their spaceConstraint is the choice node selecting the target
+_SPACE_INDEX = dict()
+
+# Callback ids survive reload() of this module so callbacks are never registered twice
+try:
+    _SCENE_CALLBACK_IDS
+    _NODE_CALLBACK_IDS
+except NameError:
+    _SCENE_CALLBACK_IDS = list()
+    _NODE_CALLBACK_IDS = dict()
+
+
+def getNamespace(node):
+    """Returns the rig namespace of a node name, '' for the root namespace"""
+    return node.split('|')[-1].rpartition(':')[0]
+
+
+def clearSpaceIndex(*args):
+    """Clears the whole space network index, also used as the scene callback"""
+    _SPACE_INDEX.clear()
+
+
+def invalidateSpaceIndex(node):
+    """Drops the indexed rig of node, it is rebuilt by the next lookup"""
+    _SPACE_INDEX.pop(getNamespace(node), None)
+
+
+def _onNodeChanged(*args):
+    """Node deleted/renamed callback, clientData is the namespace of the indexed rig"""
+    _SPACE_INDEX.pop(args[-1], None)
+
+
+def _onAttributeChanged(msg, plug, otherPlug, namespace):
+    """Attribute changed callback, attribute edits and message connection edits invalidate the rig"""
+    if msg & ATTR_CHANGES:
+        _SPACE_INDEX.pop(namespace, None)
+    elif msg & CONNECTION_CHANGES and api.MFnAttribute(plug.attribute()).name() in NETWORK_ATTRS:
+        # Keying a control connects anim curves, those connections keep the index
+        _SPACE_INDEX.pop(namespace, None)
+
+
+def _removeNodeCallbacks(namespace):
+    """Removes the node callbacks registered when the namespace was indexed"""
+    for callbackId in _NODE_CALLBACK_IDS.pop(namespace, list()):
+        api.MMessage.removeCallback(callbackId)
+
+
+def _addNodeCallbacks(namespace, nodes):
+    """Registers the callbacks that invalidate the rig when one of its network nodes changes"""
+    _removeNodeCallbacks(namespace)
+    callbackIds = list()
+    selList = api.MSelectionList()
+    for node in set(nodes):
+        selList.add(node)
+    for i in range(selList.length()):
+        nodeObj = api.MObject()
+        selList.getDependNode(i, nodeObj)
+        callbackIds.append(api.MNodeMessage.addAttributeChangedCallback(nodeObj, _onAttributeChanged, namespace))
+        callbackIds.append(api.MNodeMessage.addNodePreRemovalCallback(nodeObj, _onNodeChanged, namespace))
+        callbackIds.append(api.MNodeMessage.addNameChangedCallback(nodeObj, _onNodeChanged, namespace))
+    _NODE_CALLBACK_IDS[namespace] = callbackIds
+
+
+def installSpaceIndexCallbacks():
+    """Registers the scene callbacks that clear the index, called automatically on first lookup"""
+    if _SCENE_CALLBACK_IDS:
+        return
+    for message in (api.MSceneMessage.kAfterOpen, api.MSceneMessage.kAfterNew, api.MSceneMessage.kAfterImport,
+                    api.MSceneMessage.kAfterCreateReference, api.MSceneMessage.kAfterLoadReference):
+        _SCENE_CALLBACK_IDS.append(api.MSceneMessage.addCallback(message, clearSpaceIndex))
+
+
+def removeSpaceIndexCallbacks():
+    """Removes every index callback and clears the index"""
+    for callbackId in _SCENE_CALLBACK_IDS:
+        api.MMessage.removeCallback(callbackId)
+    del _SCENE_CALLBACK_IDS[:]
+    for namespace in list(_NODE_CALLBACK_IDS):
+        _removeNodeCallbacks(namespace)
+    clearSpaceIndex()
+
+
+def _sourceConnections(plugs):
+    """Returns {plug: source node} of message plugs with a single listConnections call"""
+    if not plugs:
+        return dict()
+    cxns = cmds.listConnections(plugs, source=True, destination=False, connections=True) or list()
+    # connections=True pairs the queried plug with its source node
+    return dict((cxns[i], cxns[i + 1]) for i in range(0, len(cxns), 2))
+
+
+def _multiIndex(plug):
+    """Returns the logical index of a "node.attr[index]" plug name"""
+    return int(plug.rpartition('[')[2].rstrip(']'))
+
+
+def getMatrixTargets(choice):
+    """Returns the target transforms connected to a matrix backend choice node, in enum order"""
+    cxns = _sourceConnections(['{}.input'.format(choice)])
+    return [cxns[plug] for plug in sorted(cxns, key=_multiIndex)]
+
+
+def buildSpaceIndex(namespace=''):
+    """Scans the message attributes of a rig namespace once and indexes its space networks
+
+    buildSpaceIndex('cambot')
+    """
+    installSpaceIndexCallbacks()
+    pattern = '{}:*'.format(namespace) if namespace else '*'
+
+    controls = cmds.ls(pattern + '.spaceNode', objectsOnly=True) or list()
+    spaceNodeOf = _sourceConnections(['{}.spaceNode'.format(ctrl) for ctrl in controls])
+
+    spaceNodes = list()
+    for ctrl in controls:
+        spaceNode = spaceNodeOf.get('{}.spaceNode'.format(ctrl))
+        if spaceNode and spaceNode not in spaceNodes:
+            spaceNodes.append(spaceNode)
+    # Matrix backend space nodes have no spaceGrp attribute
+    networkPlugs = _sourceConnections(['{}.{}'.format(spaceNode, attr) for spaceNode in spaceNodes
+                                       for attr in ('spaceGrp', 'spaceConstraint')
+                                       if cmds.attributeQuery(attr, node=spaceNode, exists=True)])
+
+    index = {'controls': dict(), 'spaceNodes': dict(), 'spaceNetworks': dict(), 'spaceNetworkMembers': dict()}
+    for ctrl in controls:
+        spaceNode = spaceNodeOf.get('{}.spaceNode'.format(ctrl))
+        spaceGrp = networkPlugs.get('{}.spaceGrp'.format(spaceNode))
+        spaceConstraint = networkPlugs.get('{}.spaceConstraint'.format(spaceNode))
+        backend = 'matrix' if spaceConstraint and cmds.nodeType(spaceConstraint) == 'choice' else 'constraint'
+        if not ((spaceGrp or backend == 'matrix') and spaceConstraint and
+                cmds.attributeQuery(SPACEATTR, node=ctrl, exists=True)):
+            LOG.warning('Incomplete space network on {}, skipping...'.format(ctrl))
+            continue
+
+        if backend == 'matrix':
+            targets = getMatrixTargets(spaceConstraint)
+        else:
+            targets = cmds.listRelatives(spaceGrp, children=True, type='transform') or list()
+        network = {'spaceSwitch': ctrl,
+                   'spaceNode': spaceNode,
+                   'spaceGrp': spaceGrp,
+                   'spaceConstraint': spaceConstraint,
+                   'backend': backend,
+                   'spaces': cmds.attributeQuery(SPACEATTR, node=ctrl, listEnum=True)[0].split(':'),
+                   'targets': targets}
+        index['controls'][ctrl] = network
+        index['spaceNodes'][spaceNode] = network
+
+    # Space networks, every member control maps to the main control holding the space_network attr
+    mainCtls = cmds.ls(pattern + '.space_network', objectsOnly=True) or list()
+    # The main control is only a member, and switched with the network, if it is connected itself
+    for mainCtl in mainCtls:
+        index['spaceNetworks'][mainCtl] = mainCtl
+        members = list()
+        for ctrl in cmds.listConnections('{}.space_network'.format(mainCtl)) or list():
+            index['spaceNetworks'].setdefault(ctrl, mainCtl)
+            if ctrl not in members:
+                members.append(ctrl)
+        index['spaceNetworkMembers'][mainCtl] = members
+
+    nodes = list(mainCtls)
+    for network in index['controls'].values():
+        nodes.extend([node for node in (network['spaceSwitch'], network['spaceNode'], network['spaceGrp'],
+                                        network['spaceConstraint']) if node])
+    _addNodeCallbacks(namespace, nodes)
+
+    _SPACE_INDEX[namespace] = index
+    return index
+
+
+def getSpaceIndex(node):
+    """Returns the space network index of the rig node belongs to, built on first use"""
+    namespace = getNamespace(node)
+    index = _SPACE_INDEX.get(namespace)
+    if index is None:
+        index = buildSpaceIndex(namespace)
+    return index
+
+
+def getSpaceNetwork(node):
+    """Returns the indexed network of a space switch control or space node, None if it has none
+
+    getSpaceNetwork("lf_tentAEnd_ctl")['spaces']
+    """
+    index = getSpaceIndex(node)
+    return index['controls'].get(node) or index['spaceNodes'].get(node)
+
 
 def set_space_network_name(ctl, space_name, key=True, keyPrevious=True):
     """Select any control in space network and run to set all spaces in that space_network to the same space
 
     set_space_network_name("lf_tentAEnd_ctl", "parent", key=False, keyPrevious=False)
     """
-    main_ctl = ""
-    if cmds.objExists(ctl):
-        ctl_list = list()
-        # Tip control is selected
-        if cmds.attributeQuery("space_network", node=ctl, exists=True):
-            main_ctl = ctl
-        # Network child control is selected
-        else:
-            cxns = cmds.listConnections("{}.message".format(ctl), s=False, d=True)
-            if cxns:
-                for cxn in cxns:
-                    if cmds.attributeQuery("space_network", node=cxn, exists=True):
-                        main_ctl = cxn
-        if main_ctl:
-            ctl_list_all = cmds.listConnections("{}.space_network".format(main_ctl))
-            ctl_list = list(set(ctl_list_all))
+    index = getSpaceIndex(ctl)
+    main_ctl = index['spaceNetworks'].get(ctl)
+    if main_ctl:
+        ctl_list = [ctlNode for ctlNode in index['spaceNetworkMembers'][main_ctl] if ctlNode in index['controls']]
+        switchSpaces(ctl_list, space_name, key=key, keyPrevious=keyPrevious)
 
-        if ctl_list:
-            for ctlNode in ctl_list:
-                if cmds.attributeQuery(SPACEATTR, node=ctlNode, exists=True):
-                    set_space_name(ctlNode, space_name, key=key, keyPrevious=keyPrevious)
 
+def _linear(matrix):
+    """Returns a copy of matrix without its translation"""
+    matrix = om.MMatrix(matrix)
+    for column in range(3):
+        matrix.setElement(3, column, 0.0)
+    return matrix
 
-def set_space_name(node, space_name, space_attr="spaces", key=True, keyPrevious=True):
-    """Set a node's space by name
 
-    set_space_name("lf_tentAEnd_ctl", "master")
+def _channelSolver(ctrl):
+    """Returns solve(local, previous), giving the translate (cm) and rotate (radians) channel values of ctrl
+
+    local is the matrix the control's channels make up, inside its offsetParentMatrix.  The
+    control's scale, shear, pivots and rotateAxis are kept at their current values, and so are
+    jointOrient and the inverse parent scale for joints.  previous is the euler rotation the
+    result is kept closest to, avoiding flips between frames.
     """
-    enumStr = cmds.attributeQuery(space_attr, node=node, listEnum=True)[0]
-    enumList = enumStr.split(":")
-    index = enumList.index(space_name)
+    def ui_vector(attr, toInternal):
+        return [toInternal(v) for v in cmds.getAttr('{}.{}'.format(ctrl, attr))[0]]
+
+    rotateOrder = cmds.getAttr(ctrl + '.rotateOrder')
+    tm = om.MTransformationMatrix()
+    tm.setScale(cmds.getAttr(ctrl + '.scale')[0], om.MSpace.kTransform)
+    tm.setShear(cmds.getAttr(ctrl + '.shear')[0], om.MSpace.kTransform)
+    rotateAxis = om.MEulerRotation(ui_vector('rotateAxis', om.MAngle.uiToInternal))
+    tm.setRotationOrientation(rotateAxis.asQuaternion(), False)
+
+    # Joint matrix is [S] * [rotateAxis] * [R] * [jointOrient] * [inverse parent scale] * [T], no pivots
+    post = om.MMatrix()
+    if cmds.objectType(ctrl, isAType='joint'):
+        jointOrient = om.MEulerRotation(ui_vector('jointOrient', om.MAngle.uiToInternal))
+        inverseScale = om.MTransformationMatrix()
+        inverseScale.setScale([1.0 / v if v else 1.0 for v in cmds.getAttr(ctrl + '.inverseScale')[0]],
+                              om.MSpace.kTransform)
+        post = jointOrient.asMatrix() * inverseScale.asMatrix()
+    else:
+        distance = om.MDistance.uiToInternal
+        tm.setScalePivot(om.MPoint(ui_vector('scalePivot', distance)), om.MSpace.kTransform, False)
+        tm.setScalePivotTranslation(om.MVector(ui_vector('scalePivotTranslate', distance)), om.MSpace.kTransform)
+        tm.setRotatePivot(om.MPoint(ui_vector('rotatePivot', distance)), om.MSpace.kTransform, False)
+        tm.setRotatePivotTranslation(om.MVector(ui_vector('rotatePivotTranslate', distance)), om.MSpace.kTransform)
+    pre_inverse = _linear(tm.asMatrix()).inverse()
+    post_inverse = post.inverse()
+
+    def solve(local, previous):
+        rotation = om.MTransformationMatrix(pre_inverse * _linear(local) * post_inverse).rotation()
+        rotate = rotation.reorder(rotateOrder).closestSolution(previous)
+        tm.setRotation(rotate)
+
+        # Translate is applied last, it is what is left once the pivots have moved the origin
+        unmoved = tm.asMatrix() * post
+        translate = [local.getElement(3, c) - unmoved.getElement(3, c) for c in range(3)]
+        return translate, [rotate.x, rotate.y, rotate.z]
+    return solve
+
+
+def _upstreamNodes(node, cache):
+    """Returns long names of the nodes node is moved by, its DAG parent and incoming connections
+
+    Message connections are skipped, results are kept in cache
+    """
+    if node not in cache:
+        nodes = cmds.listRelatives(node, parent=True, fullPath=True) or list()
+        plugs = cmds.listConnections(node, source=True, destination=False, plugs=True) or list()
+        sources = [plug.partition('.')[0] for plug in plugs if plug.partition('.')[2] != 'message']
+        if sources:
+            nodes.extend(cmds.ls(sources, long=True))
+        cache[node] = nodes
+    return cache[node]
+
+
+def _switchLevels(ctrls):
+    """Groups controls into levels that can be switched together, in dependency order
+
+    A control comes after every other control its parent is moved by, such as a control with
+    one of its space targets (or a DAG parent of a target) below it.  Cyclic dependencies are
+    switched together in the last level.
+    """
+    longNames = dict((cmds.ls(ctrl, long=True)[0], ctrl) for ctrl in ctrls)
+    cache = dict()
+    depends = dict()
+    for longName, ctrl in longNames.items():
+        # Walk upstream of the parent, stopping at switched controls as their own parents come first
+        depends[ctrl] = set()
+        visited = set()
+        pending = cmds.listRelatives(ctrl, parent=True, fullPath=True) or list()
+        while pending:
+            node = pending.pop()
+            if node in visited:
+                continue
+            visited.add(node)
+            if node in longNames:
+                if node != longName:
+                    depends[ctrl].add(longNames[node])
+                continue
+            pending.extend(_upstreamNodes(node, cache))
+
+    levels = list()
+    done = set()
+    remaining = list(ctrls)
+    while remaining:
+        level = [ctrl for ctrl in remaining if depends[ctrl] <= done]
+        if not level:
+            LOG.warning('Cyclic space dependencies between {}, switching them together...'.format(remaining))
+            level = remaining
+        levels.append(level)
+        done.update(level)
+        remaining = [ctrl for ctrl in remaining if ctrl not in done]
+    return levels
+
+
+def switchSpaces(controls, space, frames=None, key=True, keyPrevious=True, spaceAttrs=(SPACEATTR,)):
+    """Switches many controls to a space on many frames while keeping their world transforms
+
+    World matrices of every control are evaluated first and every enum is switched.  Controls are
+    then solved level by level in dependency order (see _switchLevels()), the parent matrices of
+    a level are evaluated after the levels it depends on are written.  Each transform attribute
+    is keyed on every frame with a single anim.set_keys() call.  The whole switch is a single
+    undo chunk.
 
+    Args:
+        controls:       Space switch controls, controls without a space network or space enum
+                        attribute are skipped
+        space:          Space name or enum index, or {control: space name or index}
+        frames:         Frames to switch on, defaults to the current frame.  Switching on other
+                        frames always sets keys
+        key:            Key the enum and transforms on every frame
+        keyPrevious:    Also key the values held on the frame before the first frame
+        spaceAttrs:     Enum attribute names to look for on controls without a space network,
+                        space networks are only used when SPACEATTR is listed
+
+    switchSpaces(["lf_tentAEnd_ctl", "rt_tentAEnd_ctl"], "master")
+    switchSpaces(cmds.ls(selection=True), "parent", frames=range(1, 101))
+    switchSpaces(["lf_tentAEnd_ctl", "rt_tentAEnd_ctl"], {"lf_tentAEnd_ctl": "master", "rt_tentAEnd_ctl": 1})
+    """
     curFrame = cmds.currentTime(q=True)
-    curSpace = cmds.getAttr("{}.{}".format(node, space_attr))
+    if frames is None:
+        frames = [curFrame]
+    else:
+        frames = sorted(set(frames))
+        key = True
+    if not frames:
+        return
 
-    # Get current transform of ctrl
-    wsPos = cmds.xform(node, query=True, ws=True, t=True)
-    wsOri = cmds.xform(node, query=True, ws=True, ro=True)
-    valT = cmds.getAttr(node + '.translate')[0]
-    valR = cmds.getAttr(node + '.rotate')[0]
+    # Resolve space attribute and index per control, from the space network index when it has one
+    switches = list()
+    for ctrl in controls:
+        ctrlSpace = space.get(ctrl) if isinstance(space, dict) else space
+        if ctrlSpace is None:
+            continue
+        network = getSpaceNetwork(ctrl) if SPACEATTR in spaceAttrs else None
+        if network:
+            spaceSwitch, spaceAttr, enumList = network['spaceSwitch'], SPACEATTR, network['spaces']
+        else:
+            spaceAttr = next((attr for attr in spaceAttrs if cmds.attributeQuery(attr, node=ctrl, exists=True)),
+                             None)
+            if not spaceAttr:
+                LOG.warning('No space network or space attribute on {}, skipping...'.format(ctrl))
+                continue
+            spaceSwitch = ctrl
+            enumList = cmds.attributeQuery(spaceAttr, node=ctrl, listEnum=True)[0].split(':')
+        if isinstance(ctrlSpace, basestring):
+            if ctrlSpace not in enumList:
+                LOG.warning('{} has no "{}" space, skipping...'.format(ctrl, ctrlSpace))
+                continue
+            spaceIndex = enumList.index(ctrlSpace)
+        else:
+            spaceIndex = ctrlSpace
+        if spaceSwitch not in [switch[0] for switch in switches]:
+            switches.append((spaceSwitch, spaceAttr, spaceIndex))
+    if not switches:
+        return
+    ctrls = [switch[0] for switch in switches]
 
-    # Key previous frame
+    # Gather everything before the first edit
+    if key:
+        worlds = anim.evaluate_world_matrices(ctrls, frames)
+    else:
+        worlds = dict((ctrl, [om.MMatrix(cmds.getAttr(ctrl + '.worldMatrix[0]'))]) for ctrl in ctrls)
+    held = dict()
+    prevFrame = frames[0] - 1
     if key and keyPrevious:
-        prevKey = cmds.findKeyframe(node + '.' + space_attr, time=(curFrame, curFrame), which='previous')
-        if prevKey != curFrame - 1:
-            cmds.setKeyframe(node + '.' + space_attr, time=curFrame - 1, value=curSpace, itt='clamped',
-                             ott='step')
-        for i, attr in enumerate(['tx', 'ty', 'tz']):
-            cmds.setKeyframe(node + '.' + attr, time=curFrame - 1, value=valT[i], itt='clamped', ott='step')
-        for i, attr in enumerate(['rx', 'ry', 'rz']):
-            cmds.setKeyframe(node + '.' + attr, time=curFrame - 1, value=valR[i], itt='clamped', ott='step')
-
-    cmds.setAttr('%s.%s' % (node, space_attr), index)
-
-    # Now that we're in the next space, set the transform back to the previous pos/ori
-    cmds.xform(node, ws=True, a=True, t=[wsPos[0], wsPos[1], wsPos[2]])
-    cmds.xform(node, ws=True, a=True, ro=[wsOri[0], wsOri[1], wsOri[2]])
-
-    # Key current frame
+        plugs = ['{}.{}'.format(ctrl, attr) for ctrl, spaceAttr, spaceIndex in switches
+                 for attr in (spaceAttr,) + TRANSFORM_ATTRS]
+        held = anim.evaluate_values(plugs, [prevFrame])
+    rotations = dict((ctrl, om.MEulerRotation([om.MAngle.uiToInternal(v) for v in cmds.getAttr(ctrl + '.rotate')[0]],
+                                              cmds.getAttr(ctrl + '.rotateOrder')))
+                     for ctrl in ctrls)
+    solvers = dict((ctrl, _channelSolver(ctrl)) for ctrl in ctrls)
+    levels = _switchLevels(ctrls)
+
+    cmds.undoInfo(openChunk=True, chunkName='switchSpaces')
+    try:
+        # Switch every enum before any parent matrix is evaluated, the previous frame is held only
+        # when the enum has no key there yet
+        for ctrl, spaceAttr, spaceIndex in switches:
+            plug = ctrl + '.' + spaceAttr
+            if key:
+                keyFrames = list(frames)
+                values = [spaceIndex] * len(frames)
+                if held and not cmds.keyframe(plug, time=(prevFrame, prevFrame), q=True, keyframeCount=True):
+                    keyFrames.insert(0, prevFrame)
+                    values.insert(0, held[plug][0])
+                anim.set_keys(plug, keyFrames, values, step=True, replace_range=False)
+            else:
+                cmds.setAttr(plug, spaceIndex)
+
+        # Restore the world transforms from the cached matrices, a level at a time so parent
+        # matrices include the levels already written
+        for level in levels:
+            # The channels sit inside offsetParentMatrix (Maya 2020+), which a matrix space can drive
+            parentPlugs = ['{}.parentInverseMatrix[0]'.format(ctrl) for ctrl in level]
+            offsetPlugs = ['{}.offsetParentMatrix'.format(ctrl) for ctrl in level
+                           if cmds.attributeQuery('offsetParentMatrix', node=ctrl, exists=True)]
+            if key:
+                parentInverses = anim.evaluate_matrices(parentPlugs + offsetPlugs, frames)
+            else:
+                parentInverses = dict((plug, [om.MMatrix(cmds.getAttr(plug))]) for plug in parentPlugs + offsetPlugs)
+
+            for ctrl, parentPlug in zip(level, parentPlugs):
+                offsetPlug = '{}.offsetParentMatrix'.format(ctrl)
+                offsets = parentInverses.get(offsetPlug, [om.MMatrix()] * len(worlds[ctrl]))
+
+                # Solved values per attribute in internal units, in TRANSFORM_ATTRS order
+                solved = [list() for attr in TRANSFORM_ATTRS]
+                previous = rotations[ctrl]
+                for world, parentInverse, offset in zip(worlds[ctrl], parentInverses[parentPlug], offsets):
+                    translate, rotate = solvers[ctrl](world * parentInverse * offset.inverse(), previous)
+                    previous = om.MEulerRotation(rotate, previous.order)
+                    for values, value in zip(solved, translate + rotate):
+                        values.append(value)
+
+                for attr, values in zip(TRANSFORM_ATTRS, solved):
+                    plug = '{}.{}'.format(ctrl, attr)
+                    if cmds.getAttr(plug, lock=True):
+                        continue
+                    if key:
+                        keyFrames = list(frames)
+                        if held:
+                            keyFrames.insert(0, prevFrame)
+                            values.insert(0, held[plug][0])
+                        anim.set_keys(plug, keyFrames, values, step=True, replace_range=False)
+                    elif attr.startswith('r'):
+                        cmds.setAttr(plug, om.MAngle.internalToUI(values[0]))
+                    else:
+                        cmds.setAttr(plug, om.MDistance.internalToUI(values[0]))
+    finally:
+        cmds.undoInfo(closeChunk=True)
+
     if key:
-        for i, attr in enumerate([space_attr, 'tx', 'ty', 'tz', 'rx', 'ry', 'rz']):
-            cmds.setKeyframe(node + '.' + attr, itt='clamped', ott='step')
+        # Keys on the current frame only show after the scene is evaluated again
+        cmds.currentTime(curFrame, update=True)
+
+    spaceName = 'their spaces' if isinstance(space, dict) else '"{}"'.format(space)
+    LOG.info('Switched {} controls to {} on {} frames...'.format(len(switches), spaceName, len(frames)))
+
+
+def set_space_name(node, space_name, space_attr="spaces", key=True, keyPrevious=True):
+    """Set a node's space by name, keeping its world transform, see switchSpaces()
 
+    set_space_name("lf_tentAEnd_ctl", "master")
+    """
+    switchSpaces([node], space_name, key=key, keyPrevious=keyPrevious, spaceAttrs=(space_attr,))
     LOG.info('Set space for "%s" to "%s"...' % (node, space_name))
 
 
@@ -94,30 +506,29 @@ def cycleSpaceUI():
     sel = cmds.ls(selection=True)
 
     if sel:
-        for item in sel:
-            if cmds.attributeQuery("spaces", node=item, exists=True):
-                result = cmds.confirmDialog(title='Confirm',
-                                            message='Key current and previous frames?',
-                                            button=['Yes', 'No'],
-                                            defaultButton='Yes',
-                                            cancelButton='No',
-                                            dismissString='No')
-                if 'Yes' in result:
-                    cycleControlSpace(key=True, keyPrevious=True)
-
-                elif 'No' in result:
-                    cycleControlSpace(key=False, keyPrevious=False)
-
-                else:
-                    pass
-            else:
-                LOG.warning("No spaces attribute on {}, skipping...".format(item))
+        if not [item for item in sel if cmds.attributeQuery("spaces", node=item, exists=True)]:
+            LOG.warning("No spaces attribute on {}, skipping...".format(', '.join(sel)))
+            return
+
+        result = cmds.confirmDialog(title='Confirm',
+                                    message='Key current and previous frames?',
+                                    button=['Yes', 'No'],
+                                    defaultButton='Yes',
+                                    cancelButton='No',
+                                    dismissString='No')
+        if 'Yes' in result:
+            cycleControlSpace(key=True, keyPrevious=True)
+
+        elif 'No' in result:
+            cycleControlSpace(key=False, keyPrevious=False)
 
 
 def cycleControlSpace(key=True, keyPrevious=True):
-    """Cycles through a control's space while maintaining offsets between spaces
+    """Cycles every selected control to its next space while maintaining offsets between spaces
 
-    Select animation control with "space" attribute and run:
+    The whole selection is switched with a single switchSpaces() call.
+
+    Select animation controls with "space" attribute and run:
 
     # To change space AND keyframe previous and current frames
     cycleControlSpace(key=True, keyPrevious=True)
@@ -126,73 +537,37 @@ def cycleControlSpace(key=True, keyPrevious=True):
     cycleControlSpace(key=False, keyPrevious=False)
     """
     selection = cmds.ls(selection=True)
+    if not selection:
+        LOG.error('Nothing selected, a control with a spaces attribute and try again!')
+        return
 
-    if selection:
-        for ctrl in selection:
-
-            # Get the proper space attr name as some rigs use "Space" and others use "space"
-            spaceAttrName = ''
-            if cmds.attributeQuery('spaces', exists=True, node=ctrl):
-                spaceAttrName = 'spaces'
-
-            elif cmds.attributeQuery('Space', exists=True, node=ctrl):
-                spaceAttrName = 'Space'
-
-            else:
-                LOG.error('Cannot find spaces attribute on selected control!')
-                return
-
-            curFrame = cmds.currentTime(q=True)
-            curSpace = cmds.getAttr(ctrl + '.' + spaceAttrName)
-
-            # Get current space ctrl info
-            curPos = cmds.xform(ctrl, q=True, ws=True, rp=True)
-            curRot = cmds.xform(ctrl, q=True, ws=True, ro=True)
-            valT = cmds.getAttr(ctrl + '.translate')[0]
-            valR = cmds.getAttr(ctrl + '.rotate')[0]
-
-            # key previous frame
-            if key and keyPrevious:
-                prevKey = cmds.findKeyframe(ctrl + '.' + spaceAttrName, time=(curFrame, curFrame), which='previous')
-                if prevKey != curFrame - 1:
-                    cmds.setKeyframe(ctrl + '.' + spaceAttrName, time=curFrame - 1, value=curSpace, itt='clamped',
-                                   ott='step')
-                for i, attr in enumerate(['tx', 'ty', 'tz']):
-                    cmds.setKeyframe(ctrl + '.' + attr, time=curFrame - 1, value=valT[i], itt='clamped', ott='step')
-                for i, attr in enumerate(['rx', 'ry', 'rz']):
-                    cmds.setKeyframe(ctrl + '.' + attr, time=curFrame - 1, value=valR[i], itt='clamped', ott='step')
-
-            # Get current transform of ctrl
-            wsPos = cmds.xform(ctrl, query=True, ws=True, t=True)
-            wsOri = cmds.xform(ctrl, query=True, ws=True, ro=True)
-
-            # Query the space attr and find the next space to cycle to
-            spaceEnum = cmds.attributeQuery(spaceAttrName, listEnum=True, node=ctrl)[0]
-            spaceEnumList = spaceEnum.split(':')
-            currentSpace = cmds.getAttr('%s.%s' % (ctrl, spaceAttrName), asString=True)
-            spaceIndex = spaceEnumList.index(currentSpace)
-            nextSpaceIndex = spaceIndex + 1
-            if nextSpaceIndex > len(spaceEnumList) - 1:
-                nextSpaceIndex = 0
-
-            cmds.setAttr('%s.%s' % (ctrl, spaceAttrName), nextSpaceIndex)
-
-            # Now that we're in the next space, set the transform back to the previous pos/ori
-            cmds.xform(ctrl, ws=True, a=True, t=[wsPos[0], wsPos[1], wsPos[2]])
-            cmds.xform(ctrl, ws=True, a=True, ro=[wsOri[0], wsOri[1], wsOri[2]])
-
-            # key current frame
-            if key:
-                for i, attr in enumerate([spaceAttrName, 'tx', 'ty', 'tz', 'rx', 'ry', 'rz']):
-                    cmds.setKeyframe(ctrl + '.' + attr, itt='clamped', ott='step')
+    # Some rigs use "Space" and others use "spaces"
+    spaceAttrs = (SPACEATTR, 'Space')
+    nextSpaces = dict()
+    for ctrl in selection:
+        network = getSpaceNetwork(ctrl)
+        if network:
+            spaceSwitch, spaceAttrName, spaceEnumList = network['spaceSwitch'], SPACEATTR, network['spaces']
+        else:
+            spaceAttrName = next((attr for attr in spaceAttrs if cmds.attributeQuery(attr, exists=True, node=ctrl)),
+                                 None)
+            if not spaceAttrName:
+                LOG.error('Cannot find spaces attribute on {}!'.format(ctrl))
+                continue
+            spaceSwitch = ctrl
+            spaceEnumList = cmds.attributeQuery(spaceAttrName, listEnum=True, node=ctrl)[0].split(':')
 
-            LOG.info('Cycled space for %s to %s...' % (ctrl, spaceEnumList[nextSpaceIndex]))
+        # Find the next space to cycle to
+        nextSpaceIndex = (int(cmds.getAttr(spaceSwitch + '.' + spaceAttrName)) + 1) % len(spaceEnumList)
+        nextSpaces[ctrl] = nextSpaceIndex
+        LOG.info('Cycling space for %s to %s...' % (ctrl, spaceEnumList[nextSpaceIndex]))
 
-    else:
-        LOG.error('Nothing selected, a control with a spaces attribute and try again!')
+    if nextSpaces:
+        switchSpaces(list(nextSpaces), nextSpaces, key=key, keyPrevious=keyPrevious, spaceAttrs=spaceAttrs)
 
 
-def create(spaceNode, spaceSwitch=None, parent=None, mode='parent', master_node='Main', verbose=False):
+def create(spaceNode, spaceSwitch=None, parent=None, mode='parent', master_node='Main', verbose=False,
+           backend='constraint'):
     '''
     other modes: 'orient', 'point'
     nodes in the network:
@@ -200,15 +575,24 @@ def create(spaceNode, spaceSwitch=None, parent=None, mode='parent', master_node=
     spaceSwitch:     node used to mamage switch (usually a control) 'Lf_arm_ikh_ctrl'
     spaceNode:       node that gets constrained to the various space targets (usually a parent of the control node) 'Lf_arm_ikh_zero'
     spaceConstraint: constraint node used to switch spaces 'Lf_arm_ikh_zero_parentConstraint1'
+
+    backend 'matrix' builds the network from matrix nodes instead, see createMatrix()
     '''
 
+    if backend not in BACKENDS:
+        LOG.error('spaces.create: unknown backend "{}", use one of {}'.format(backend, BACKENDS))
+        return None
+
     if verbose == True:
         print('creating space node for %s' %spaceNode)
 
     if not spaceSwitch:
         spaceSwitch = spaceNode
 
-    if not cmds.objExists(spaceNode+'.spaceGrp'):
+    if backend == 'matrix':
+        return createMatrix(spaceNode, spaceSwitch, mode=mode, master_node=master_node)
+
+    if not cmds.objExists(spaceNode+'.spaceConstraint'):
 
         # Space Group
         grp = cmds.createNode('transform', n=spaceNode+'Spaces', parent=parent)
@@ -251,6 +635,7 @@ def create(spaceNode, spaceSwitch=None, parent=None, mode='parent', master_node=
         cmds.addAttr(spaceNode, ln='spaceSwitch', at='message', keyable=True)
         cmds.connectAttr(spaceSwitch+'.'+SPACEATTR, spaceNode+'.spaceSwitch')
 
+        invalidateSpaceIndex(spaceSwitch)
         return(spaceNode)
 
     else:
@@ -258,6 +643,128 @@ def create(spaceNode, spaceSwitch=None, parent=None, mode='parent', master_node=
         print 'spaces.create: '+spaceNode +'already exists. Use spaces.add'
         return None
 
+def createMatrix(spaceNode, spaceSwitch=None, mode='parent', master_node='Main'):
+    '''
+    Matrix backend of create(), the spaces enum drives two choice nodes instead of condition nodes
+    and constraint weights:
+
+    spaceOffsetChoice: picks the offset stored per space on spaceNode.spaceOffsets[]
+    spaceConstraint:   choice node picking the worldMatrix of the space target
+    multMatrix:        offset * target worldMatrix * spaceNode.parentInverseMatrix -> spaceNode.offsetParentMatrix
+
+    Only the selected target is pulled during evaluation and the node count does not grow with
+    the number of spaces.  Targets are the space objects themselves, no spaceGrp is created.
+    Requires Maya 2020+ for offsetParentMatrix.
+    '''
+
+    if mode != 'parent':
+        LOG.error('spaces.createMatrix: only "parent" mode is supported by the matrix backend')
+        return None
+
+    if not spaceSwitch:
+        spaceSwitch = spaceNode
+
+    if cmds.objExists(spaceNode+'.spaceConstraint'):
+        print 'spaces.createMatrix: '+spaceNode +'already exists. Use spaces.add'
+        return None
+
+    if not cmds.objExists(master_node):
+        cmds.createNode("transform", name=master_node)
+
+    cmds.addAttr(spaceSwitch, ln=SPACEATTR, attributeType='enum', enumName='master', keyable=True)
+    cmds.addAttr(spaceNode, ln='spaceOffsets', at='matrix', multi=True)
+
+    offsetChoice = cmds.createNode('choice', name=spaceNode+'_spaceOffset_choice')
+    targetChoice = cmds.createNode('choice', name=spaceNode+'_spaceTarget_choice')
+    multMatrix = cmds.createNode('multMatrix', name=spaceNode+'_space_multMatrix')
+    cmds.connectAttr(spaceSwitch+'.'+SPACEATTR, offsetChoice+'.selector')
+    cmds.connectAttr(spaceSwitch+'.'+SPACEATTR, targetChoice+'.selector')
+    cmds.connectAttr(offsetChoice+'.output', multMatrix+'.matrixIn[0]')
+    cmds.connectAttr(targetChoice+'.output', multMatrix+'.matrixIn[1]')
+    cmds.connectAttr(spaceNode+'.parentInverseMatrix[0]', multMatrix+'.matrixIn[2]')
+
+    # Initial Space = master, the offset is stored before offsetParentMatrix is driven
+    _setMatrixSpace(spaceNode, master_node, offsetChoice, targetChoice, 0)
+    cmds.connectAttr(multMatrix+'.matrixSum', spaceNode+'.offsetParentMatrix', f=True)
+
+    # Message Attrs (for tracing network)
+    cmds.addAttr(spaceSwitch, ln='spaceNode', at='message', keyable=True)
+    cmds.connectAttr(spaceNode+'.message', spaceSwitch+'.spaceNode')
+
+    cmds.addAttr(spaceNode, ln='spaceConstraint', at='message', keyable=True)
+    cmds.connectAttr(targetChoice+'.message', spaceNode+'.spaceConstraint')
+
+    cmds.addAttr(spaceNode, ln='spaceOffsetChoice', at='message')
+    cmds.connectAttr(offsetChoice+'.message', spaceNode+'.spaceOffsetChoice')
+
+    cmds.addAttr(spaceNode, ln='spaceSwitch', at='message', keyable=True)
+    cmds.connectAttr(spaceSwitch+'.'+SPACEATTR, spaceNode+'.spaceSwitch')
+
+    invalidateSpaceIndex(spaceSwitch)
+    return(spaceNode)
+
+
+def _setMatrixSpace(spaceNode, target, offsetChoice, targetChoice, index, offset=None):
+    '''
+    Connects target as matrix space index, the offset keeps the current world pose of spaceNode
+    '''
+
+    if offset is None:
+        local = om.MMatrix(cmds.getAttr(spaceNode+'.matrix'))
+        world = om.MMatrix(cmds.getAttr(spaceNode+'.worldMatrix[0]'))
+        targetWorld = om.MMatrix(cmds.getAttr(target+'.worldMatrix[0]'))
+        mtx = local.inverse() * world * targetWorld.inverse()
+        offset = [mtx.getElement(r, c) for r in range(4) for c in range(4)]
+
+    offsetPlug = '{}.spaceOffsets[{}]'.format(spaceNode, index)
+    cmds.setAttr(offsetPlug, offset, type='matrix')
+    cmds.connectAttr(offsetPlug, '{}.input[{}]'.format(offsetChoice, index), f=True)
+    cmds.connectAttr(target+'.worldMatrix[0]', '{}.input[{}]'.format(targetChoice, index), f=True)
+
+
+def _getOffsetChoice(spaceNode):
+    """Returns the choice node picking the space offsets of a matrix backend space node"""
+    return cmds.listConnections(spaceNode+'.spaceOffsetChoice')[0]
+
+
+def _removeMatrixSpace(spaceNode, targetChoice, index):
+    '''
+    Removes matrix space index and shifts the following targets and offsets down one index
+    '''
+
+    offsetChoice = _getOffsetChoice(spaceNode)
+    targets = getMatrixTargets(targetChoice)
+    offsets = [cmds.getAttr('{}.spaceOffsets[{}]'.format(spaceNode, i)) for i in range(len(targets))]
+
+    for i in range(len(targets)):
+        cmds.removeMultiInstance('{}.input[{}]'.format(offsetChoice, i), b=True)
+        cmds.removeMultiInstance('{}.input[{}]'.format(targetChoice, i), b=True)
+        cmds.removeMultiInstance('{}.spaceOffsets[{}]'.format(spaceNode, i), b=True)
+
+    del targets[index]
+    del offsets[index]
+    for i, (target, offset) in enumerate(zip(targets, offsets)):
+        _setMatrixSpace(spaceNode, target, offsetChoice, targetChoice, i, offset=offset)
+
+
+def _deleteMatrixNetwork(spaceNode, spaceSwitch, targetChoice):
+    '''
+    Removes the matrix backend network, spaceNode keeps its current offsetParentMatrix value
+    '''
+
+    offsetChoice = _getOffsetChoice(spaceNode)
+    multMatrix = cmds.listConnections(spaceNode+'.offsetParentMatrix', s=True, d=False, type='multMatrix')
+
+    if multMatrix:
+        cmds.disconnectAttr(multMatrix[0]+'.matrixSum', spaceNode+'.offsetParentMatrix')
+    cmds.delete([offsetChoice, targetChoice] + (multMatrix or []))
+
+    for attr in ['spaceSwitch', 'spaceConstraint', 'spaceOffsetChoice', 'spaceOffsets']:
+        cmds.deleteAttr(spaceNode+'.'+attr)
+    cmds.deleteAttr(spaceSwitch+'.spaceNode')
+    cmds.deleteAttr(spaceSwitch+'.'+SPACEATTR)
+
+
 def matchPose(src, dst, poseType='pose'):
     '''
     Match dst transform to src transform (follows maya constraint argument order: src, dst)
@@ -286,8 +793,13 @@ def matchPose(src, dst, poseType='pose'):
 
 def getNodes(spaceNode):
     '''
+    Returns spaceGrp, spaceSwitch, spaceConstraint of a space node from the space network index
     '''
 
+    network = getSpaceIndex(spaceNode)['spaceNodes'].get(spaceNode)
+    if network:
+        return network['spaceGrp'], network['spaceSwitch'], network['spaceConstraint']
+
     if not cmds.objExists(spaceNode):
         print 'spaces.getNodes: '+spaceNode+' does not exist, please create use spaces.create'
         return None
@@ -306,9 +818,9 @@ def getNodes(spaceNode):
 
 def getSpaceNode(ctrl):
 
-    if cmds.objExists(ctrl+'.spaceNode'):
-        spaceNode = cmds.listConnections(ctrl+'.spaceNode')[0]
-        return spaceNode
+    network = getSpaceIndex(ctrl)['controls'].get(ctrl)
+    if network:
+        return network['spaceNode']
     else:
         cmds.warning('spaces.getSpaceNode: could not find spaceNetwork for '+ctrl)
         return None
@@ -357,14 +869,21 @@ def add(spaceNode, target, name=None, mode='parent'):
     # Get space node network
     spaceGrp, spaceSwitch, spaceConstraint = getNodes(spaceNode)
 
+    network = getSpaceNetwork(spaceSwitch)
+
     # See if mode is compatible
-    conType = cmds.objectType(spaceConstraint)
-    if not conType.__contains__(mode):
-        cmds.warning('spaces.add: cannot add '+mode+'Constraint target to a '+conType)
-        return None
+    if network['backend'] == 'matrix':
+        if mode != 'parent':
+            LOG.error('spaces.add: only "parent" mode is supported by the matrix backend')
+            return None
+    else:
+        conType = cmds.objectType(spaceConstraint)
+        if not conType.__contains__(mode):
+            cmds.warning('spaces.add: cannot add '+mode+'Constraint target to a '+conType)
+            return None
 
     # Check current spaces
-    curSpaces = cmds.attributeQuery(SPACEATTR, node=spaceSwitch, listEnum=True)[0].split(':')
+    curSpaces = list(network['spaces'])
     if space in curSpaces or target in curSpaces:
         print 'spaces.add: "'+spaceSwitch+'" already has a "'+space+'" space, skipping...'
         return None
@@ -372,6 +891,12 @@ def add(spaceNode, target, name=None, mode='parent'):
     # Add enum space
     cmds.addAttr(spaceSwitch+'.'+SPACEATTR, e=True, enumName=':'.join(curSpaces+[space]))
 
+    # Matrix backend, target is selected directly by the choice nodes
+    if network['backend'] == 'matrix':
+        _setMatrixSpace(spaceNode, target, _getOffsetChoice(spaceNode), spaceConstraint, len(curSpaces))
+        invalidateSpaceIndex(spaceSwitch)
+        return(target)
+
     # Add spaceTarget in space of target object
     spaceTarget = cmds.createNode('transform', name=spaceGrp+'_'+space, parent=spaceGrp)
     matchPose(spaceNode, spaceTarget)
@@ -390,6 +915,7 @@ def add(spaceNode, target, name=None, mode='parent'):
     # Update weight connections
     connect(spaceConstraint, spaceSwitch)
 
+    invalidateSpaceIndex(spaceSwitch)
     return(spaceTarget)
 
 def remove(spaceNode, space):
@@ -418,8 +944,20 @@ def remove(spaceNode, space):
         return
     newSpaces = [curSpaces[i] for i in range(len(curSpaces)) if i!=space]
 
+    # Matrix backend, delete entire network if only one space
+    if len(curSpaces)==1 and cmds.nodeType(spaceConstraint) == 'choice':
+        _deleteMatrixNetwork(spaceNode, spaceSwitch, spaceConstraint)
+        invalidateSpaceIndex(spaceSwitch)
+        return
+
     # Update enum attr
     cmds.addAttr(spaceSwitch+'.'+SPACEATTR, e=True, enumName=':'.join(newSpaces))
+    invalidateSpaceIndex(spaceSwitch)
+
+    # Matrix backend, targets are not owned by the network so only the connections are removed
+    if cmds.nodeType(spaceConstraint) == 'choice':
+        _removeMatrixSpace(spaceNode, spaceConstraint, spaceInt)
+        return
 
     # Delete dead spaceTarget node
     spaceTargets = cmds.listRelatives(spaceGrp, c=True, type='transform')
@@ -444,50 +982,25 @@ def remove(spaceNode, space):
     return(spaceTarget)
 
 def snapAndKey(ctrl, space, key=True, keyPrevious=True):
+    """Switches ctrl to space keeping its world transform and keys it, see switchSpaces()
 
-    if isinstance(space, basestring):
-        space = attribute.getEnumIndex(ctrl+'.'+SPACEATTR, space)
-
-    spaceNode = getSpaceNode(ctrl)
-
-    # Get space node network
-    spaceGrp, spaceSwitch, spaceConstraint = getNodes(spaceNode)
-
-    curFrame = cmds.currentTime(q=True)
-    curSpace = cmds.getAttr(spaceSwitch+'.'+SPACEATTR)
+    snapAndKey("lf_tentAEnd_ctl", "master")
+    """
+    network = getSpaceNetwork(ctrl)
+    if not network:
+        cmds.warning('spaces.snapAndKey: could not find spaceNetwork for '+ctrl)
+        return None
 
-    # Get current space ctrl info
-    curPos   = cmds.xform(spaceSwitch, q=True, ws=True, rp=True)
-    curRot   = cmds.xform(spaceSwitch, q=True, ws=True, ro=True)
-    valT = cmds.getAttr(spaceSwitch+'.translate')[0]
-    valR = cmds.getAttr(spaceSwitch+'.rotate')[0]
+    if isinstance(space, basestring):
+        space = network['spaces'].index(space)
+    curSpace = cmds.getAttr(network['spaceSwitch']+'.'+SPACEATTR)
 
-    # key previous frame
-    keyMsg = ''
-    if key and keyPrevious:
-        prevKey = cmds.findKeyframe(spaceSwitch+'.'+SPACEATTR, time=(curFrame, curFrame), which='previous')
-        if prevKey != curFrame-1:
-            cmds.setKeyframe(spaceSwitch+'.'+SPACEATTR, time=curFrame-1, value=curSpace, itt='clamped', ott='step')
-        for i, attr in enumerate(['tx', 'ty', 'tz']):
-            cmds.setKeyframe(spaceSwitch+'.'+attr,  time=curFrame-1, value=valT[i],  itt='clamped', ott='step')
-        for i, attr in enumerate(['rx', 'ry', 'rz']):
-            cmds.setKeyframe(spaceSwitch+'.'+attr,  time=curFrame-1, value=valR[i],  itt='clamped', ott='step')
-
-    # switch to new space
-    cmds.setAttr(spaceSwitch+'.'+SPACEATTR, space)
-    cmds.xform(spaceSwitch, ws=True, t=curPos)
-    cmds.xform(spaceSwitch, ws=True, ro=curRot)
-
-    # key current frame
-    if key:
-        keyMsg = ' & key'
-        for i, attr in enumerate([SPACEATTR, 'tx', 'ty', 'tz', 'rx', 'ry', 'rz']):
-            cmds.setKeyframe(spaceSwitch+'.'+attr, itt='clamped', ott='step')
+    switchSpaces([network['spaceSwitch']], space, key=key, keyPrevious=keyPrevious)
 
     # print message
-    msg = 'spaces: snap'+keyMsg+': '
-    oldSpace = cmds.attributeQuery(SPACEATTR, node=spaceSwitch, listEnum=True)[0].split(':')[curSpace]
-    newSpace = cmds.attributeQuery(SPACEATTR, node=spaceSwitch, listEnum=True)[0].split(':')[space]
+    msg = 'spaces: snap'+(' & key' if key else '')+': '
+    oldSpace = network['spaces'][curSpace]
+    newSpace = network['spaces'][space]
     msg += oldSpace+' -> '+newSpace
     print msg
 
@@ -0,0 +1,148 @@
+"""
+anim.py
+
+Bulk animation helpers, evaluating attributes over a frame range without changing the current
+time and writing many keys per curve at once.
+
+    from mechRig_toolkit.utils import anim
+
+    # World matrices of two nodes on frames 1-100, the current time is not changed
+    matrices = anim.evaluate_world_matrices(['cn_body_ctl', 'lf_foot_ctl'], range(1, 101))
+
+    # Key frames 1-100 of translateX with a single call
+    anim.set_keys('cn_body_ctl.translateX', range(1, 101), [f * 0.1 for f in range(1, 101)])
+
+"""
+import logging
+
+logging.basicConfig()
+LOG = logging.getLogger(__name__)
+LOG.setLevel(logging.INFO)
+
+from maya.api import OpenMaya as om
+from maya.api import OpenMayaAnim as oma
+
+from mechRig_toolkit.utils import apiundo
+reload(apiundo)
+
+
+def get_plug(attr_name):
+    """Returns MPlug of "node.attribute" name"""
+    return om.MGlobal.getSelectionListByName(attr_name).getPlug(0)
+
+
+def frame_context(frame):
+    """Returns MDGContext evaluating at frame in the current time unit"""
+    return om.MDGContext(om.MTime(frame, om.MTime.uiUnit()))
+
+
+def _evaluate(plug, context, getter):
+    """Returns getter(plug) evaluated in context"""
+    if hasattr(context, 'makeCurrent'):
+        # Maya 2019+, contexts are made current rather than passed to the getter
+        previous = context.makeCurrent()
+        try:
+            return getter(plug)
+        finally:
+            previous.makeCurrent()
+    return getter(plug, context)
+
+
+def evaluate_matrices(attr_names, frames):
+    """Returns {attr_name: [MMatrix, ...]} of matrix attributes evaluated at every frame
+
+    Values are pulled with DG context evaluation, the current time does not change and the scene
+    is not re-evaluated at the current time.
+
+    Example:
+        evaluate_matrices(['cn_body_ctl.worldMatrix[0]'], range(1, 101))
+    """
+    plugs = [get_plug(attr_name) for attr_name in attr_names]
+    results = dict((attr_name, list()) for attr_name in attr_names)
+    for frame in frames:
+        context = frame_context(frame)
+        for attr_name, plug in zip(attr_names, plugs):
+            data = _evaluate(plug, context, lambda p, *ctx: p.asMObject(*ctx))
+            results[attr_name].append(om.MFnMatrixData(data).matrix())
+    return results
+
+
+def evaluate_world_matrices(nodes, frames):
+    """Returns {node: [MMatrix, ...]} world matrices of nodes at every frame, see evaluate_matrices()"""
+    matrices = evaluate_matrices(['{}.worldMatrix[0]'.format(node) for node in nodes], frames)
+    return dict((node, matrices['{}.worldMatrix[0]'.format(node)]) for node in nodes)
+
+
+def evaluate_values(attr_names, frames):
+    """Returns {attr_name: [float, ...]} of numeric attributes evaluated at every frame, see evaluate_matrices()
+
+    Values are in internal units, angles are in radians
+    """
+    plugs = [get_plug(attr_name) for attr_name in attr_names]
+    results = dict((attr_name, list()) for attr_name in attr_names)
+    for frame in frames:
+        context = frame_context(frame)
+        for attr_name, plug in zip(attr_names, plugs):
+            results[attr_name].append(_evaluate(plug, context, lambda p, *ctx: p.asDouble(*ctx)))
+    return results
+
+
+def set_keys(attr_name, frames, values, step=False, replace_range=True):
+    """Keys attr_name at every frame with values in a single MFnAnimCurve.addKeys call
+
+    Existing keys between the first and last frame are replaced, keys outside are kept, or with
+    replace_range=False only keys on the given frames are replaced.  An anim curve is created if
+    the attribute has none.  Every edit goes through the API and is committed to Maya's undo
+    queue (apiundo) as one step.
+
+    Args:
+        attr_name:      "node.attribute" to key
+        frames:         Frame numbers, in the current time unit
+        values:         Value per frame in internal units (centimeters, radians) as returned by
+                        evaluate_values()
+        step:           Use stepped tangents
+        replace_range:  Replace every key between the first and last frame, not only keys on frames
+
+    Example:
+        set_keys('cn_body_ctl.translateX', [1, 2, 3], [0.0, 0.5, 1.0])
+    """
+    frames = list(frames)
+    if not frames:
+        return
+    plug = get_plug(attr_name)
+    unit = om.MTime.uiUnit()
+    dg_mod = om.MDGModifier()
+    change = oma.MAnimCurveChange()
+
+    if plug.isDestination:
+        curve_obj = plug.connectedTo(True, False)[0].node()
+        if not curve_obj.hasFn(om.MFn.kAnimCurve):
+            LOG.error('{} has an incoming connection that is not an anim curve, cannot key it'.format(attr_name))
+            return
+        fn_curve = oma.MFnAnimCurve(curve_obj)
+
+        # Remove the keys being replaced, last first so indices stay valid
+        first = om.MTime(min(frames), unit)
+        last = om.MTime(max(frames), unit)
+        key_frames = set(frames)
+        for i in reversed(range(fn_curve.numKeys)):
+            key_time = fn_curve.input(i)
+            if replace_range:
+                replaced = first <= key_time <= last
+            else:
+                replaced = key_time.asUnits(unit) in key_frames
+            if replaced:
+                fn_curve.remove(i, change)
+    else:
+        fn_curve = oma.MFnAnimCurve()
+        fn_curve.create(plug, oma.MFnAnimCurve.kAnimCurveUnknown, dg_mod)
+        dg_mod.doIt()
+
+    times = om.MTimeArray()
+    for frame in frames:
+        times.append(om.MTime(frame, unit))
+    tangent_out = oma.MFnAnimCurve.kTangentStep if step else oma.MFnAnimCurve.kTangentGlobal
+    fn_curve.addKeys(times, om.MDoubleArray(values), oma.MFnAnimCurve.kTangentGlobal, tangent_out, True, change)
+
+    # The curve is created before it is keyed, it is deleted after its keys are undone
+    apiundo.commit(lambda: (change.undoIt(), dg_mod.undoIt()), lambda: (dg_mod.doIt(), change.redoIt()))
@@ -0,0 +1,62 @@
+"""
+apiundo.py
+
+Adds API edits (MDagModifier, MDGModifier, MAnimCurveChange...) to Maya's undo queue.
+
+API edits are not recorded by Maya's undo, so tools built on them could not be undone from
+the shelf or marking menu.  After making an edit, commit() its undo and redo functions, they
+are recorded by the mechRigApiUndo command of plugins/mechRig_apiUndo.py and called when the
+user undoes or redoes.
+
+    from mechRig_toolkit.utils import apiundo
+
+    mod = om.MDagModifier()
+    mod.createNode('locator')
+    apiundo.do_it(mod)
+
+    # Any pair of functions, such as an anim curve change
+    apiundo.commit(change.undoIt, change.redoIt)
+
+"""
+import os
+
+from maya import cmds
+
+API_UNDO_PLUGIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'plugins',
+                               'mechRig_apiUndo.py')
+
+# (undo, redo) pairs waiting for the mechRigApiUndo command to pick them up
+_PENDING = list()
+
+
+def load_plugin():
+    """Loads the mechRigApiUndo command plug-in"""
+    if not cmds.pluginInfo(API_UNDO_PLUGIN, q=True, loaded=True):
+        cmds.loadPlugin(API_UNDO_PLUGIN, quiet=True)
+
+
+def commit(undo, redo):
+    """Records an API edit that has already been done as one undo step
+
+    Args:
+        undo:   Function reverting the edit
+        redo:   Function doing the edit again after it was undone
+    """
+    load_plugin()
+    _PENDING.append((undo, redo))
+    cmds.mechRigApiUndo()
+
+
+def pop_pending():
+    """Returns the oldest (undo, redo) pair passed to commit(), called by the mechRigApiUndo command"""
+    return _PENDING.pop(0)
+
+
+def do_it(modifier):
+    """Runs modifier.doIt() and commits the modifier as one undo step
+
+    Modifiers built in several doIt() passes are committed once, with do_it() as their last pass,
+    undoIt() reverts every pass.
+    """
+    modifier.doIt()
+    commit(modifier.undoIt, modifier.doIt)
@@ -0,0 +1,691 @@
+"""
+benchmark.py
+
+Timing helpers and benchmark scenes comparing the toolkit's bulk code paths against the
+original per-item command loops.  Benchmarks build their own test nodes in a new scene,
+so save your work before running them.
+
+    from mechRig_toolkit.utils import benchmark
+
+    # Compare bulk position queries against per-item xform on 20k vertices
+    benchmark.position_query(num_vertices=20000)
+
+    # Compare batched locator creation against spaceLocator/setAttr per locator
+    benchmark.locator_creation(num_locators=5000)
+
+    # Compare closed-form joint orientation against temporary aim constraints, including accuracy
+    benchmark.orient_solver(num_joints=500)
+
+    # Compare orientJoint (unparent/reparent) against orientJointHierarchy, per joint and NumPy batch
+    benchmark.joint_orient_chain(num_joints=500)
+
+    # Compare binary skin weight files against deformerWeights XML on a 200k vertex mesh
+    benchmark.skin_weights_io(num_vertices=200000, num_influences=20)
+
+    # Compare exporting many skinned meshes one at a time against the threaded batch export
+    benchmark.skin_weights_batch(num_meshes=150, num_vertices=5000)
+
+    # Compare copySkinWeights closestPoint against the KD-tree transfer on 100k -> 100k vertices
+    benchmark.skin_transfer(num_vertices=100000)
+
+    # Compare findRelatedSkinCluster per mesh against the cached skincluster resolver
+    benchmark.skin_cluster_lookup(num_meshes=150)
+
+    # Compare per-command follicle creation against the batched follicle builder
+    benchmark.follicle_creation(num_follicles=200)
+
+    # Compare playback of follicles against matrix surface pins at 50, 200 and 1000 attachments
+    benchmark.pin_evaluation(counts=(50, 200, 1000))
+
+    # Compare playback of constraint and matrix space switch networks at 10, 50 and 200 controls
+    benchmark.space_switch_evaluation(counts=(10, 50, 200))
+
+    # Compare playback of the soft IK utility node network against the mechRigSoftIk node on Cambot's legs
+    benchmark.soft_ik_evaluation(num_frames=100)
+
+"""
+import logging
+
+logging.basicConfig()
+LOG = logging.getLogger(__name__)
+LOG.setLevel(logging.INFO)
+
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import timeit
+
+from maya import cmds, mel
+
+from mechRig_toolkit.utils import points
+reload(points)
+
+from mechRig_toolkit.utils import locator
+reload(locator)
+
+from mechRig_toolkit.utils import joints
+reload(joints)
+
+from mechRig_toolkit.utils import orient
+reload(orient)
+
+from mechRig_toolkit.utils import skin_io
+reload(skin_io)
+
+from mechRig_toolkit.utils import skin_transfer as transfer
+reload(transfer)
+
+from mechRig_toolkit.utils import skincluster
+reload(skincluster)
+
+from mechRig_toolkit.utils import follicles
+reload(follicles)
+
+from mechRig_toolkit.utils import ik
+reload(ik)
+
+# Shelf scripts are plain modules on the shelf's script path
+SHELF_SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 'shelves', 'shelf_mechRig_utils_scripts')
+if SHELF_SCRIPTS_DIR not in sys.path:
+    sys.path.append(SHELF_SCRIPTS_DIR)
+
+import spaces as shelf_spaces
+reload(shelf_spaces)
+
+from mechRig_toolkit.builds.Cambot_rig import build as cambot_build
+reload(cambot_build)
+
+from mechRig_toolkit.builds.Cambot_rig import legs as cambot_legs
+reload(cambot_legs)
+
+
+class Timer(object):
+    """Context manager that records elapsed wall time in seconds
+
+    Usage:
+        with Timer() as t:
+            do_something()
+        print(t.elapsed)
+    """
+
+    def __init__(self):
+        self.start = 0.0
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.start = timeit.default_timer()
+        return self
+
+    def __exit__(self, *args):
+        self.elapsed = timeit.default_timer() - self.start
+
+
+def report(title, timings, baseline=None):
+    """Logs timings dict {label: seconds} and the speedup of each label over the baseline label"""
+    LOG.info('===== {} ====='.format(title))
+    for label in sorted(timings, key=timings.get, reverse=True):
+        msg = '{:<30} {:>10.4f}s'.format(label, timings[label])
+        if baseline and baseline in timings and timings[label] > 0.0:
+            msg += '  ({:.1f}x)'.format(timings[baseline] / timings[label])
+        LOG.info(msg)
+    return timings
+
+
+def new_scene():
+    """Opens a new empty scene for benchmarking"""
+    cmds.file(force=True, new=True)
+
+
+def position_query(num_vertices=20000):
+    """Compares points.get_positions() against the original per-item nodeType/xform loop
+
+    Args:
+        num_vertices:  Approximate number of vertices on the benchmark mesh
+
+    Example:
+        position_query(num_vertices=20000)
+    """
+    new_scene()
+    subdivs = max(int(math.ceil(math.sqrt(num_vertices))) - 1, 1)
+    plane = cmds.polyPlane(sx=subdivs, sy=subdivs, w=10, h=10, ch=False)[0]
+    cmds.select(clear=True)
+    jnt = cmds.joint(position=[1, 2, 3])
+    vtx_count = cmds.polyEvaluate(plane, vertex=True)
+    items = ['{}.vtx[0:{}]'.format(plane, vtx_count - 1), jnt]
+
+    with Timer() as bulk:
+        bulk_positions = points.get_positions(items)
+
+    with Timer() as per_item:
+        per_item_positions = points._xform_positions(items)
+
+    max_diff = max(abs(a - b) for a, b in zip(bulk_positions, per_item_positions))
+    LOG.info('Queried {} positions, max difference {}'.format(len(bulk_positions) / 3, max_diff))
+
+    return report('Position query ({} vertices)'.format(vtx_count),
+                  {'per-item xform': per_item.elapsed, 'points.get_positions': bulk.elapsed},
+                  baseline='per-item xform')
+
+
+def locator_creation(num_locators=5000):
+    """Compares locator.create_locators() against a spaceLocator/setAttr call per locator
+
+    Args:
+        num_locators:  Number of locators each method creates
+
+    Example:
+        locator_creation(num_locators=5000)
+    """
+    new_scene()
+    positions = list()
+    for i in range(num_locators):
+        positions.extend([i * 0.1, math.sin(i * 0.1), math.cos(i * 0.1)])
+
+    with Timer() as per_item:
+        for pos in points.iter_points(positions):
+            loc = cmds.spaceLocator(p=[0, 0, 0])
+            cmds.setAttr(loc[0] + '.translate', pos[0], pos[1], pos[2])
+
+    new_scene()
+    with Timer() as batched:
+        locator.create_locators(positions)
+
+    timings = report('Locator creation ({} locators)'.format(num_locators),
+                     {'spaceLocator + setAttr': per_item.elapsed, 'locator.create_locators': batched.elapsed},
+                     baseline='spaceLocator + setAttr')
+    LOG.info('Batched: {:.1f} microseconds per locator'.format(batched.elapsed / num_locators * 1000000.0))
+    return timings
+
+
+def orient_solver(num_joints=500, aim_axis=(1, 0, 0), up_axis=(0, 1, 0)):
+    """Compares orient.aim_matrix() joint orientation against aimConstraint/delete/makeIdentity
+
+    Orients randomly placed joints at random aim targets with random world up vectors both ways
+    and logs the largest difference between the resulting world rotation matrices.
+
+    Example:
+        orient_solver(num_joints=500)
+    """
+    new_scene()
+    rand = random.Random(0)
+    data = list()
+    for i in range(num_joints):
+        pos = [rand.uniform(-10, 10) for j in range(3)]
+        aim = [rand.uniform(-10, 10) for j in range(3)]
+        up = [rand.uniform(-1, 1) for j in range(3)]
+        cmds.select(clear=True)
+        jnt_a = cmds.joint(position=pos, orientation=[rand.uniform(-90, 90) for j in range(3)])
+        cmds.select(clear=True)
+        jnt_b = cmds.duplicate(jnt_a)[0]
+        tgt = cmds.spaceLocator(position=[0, 0, 0])[0]
+        cmds.setAttr('{}.translate'.format(tgt), *aim)
+        data.append((jnt_a, jnt_b, tgt, pos, aim, up))
+
+    with Timer() as constrained:
+        for jnt_a, jnt_b, tgt, pos, aim, up in data:
+            cmds.delete(cmds.aimConstraint(tgt, jnt_a, aim=aim_axis, upVector=up_axis, worldUpVector=up,
+                                           worldUpType='vector'))
+            cmds.joint(jnt_a, edit=True, zso=1)
+            cmds.makeIdentity(jnt_a, apply=1, r=True)
+
+    with Timer() as closed_form:
+        for jnt_a, jnt_b, tgt, pos, aim, up in data:
+            cmds.joint(jnt_b, edit=True, zso=1)
+            joints.set_joint_orientation(jnt_b, orient.aim_matrix(orient.subtract(aim, pos), up, aim_axis, up_axis))
+
+    max_diff = 0.0
+    for jnt_a, jnt_b, tgt, pos, aim, up in data:
+        mtx_a = cmds.xform(jnt_a, q=True, ws=True, matrix=True)
+        mtx_b = cmds.xform(jnt_b, q=True, ws=True, matrix=True)
+        max_diff = max([max_diff] + [abs(a - b) for a, b in zip(mtx_a, mtx_b)])
+    LOG.info('Oriented {} joints, max world matrix difference {}'.format(num_joints, max_diff))
+
+    return report('Joint orient ({} joints)'.format(num_joints),
+                  {'aimConstraint + delete': constrained.elapsed, 'orient.aim_matrix': closed_form.elapsed},
+                  baseline='aimConstraint + delete')
+
+
+def create_joint_chain(num_joints, name='chain', seed=0):
+    """Creates a zig-zagging joint chain, returns list of joints from root to tip"""
+    rand = random.Random(seed)
+    cmds.select(clear=True)
+    chain = list()
+    for i in range(num_joints):
+        pos = [i * 1.0, rand.uniform(-0.5, 0.5), rand.uniform(-0.5, 0.5)]
+        chain.append(cmds.joint(position=pos, name='{}{}_jnt'.format(name, i)))
+    cmds.select(clear=True)
+    return chain
+
+
+def joint_orient_chain(num_joints=500, aim_axis=(1, 0, 0), up_axis=(0, 1, 0), world_up=(0, 1, 0)):
+    """Compares joints.orientJoint() against joints.orientJointHierarchy() on a long joint chain
+
+    orientJointHierarchy() is timed solving one joint at a time with list math and, when NumPy
+    is available, solving every joint at once with the orient.py batch functions.
+
+    Example:
+        joint_orient_chain(num_joints=500)
+    """
+    new_scene()
+    chain_a = create_joint_chain(num_joints, name='reparent')
+    chain_b = create_joint_chain(num_joints, name='compensate')
+    chain_c = create_joint_chain(num_joints, name='batch') if orient.np is not None else list()
+
+    with Timer() as reparent:
+        joints.orientJoint(chain_a, aim_axis, up_axis, world_up)
+
+    with Timer() as compensate:
+        joints.orientJointHierarchy(chain_b, aim_axis, up_axis, world_up, batch=False)
+
+    timings = {'orientJoint': reparent.elapsed, 'orientJointHierarchy': compensate.elapsed}
+    compared = [('orientJointHierarchy', chain_b)]
+    if chain_c:
+        with Timer() as batch:
+            joints.orientJointHierarchy(chain_c, aim_axis, up_axis, world_up, batch=True)
+        timings['orientJointHierarchy batch'] = batch.elapsed
+        compared.append(('orientJointHierarchy batch', chain_c))
+    else:
+        LOG.warning('NumPy is not available, skipping the batch orientJointHierarchy timing')
+
+    for label, nodes in compared:
+        max_diff = 0.0
+        for jnt_a, jnt_b in zip(chain_a, nodes):
+            mtx_a = cmds.xform(jnt_a, q=True, ws=True, matrix=True)
+            mtx_b = cmds.xform(jnt_b, q=True, ws=True, matrix=True)
+            max_diff = max([max_diff] + [abs(a - b) for a, b in zip(mtx_a, mtx_b)])
+        LOG.info('{}: oriented {} joint chain, max world matrix difference {}'.format(label, num_joints, max_diff))
+
+    return report('Joint chain orient ({} joints)'.format(num_joints), timings, baseline='orientJoint')
+
+
+def create_skinned_plane(num_vertices, num_influences, max_influences=4):
+    """Creates a polyPlane skinned to a row of joints, returns (plane, skinCluster, joints)"""
+    subdivs = max(int(math.ceil(math.sqrt(num_vertices))) - 1, 1)
+    plane = cmds.polyPlane(sx=subdivs, sy=subdivs, w=num_influences, h=num_influences, ch=False)[0]
+    cmds.select(clear=True)
+    jnts = list()
+    for i in range(num_influences):
+        cmds.select(clear=True)
+        jnts.append(cmds.joint(position=[i - num_influences * 0.5, 0, 0], name='bench{}_jnt'.format(i)))
+    sc = cmds.skinCluster(jnts, plane, toSelectedBones=True, maximumInfluences=max_influences,
+                          name='{}_sc'.format(plane))[0]
+    return plane, sc, jnts
+
+
+def skin_weights_io(num_vertices=200000, num_influences=20):
+    """Compares skin_io binary export/import against deformerWeights XML export/import
+
+    Files are written to a temporary directory which is removed afterwards.
+
+    Example:
+        skin_weights_io(num_vertices=200000, num_influences=20)
+    """
+    new_scene()
+    plane, sc, jnts = create_skinned_plane(num_vertices, num_influences)
+    vtx_count = cmds.polyEvaluate(plane, vertex=True)
+    temp_dir = tempfile.mkdtemp()
+    xml_file = '{}.xml'.format(plane)
+    skw_path = os.path.join(temp_dir, plane + skin_io.FILE_EXT)
+
+    try:
+        with Timer() as xml_export:
+            cmds.deformerWeights(xml_file, export=True, method='index', deformer=sc, path=temp_dir)
+
+        with Timer() as xml_import:
+            cmds.deformerWeights(xml_file, im=True, method='index', deformer=sc, path=temp_dir)
+            cmds.skinCluster(sc, edit=True, forceNormalizeWeights=True)
+
+        with Timer() as bin_export:
+            skin_io.export_weights(sc, skw_path)
+
+        with Timer() as bin_import:
+            skin_io.import_weights(sc, skw_path)
+
+        LOG.info('File size, xml: {:.2f} MB, binary: {:.2f} MB'.format(
+            os.path.getsize(os.path.join(temp_dir, xml_file)) / 1048576.0, os.path.getsize(skw_path) / 1048576.0))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    title = 'Skin weights ({} vertices, {} influences)'.format(vtx_count, num_influences)
+    timings = report(title + ' export', {'xml export': xml_export.elapsed, 'binary export': bin_export.elapsed},
+                     baseline='xml export')
+    timings.update(report(title + ' import', {'xml import': xml_import.elapsed, 'binary import': bin_import.elapsed},
+                          baseline='xml import'))
+    return timings
+
+
+def skin_weights_batch(num_meshes=150, num_vertices=5000, num_influences=20):
+    """Compares skin_io.export_weights() per mesh against skin_io.export_weights_batch()
+
+    Example:
+        skin_weights_batch(num_meshes=150, num_vertices=5000)
+    """
+    new_scene()
+    skin_clusters = list()
+    for i in range(num_meshes):
+        plane, sc, jnts = create_skinned_plane(num_vertices, num_influences)
+        skin_clusters.append(sc)
+    temp_dir = tempfile.mkdtemp()
+
+    try:
+        with Timer() as per_mesh:
+            for sc in skin_clusters:
+                skin_io.write_weights(os.path.join(temp_dir, sc + skin_io.FILE_EXT), skin_io.get_skin_weights(sc),
+                                      compress=True)
+
+        with Timer() as batched:
+            skin_io.export_weights_batch([(sc, os.path.join(temp_dir, sc + skin_io.FILE_EXT))
+                                          for sc in skin_clusters])
+
+        with Timer() as batched_import:
+            skin_io.import_weights_batch([(sc, os.path.join(temp_dir, sc + skin_io.FILE_EXT))
+                                          for sc in skin_clusters])
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    timings = report('Skin weight export ({} meshes)'.format(num_meshes),
+                     {'per mesh': per_mesh.elapsed, 'export_weights_batch': batched.elapsed}, baseline='per mesh')
+    LOG.info('Batch import of {} meshes: {:.4f}s'.format(num_meshes, batched_import.elapsed))
+    return timings
+
+
+def skin_transfer(num_vertices=100000, num_influences=20):
+    """Compares copySkinWeights closestPoint against skin_transfer.transfer_weights()
+
+    The target is a slightly offset, differently subdivided plane skinned to the same joints.
+    Checks that every method ends up with the same weighted influences on the target.
+
+    Example:
+        skin_transfer(num_vertices=100000)
+    """
+    new_scene()
+    source, src_sc, jnts = create_skinned_plane(num_vertices, num_influences)
+    subdivs = max(int(math.ceil(math.sqrt(num_vertices))) - 2, 1)
+    targets = list()
+    for i in range(3):
+        tgt = cmds.polyPlane(sx=subdivs, sy=subdivs, w=num_influences, h=num_influences, ch=False)[0]
+        cmds.setAttr('{}.translateY'.format(tgt), 0.01)
+        targets.append((tgt, cmds.skinCluster(jnts, tgt, toSelectedBones=True, name='{}_sc'.format(tgt))[0]))
+
+    with Timer() as copy_weights:
+        cmds.copySkinWeights(sourceSkin=src_sc, destinationSkin=targets[0][1], surfaceAssociation='closestPoint',
+                             influenceAssociation='oneToOne', noMirror=True, smooth=False)
+
+    with Timer() as closest:
+        transfer.transfer_weights(src_sc, targets[1][1], barycentric=False)
+
+    with Timer() as barycentric:
+        transfer.transfer_weights(src_sc, targets[2][1], barycentric=True)
+
+    expected = sorted(cmds.skinCluster(targets[0][1], query=True, weightedInfluence=True))
+    for tgt, sc in targets[1:]:
+        if sorted(cmds.skinCluster(sc, query=True, weightedInfluence=True)) != expected:
+            LOG.warning('Weighted influences of {} do not match copySkinWeights'.format(sc))
+
+    return report('Skin transfer ({} -> {} vertices)'.format(cmds.polyEvaluate(source, vertex=True),
+                                                            cmds.polyEvaluate(targets[0][0], vertex=True)),
+                  {'copySkinWeights': copy_weights.elapsed, 'closest vertex': closest.elapsed,
+                   'barycentric': barycentric.elapsed},
+                  baseline='copySkinWeights')
+
+
+def skin_cluster_lookup(num_meshes=150, num_lookups=5):
+    """Compares mel findRelatedSkinCluster against skincluster.find_skin_cluster() and the group lookup
+
+    Each method resolves every mesh under a "geo" group num_lookups times, as the export, import
+    and build functions do when they run one after another.
+
+    Example:
+        skin_cluster_lookup(num_meshes=150)
+    """
+    new_scene()
+    geo = cmds.group(empty=True, name='geo')
+    meshes = list()
+    for i in range(num_meshes):
+        plane, sc, jnts = create_skinned_plane(100, 2)
+        meshes.append(cmds.parent(plane, geo)[0])
+
+    with Timer() as mel_lookup:
+        for i in range(num_lookups):
+            mel_results = [mel.eval('findRelatedSkinCluster("{}")'.format(mesh)) for mesh in meshes]
+
+    skincluster.clear_cache()
+    with Timer() as cached:
+        for i in range(num_lookups):
+            cached_results = [skincluster.find_skin_cluster(mesh) for mesh in meshes]
+
+    skincluster.clear_cache()
+    with Timer() as group:
+        group_results = skincluster.find_skin_clusters_in_group(geo)
+
+    if mel_results != cached_results or mel_results != [group_results[mesh] for mesh in meshes]:
+        LOG.warning('skincluster results do not match findRelatedSkinCluster')
+
+    return report('SkinCluster lookup ({} meshes x {})'.format(num_meshes, num_lookups),
+                  {'findRelatedSkinCluster': mel_lookup.elapsed, 'find_skin_cluster': cached.elapsed,
+                   'find_skin_clusters_in_group': group.elapsed},
+                  baseline='findRelatedSkinCluster')
+
+
+def create_cable_surface(name='cable_srf', length=50, spans=40):
+    """Creates a long, thin NURBS surface along X like a cable ribbon, returns its transform"""
+    srf = cmds.nurbsPlane(axis=[0, 1, 0], width=length, lengthRatio=1.0 / length, patchesU=spans, patchesV=1,
+                          constructionHistory=False, name=name)[0]
+    return srf
+
+
+def follicle_creation(num_follicles=200):
+    """Compares createNode/connectAttr/setAttr per follicle against follicles.create_follicles()
+
+    Example:
+        follicle_creation(num_follicles=200)
+    """
+    new_scene()
+    srf = create_cable_surface()
+    srf_shp = cmds.listRelatives(srf, shapes=True)[0]
+    params = follicles.grid_parameters(num_follicles, 1)
+
+    with Timer() as per_command:
+        fol_tfms = list()
+        for i in range(num_follicles):
+            fol = cmds.createNode('follicle')
+            fol_tfm = cmds.listRelatives(fol, parent=True)[0]
+            fol_tfms.append(fol_tfm)
+            cmds.joint()
+            cmds.connectAttr('{}.worldMatrix[0]'.format(srf_shp), '{}.inputWorldMatrix'.format(fol))
+            cmds.connectAttr('{}.local'.format(srf_shp), '{}.inputSurface'.format(fol))
+            cmds.connectAttr('{}.outTranslate'.format(fol), '{}.translate'.format(fol_tfm))
+            cmds.connectAttr('{}.outRotate'.format(fol), '{}.rotate'.format(fol_tfm))
+            cmds.setAttr('{}.parameterU'.format(fol), params[i * 2])
+            cmds.setAttr('{}.parameterV'.format(fol), params[i * 2 + 1])
+        cmds.parent(fol_tfms, cmds.createNode('transform', name='per_command_follicle_grp'))
+
+    with Timer() as batched:
+        follicles.create_follicles(srf, params, create_joints=True)
+
+    return report('Follicle creation ({} follicles)'.format(num_follicles),
+                  {'per command': per_command.elapsed, 'follicles.create_follicles': batched.elapsed},
+                  baseline='per command')
+
+
+# evaluationManager modes played by the evaluation benchmarks, 'off' is DG evaluation
+EVALUATION_MODES = ('off', 'parallel')
+
+
+def playback(num_frames, modes=EVALUATION_MODES):
+    """Times real playback of frames 1 - num_frames in each evaluation mode, returns {mode: fps}
+
+    The scene is played with cmds.play(), every frame as fast as possible and without looping,
+    so evaluation and drawing are measured as in interactive playback.  Each mode is set
+    explicitly with evaluationManager and played once untimed first, so graph construction is
+    not counted.  Playback needs an interactive session, batch mode returns an empty dict.
+    """
+    if cmds.about(batch=True):
+        LOG.error('Playback benchmarks need an interactive Maya session')
+        return dict()
+
+    previous_mode = cmds.evaluationManager(query=True, mode=True)[0]
+    cmds.playbackOptions(minTime=1, maxTime=num_frames, loop='once', playbackSpeed=0, maxPlaybackSpeed=0)
+    results = dict()
+    try:
+        for mode in modes:
+            cmds.evaluationManager(mode=mode)
+            cmds.currentTime(1)
+            cmds.play(wait=True)
+
+            cmds.currentTime(1)
+            with Timer() as t:
+                cmds.play(wait=True)
+            results[mode] = num_frames / t.elapsed if t.elapsed else 0.0
+    finally:
+        cmds.evaluationManager(mode=previous_mode)
+    return results
+
+
+def pin_evaluation(counts=(50, 200, 1000), num_frames=50):
+    """Compares evaluation time of follicles against follicles.create_surface_pins() on a deforming surface
+
+    The surface is deformed by an animated sine deformer and played back in DG and parallel
+    evaluation modes, see playback().
+
+    Example:
+        pin_evaluation(counts=(50, 200, 1000))
+    """
+    timings = dict()
+    for count in counts:
+        for mode in ['follicle', 'pin']:
+            new_scene()
+            srf = create_cable_surface()
+            sine, sine_handle = cmds.nonLinear(srf, type='sine', amplitude=2.0, wavelength=1.0)
+            cmds.setKeyframe(sine, attribute='offset', time=1, value=0)
+            cmds.setKeyframe(sine, attribute='offset', time=num_frames, value=5)
+            cmds.playbackOptions(minTime=1, maxTime=num_frames)
+
+            follicles.create_follicles_along_surface(srf, count, create_joints=False, mode=mode)
+            for eval_mode, fps in playback(num_frames).items():
+                timings['{} {} {}'.format(count, mode, eval_mode)] = num_frames / fps if fps else 0.0
+                LOG.info('{} {}s, {} evaluation: {:.1f} fps'.format(count, mode, eval_mode, fps))
+
+    for count in counts:
+        report('Surface attachment evaluation ({} per {} frames)'.format(count, num_frames),
+               dict((label, timings.get('{} {}'.format(count, label), 0.0))
+                    for label in ['{} {}'.format(mode, eval_mode) for mode in ['follicle', 'pin']
+                                  for eval_mode in EVALUATION_MODES]),
+               baseline='follicle off')
+    return timings
+
+
+def create_space_targets(num_spaces, num_frames):
+    """Creates num_spaces animated locators to use as space targets"""
+    targets = list()
+    for i in range(num_spaces):
+        target = cmds.spaceLocator(name='space_{}_loc'.format(i))[0]
+        for frame, offset in [(1, 0.0), (num_frames, 10.0)]:
+            cmds.setKeyframe(target, attribute='translateX', time=frame, value=i * 5.0 + offset)
+            cmds.setKeyframe(target, attribute='rotateY', time=frame, value=offset * 9.0 * (i + 1))
+        targets.append(target)
+    return targets
+
+
+def space_switch_evaluation(counts=(10, 50, 200), num_spaces=4, num_frames=50):
+    """Compares playback of the constraint and matrix backends of the shelf space switch networks
+
+    Every control gets num_spaces animated space targets and its spaces enum is keyed to a
+    different space every few frames, played back in DG and parallel evaluation modes.
+
+    Example:
+        space_switch_evaluation(counts=(10, 50, 200))
+    """
+    timings = dict()
+    for count in counts:
+        for backend in shelf_spaces.BACKENDS:
+            new_scene()
+            cmds.playbackOptions(minTime=1, maxTime=num_frames)
+            targets = create_space_targets(num_spaces, num_frames)
+
+            ctls = list()
+            for i in range(count):
+                zero = cmds.createNode('transform', name='ctl_{}_zero'.format(i))
+                ctl = cmds.createNode('transform', name='ctl_{}_ctl'.format(i), parent=zero)
+                cmds.setAttr(zero + '.translate', random.uniform(-10, 10), random.uniform(0, 10), 0)
+                shelf_spaces.create(zero, ctl, backend=backend)
+                for target in targets:
+                    shelf_spaces.add(zero, target)
+                for frame in range(1, num_frames + 1, 5):
+                    cmds.setKeyframe(ctl, attribute=shelf_spaces.SPACEATTR, time=frame,
+                                     value=(frame // 5 + i) % (num_spaces + 1), outTangentType='step')
+                ctls.append(ctl)
+
+            for eval_mode, fps in playback(num_frames).items():
+                timings['{} {} {}'.format(count, backend, eval_mode)] = num_frames / fps if fps else 0.0
+                LOG.info('{} {} controls, {} evaluation: {:.1f} fps'.format(count, backend, eval_mode, fps))
+
+    for count in counts:
+        report('Space switch evaluation ({} controls per {} frames)'.format(count, num_frames),
+               dict((label, timings.get('{} {}'.format(count, label), 0.0))
+                    for label in ['{} {}'.format(backend, eval_mode) for backend in shelf_spaces.BACKENDS
+                                  for eval_mode in EVALUATION_MODES]),
+               baseline='constraint off')
+    return timings
+
+
+def build_cambot_legs(soft_ik_method, num_frames):
+    """Imports the Cambot build scene, rigs its legs with legs.rig_legs() and animates them
+
+    Every leg control is animated from bent to past full extension of its leg, measured at its
+    soft IK control along the line from the upper leg joint.
+
+    Returns:
+        Number of legs, None if the legs could not be rigged
+    """
+    new_scene()
+    cmds.file(os.path.join(cambot_build.PROJ_PATH, 'scenes', cambot_build.RIG_BUILD_FILE), i=True)
+    cmds.playbackOptions(minTime=1, maxTime=num_frames)
+    if cambot_legs.rig_legs(soft_ik_method=soft_ik_method) is None:
+        return None
+
+    leg_table = cambot_legs.read_leg_table(cambot_legs.LEGS_FILE)['legs']
+    for leg in leg_table:
+        chain_length = ik.get_softIK_chain('{}Upper_ikh'.format(leg['name']))[3]
+        start_pos = cmds.xform(leg['joints'][1].replace('_jnt', '_ikj'), q=True, ws=True, t=True)
+        soft_pos = cmds.xform(leg['soft_ik_control'], q=True, ws=True, t=True)
+        ctl_pos = cmds.xform(leg['control'], q=True, ws=True, t=True)
+        direction = orient.normalize(orient.subtract(soft_pos, start_pos))
+        for frame, ratio in ((1, 0.7), (num_frames, 1.2)):
+            target = [start_pos[i] + direction[i] * chain_length * ratio for i in range(3)]
+            cmds.currentTime(frame)
+            cmds.xform(leg['control'], ws=True, t=[ctl_pos[i] + target[i] - soft_pos[i] for i in range(3)])
+            cmds.setKeyframe(leg['control'], attribute='translate', time=frame)
+    cmds.currentTime(1)
+    return len(leg_table)
+
+
+def soft_ik_evaluation(num_frames=100):
+    """Compares playback of ik.add_softIK() utility node networks against the mechRigSoftIk plug-in node
+
+    The Cambot legs are built from the Cambot build scene with legs.rig_legs() once per soft IK
+    method (see build_cambot_legs()), then played back in DG and parallel evaluation modes.
+    Needs the Cambot Maya project set as the current project, see builds/Cambot_rig/build.py.
+
+    Example:
+        soft_ik_evaluation(num_frames=100)
+    """
+    timings = dict()
+    num_legs = 0
+    for method in ik.SOFT_IK_METHODS:
+        num_legs = build_cambot_legs(method, num_frames)
+        if num_legs is None:
+            LOG.error('Could not rig the Cambot legs, is the Cambot project set?')
+            return None
+        LOG.info('{}: {} nodes in the rigged scene'.format(method, len(cmds.ls())))
+
+        for eval_mode, fps in playback(num_frames).items():
+            timings['{} {}'.format(method, eval_mode)] = num_frames / fps if fps else 0.0
+            LOG.info('{} soft IK, {} legs, {} evaluation: {:.1f} fps'.format(method, num_legs, eval_mode, fps))
+
+    return report('Soft IK evaluation (Cambot, {} legs per {} frames)'.format(num_legs, num_frames), timings,
+                  baseline='network off')
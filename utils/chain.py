@@ -0,0 +1,229 @@
+"""
+chain.py
+
+Bulk joint chain analysis, local translates and world matrices of whole chains and hierarchies
+are read through the API in one pass instead of getAttr/xform calls per joint.
+
+The analysis returns NumPy arrays of aim axis, axis sign, bone lengths, chain length and
+planarity per chain, used by soft IK and pole vector setup.  NumPy is optional, it is only
+needed by the analyze functions.
+
+    from mechRig_toolkit.utils import chain
+
+    # Aim axes, bone lengths and planarity of a leg
+    data = chain.analyze_chain(['lf_legFrontUpper_ikj', 'lf_legFrontLower_ikj', 'lf_legFrontShin_ikj'])
+    data['aim_axes']
+    # Result: ['x', 'x'] #
+
+    # Every root to leaf chain below a joint, read in a single pass
+    for data in chain.analyze_hierarchy('cn_body_jnt'):
+        print(data['joints'][-1], data['chain_length'], data['planarity'])
+
+"""
+import logging
+
+logging.basicConfig()
+LOG = logging.getLogger(__name__)
+LOG.setLevel(logging.INFO)
+
+from maya.api import OpenMaya as om
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+AXES = ('x', 'y', 'z')
+
+# Below this length a bone or deviation is treated as zero
+EPSILON = 1.0e-10
+
+
+def get_chain(start_joint, end_joint):
+    """Returns joints from start_joint down to end_joint, walking up from end_joint
+
+    Example:
+        get_chain('lf_legFrontUpper_ikj', 'lf_legFrontShin_ikj')
+    """
+    path = om.MSelectionList().add(end_joint).getDagPath(0)
+    start_path = om.MSelectionList().add(start_joint).getDagPath(0)
+    joints = list()
+    while path.length():
+        joints.append(path.partialPathName())
+        if path == start_path:
+            return list(reversed(joints))
+        path.pop()
+    LOG.error('{} is not below {}'.format(end_joint, start_joint))
+    return list()
+
+
+def get_chain_data(joints):
+    """Returns {'translates': [[x, y, z], ...], 'matrices': [[16 floats], ...]} of joints in one API pass
+
+    Translates are local (as getAttr .translate), matrices are world matrices in row major order.
+
+    Example:
+        get_chain_data(['joint1', 'joint2', 'joint3'])
+    """
+    sel = om.MSelectionList()
+    for jnt in joints:
+        sel.add(jnt)
+    translates = list()
+    matrices = list()
+    for i in range(len(joints)):
+        dag_path = sel.getDagPath(i)
+        translate = om.MFnTransform(dag_path).translation(om.MSpace.kTransform)
+        mtx = dag_path.inclusiveMatrix()
+        translates.append([translate.x, translate.y, translate.z])
+        matrices.append([mtx.getElement(r, c) for r in range(4) for c in range(4)])
+    return {'translates': translates, 'matrices': matrices}
+
+
+def aim_axis(translate):
+    """Returns (axis index, sign) of the largest translate component, the axis a parent joint aims down
+
+    Ties pick the last axis, as ik.get_aim_axis() always has.
+
+    Example:
+        aim_axis([0.0, -4.5, 0.2])
+        # Result: (1, -1) #
+    """
+    abs_trans = [abs(value) for value in translate]
+    index = max(i for i in range(3) if abs_trans[i] == max(abs_trans))
+    return index, -1 if translate[index] < 0.0 else 1
+
+
+def axis_name(index, sign):
+    """Returns an axis as 'x', 'y', 'z' or negated '-x', '-y', '-z'"""
+    return '{}{}'.format('-' if sign < 0 else '', AXES[index])
+
+
+# =================================================
+# NumPy analysis
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('NumPy is required for chain analysis, use get_chain_data() instead')
+
+
+def _analyze(joints, translates, matrices):
+    """Returns the analysis dict of one chain from (N, 3) translates and (N, 4, 4) world matrices"""
+    positions = matrices[:, 3, :3]
+
+    # Each bone is described by its child joint's local translate
+    bones = translates[1:]
+    abs_bones = np.abs(bones)
+    axes = 2 - np.argmax(abs_bones[:, ::-1], axis=1) if len(bones) else np.zeros(0, dtype=int)
+    signs = np.where(bones[np.arange(len(bones)), axes] < 0.0, -1, 1)
+    bone_lengths = np.sqrt(np.einsum('ij,ij->i', bones, bones))
+
+    # Best fit plane through the world positions, deviation is the largest distance from it
+    normal = np.zeros(3)
+    planarity = 0.0
+    if len(positions) >= 3:
+        centered = positions - positions.mean(axis=0)
+        normal = np.linalg.svd(centered)[2][-1]
+        planarity = float(np.abs(centered.dot(normal)).max())
+        if planarity < EPSILON:
+            planarity = 0.0
+
+    return {'joints': list(joints),
+            'translates': translates,
+            'matrices': matrices,
+            'positions': positions,
+            'aim_axis': axes,
+            'aim_sign': signs,
+            'aim_axes': [axis_name(axis, sign) for axis, sign in zip(axes, signs)],
+            'bone_lengths': bone_lengths,
+            'axis_lengths': abs_bones[np.arange(len(bones)), axes],
+            'chain_length': float(bone_lengths.sum()),
+            'plane_normal': normal,
+            'planarity': planarity}
+
+
+def analyze_chain(joints):
+    """Returns analysis of a joint chain ordered root to tip
+
+    Returns:
+        dict of
+            joints:         Joint names
+            translates:     (N, 3) local translates
+            matrices:       (N, 4, 4) world matrices
+            positions:      (N, 3) world positions
+            aim_axis:       (N-1,) axis index (0, 1, 2) each joint aims down to its child
+            aim_sign:       (N-1,) 1 or -1 when aiming down the negative axis
+            aim_axes:       Axis names 'x', '-y', ... as returned by ik.get_aim_axis()
+            bone_lengths:   (N-1,) bone lengths
+            axis_lengths:   (N-1,) absolute child translates along the aim axis
+            chain_length:   Summed bone lengths
+            plane_normal:   Normal of the best fit plane through the positions, zero below 3 joints
+            planarity:      Largest distance of a joint from that plane, 0.0 for planar chains
+
+    Example:
+        analyze_chain(['lf_legFrontUpper_ikj', 'lf_legFrontLower_ikj', 'lf_legFrontShin_ikj'])
+    """
+    _require_numpy()
+    data = get_chain_data(joints)
+    return _analyze(joints, np.array(data['translates'], dtype=float).reshape(-1, 3),
+                    np.array(data['matrices'], dtype=float).reshape(-1, 4, 4))
+
+
+def analyze_chains(chains):
+    """Returns analyze_chain() of many chains, every joint is read once in a single API pass
+
+    Example:
+        analyze_chains([['lf_hip_jnt', 'lf_knee_jnt', 'lf_ankle_jnt'], ['rt_hip_jnt', 'rt_knee_jnt', 'rt_ankle_jnt']])
+    """
+    _require_numpy()
+    joints = list()
+    indices = dict()
+    for chain_joints in chains:
+        for jnt in chain_joints:
+            if jnt not in indices:
+                indices[jnt] = len(joints)
+                joints.append(jnt)
+
+    data = get_chain_data(joints)
+    translates = np.array(data['translates'], dtype=float).reshape(-1, 3)
+    matrices = np.array(data['matrices'], dtype=float).reshape(-1, 4, 4)
+
+    results = list()
+    for chain_joints in chains:
+        rows = [indices[jnt] for jnt in chain_joints]
+        results.append(_analyze(chain_joints, translates[rows], matrices[rows]))
+    return results
+
+
+def get_hierarchy_chains(root):
+    """Returns every root to leaf joint chain below root as lists of joint names
+
+    Example:
+        get_hierarchy_chains('cn_body_jnt')
+    """
+    chains = list()
+    root_path = om.MSelectionList().add(root).getDagPath(0)
+    it_dag = om.MItDag(om.MItDag.kDepthFirst, om.MFn.kJoint)
+    it_dag.reset(root_path, om.MItDag.kDepthFirst, om.MFn.kJoint)
+    while not it_dag.isDone():
+        dag_path = it_dag.getPath()
+        has_joint_child = any(dag_path.child(i).hasFn(om.MFn.kJoint) for i in range(dag_path.childCount()))
+        if not has_joint_child:
+            joints = list()
+            while dag_path.length() and dag_path.hasFn(om.MFn.kJoint):
+                joints.append(dag_path.partialPathName())
+                if dag_path == root_path:
+                    break
+                dag_path.pop()
+            chains.append(list(reversed(joints)))
+        it_dag.next()
+    return chains
+
+
+def analyze_hierarchy(root):
+    """Returns analyze_chain() of every root to leaf chain below root, see analyze_chains()
+
+    Example:
+        analyze_hierarchy('cn_body_jnt')
+    """
+    return analyze_chains(get_hierarchy_chains(root))
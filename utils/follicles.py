@@ -8,6 +8,15 @@
     # User prompted follicle creation on selected NURBS surface
     follicles.create_follicles_along_selected_surface()
 
+    # 10 x 3 grid of follicles created in one batch
+    follicles.create_follicle_grid('cn_cable_srf1', 10, 3, create_joints=True)
+
+    # Lightweight matrix pins instead of follicle nodes
+    follicles.create_follicles_along_surface('cn_cable_srf1', 200, mode='pin')
+
+    # Evenly spaced by distance along the surface rather than by parameter
+    follicles.create_follicles_along_surface('cn_cable_srf1', 35, uniform=True)
+
 """
 
 import logging
@@ -16,9 +25,23 @@ logging.basicConfig()
 LOG = logging.getLogger(__name__)
 LOG.setLevel(logging.INFO)
 
-import re
+import bisect
+from array import array
 
 from maya import cmds
+from maya.api import OpenMaya as om
+
+from mechRig_toolkit.utils import points
+reload(points)
+
+from mechRig_toolkit.utils import apiundo
+reload(apiundo)
+
+# Arc length samples taken per surface span for uniform distribution
+SAMPLES_PER_SPAN = 20
+
+# {(surface shape, direction, fixed parameter): (surface fingerprint, cumulative lengths)}
+_ARC_LENGTH_CACHE = dict()
 
 
 def create_follicles_along_selected_surface():
@@ -62,96 +85,357 @@ def create_follicles_along_selected_surface():
             raise
 
 
-def create_follicle_at_surface_points():
+def create_follicle_at_surface_points(items=None, create_joints=False):
     """Select surface point on NURBS surface, a follicle node will be created at that location
 
+    All surface points are parsed in one pass and grouped by surface, each surface is resolved
+    once and gets its follicles from one batch.  Items that are not surface points are skipped
+    and listed in a summary.
+
     Usage:
         RMB click over NURBS surface and select "Surface Point".  Select point on surface and run
         create_follicle_at_surface_points()
     """
-    selection = cmds.ls(selection=True, flatten=True)
-    if selection:
+    if items is None:
+        items = cmds.ls(selection=True, flatten=True)
+    if items:
+        # Group [u, v] parameters by surface, keeping selection order
+        surfaces = list()
+        surface_params = dict()
+        invalid = list()
+        for sp in items:
+            match = points.SURFACE_POINT_RE.match(sp)
+            if not match:
+                invalid.append(sp)
+                continue
+            surf = match.group('node')
+            if surf not in surface_params:
+                surfaces.append(surf)
+                surface_params[surf] = array('d')
+            surface_params[surf].extend([float(match.group('u')), float(match.group('v'))])
+
         fol_return = list()
-        for sp in selection:
-            if '.uv' in sp:
-                LOG.info('Working on {}'.format(sp))
-                # Get surface and uv values
-                surf = sp.split('.')[0]
-                surf_shp = cmds.listRelatives(surf, shapes=True)[0]
-                uv_val = re.findall(r"\[[^\]]*\]", sp)
-                u_val = float(uv_val[0][1:-1])
-                v_val = float(uv_val[1][1:-1])
-
-                # Create follicle node
-                fol = cmds.createNode('follicle')
-                fol_tfm = cmds.listRelatives(fol, parent=True)[0]
-
-                # Make connections
-                cmds.connectAttr('{}.worldMatrix[0]'.format(surf_shp), '{}.inputWorldMatrix'.format(fol))
-                cmds.connectAttr('{}.local'.format(surf_shp), '{}.inputSurface'.format(fol))
-
-                # Set paramU/V value on follicle shape
-                cmds.setAttr('{}.parameterU'.format(fol), u_val)
-                cmds.setAttr('{}.parameterV'.format(fol), v_val)
-
-                # Connect follicle output to follicle transform
-                cmds.connectAttr('{}.outTranslate'.format(fol), '{}.translate'.format(fol_tfm))
-                cmds.connectAttr('{}.outRotate'.format(fol), '{}.rotate'.format(fol_tfm))
-
-                fol_return.append(fol_tfm)
-
-            else:
-                LOG.error('{} is not a surface point'.format(sp))
-                return
+        for surf in surfaces:
+            try:
+                fn_surf = om.MFnNurbsSurface(get_surface_shape(surf))
+            except (RuntimeError, TypeError):
+                invalid.extend('{}.uv[{}][{}]'.format(surf, *uv) for uv in zip(surface_params[surf][0::2],
+                                                                             surface_params[surf][1::2]))
+                continue
+
+            # Surface points are in surface parameter space, follicles use normalized parameters
+            u_min, u_max = fn_surf.knotDomainInU
+            v_min, v_max = fn_surf.knotDomainInV
+            params = surface_params[surf]
+            for i in range(0, len(params), 2):
+                params[i] = (params[i] - u_min) / (u_max - u_min)
+                params[i + 1] = (params[i + 1] - v_min) / (v_max - v_min)
+
+            fol_return.extend(create_follicles(surf, params, create_joints=create_joints))
+            LOG.info('Created {} follicles on {}'.format(len(params) // 2, surf))
+
+        if invalid:
+            LOG.warning('Skipped {} items that are not NURBS surface points: {}'.format(len(invalid), ', '.join(invalid)))
         return fol_return
 
 
-def create_follicles_along_surface(surface_name, number_of_follicles, direction="u", create_joints=True):
+def create_follicles_along_surface(surface_name, number_of_follicles, direction="u", create_joints=True,
+                                   mode='follicle', uniform=False):
     """Utility to create specified number follicles evenly spaced along one direction of surface
 
+    mode 'pin' attaches transforms with create_surface_pins() instead of follicle nodes, uniform
+    spaces them evenly by arc length instead of by parameter
+
     create_follicles_along_surface('cn_cable_srf1', 35, direction="u", create_joints=True)
     """
     if cmds.objExists(surface_name):
-        surf_shp = cmds.listRelatives(surface_name, shapes=True)[0]
-
-        counter = 0.0
-        param_val = 0.0
-        spacing_val = 1.0 / float(number_of_follicles - 1)
-        fol_tfms = list()
-
-        while counter < number_of_follicles:
-
-            # Create follicles
-            fol = cmds.createNode('follicle')
-            fol_tfm = cmds.listRelatives(fol, parent=True)[0]
-            fol_tfms.append(fol_tfm)
-            if create_joints:
-                fol_jnt = cmds.joint()
-
-            # Connect surface and follicle
-            cmds.connectAttr('{}.worldMatrix[0]'.format(surf_shp), '{}.inputWorldMatrix'.format(fol))
-            cmds.connectAttr('{}.local'.format(surf_shp), '{}.inputSurface'.format(fol))
-
-            # Connect follicle output to follicle transform
-            cmds.connectAttr('{}.outTranslate'.format(fol), '{}.translate'.format(fol_tfm))
-            cmds.connectAttr('{}.outRotate'.format(fol), '{}.rotate'.format(fol_tfm))
-
-            # Set paramU/V value on follicle shape
-            if direction is 'u':
-                cmds.setAttr('{}.parameterU'.format(fol), param_val)
-                cmds.setAttr('{}.parameterV'.format(fol), .5)
-            else:
-                cmds.setAttr('{}.parameterU'.format(fol), .5)
-                cmds.setAttr('{}.parameterV'.format(fol), param_val)
-
-            # Increment values for next follicle
-            param_val = param_val + spacing_val
-            counter = counter + 1
-
-        fol_grp = cmds.createNode('transform', name='{}_follicle_grp'.format(surface_name))
-        cmds.parent(fol_tfms, fol_grp)
-
-        return True
+        if direction == 'u':
+            params = grid_parameters(number_of_follicles, 1, surface_name if uniform else None)
+        else:
+            params = grid_parameters(1, number_of_follicles, surface_name if uniform else None)
+        return _create_attachments(surface_name, params, create_joints, mode)
+    else:
+        LOG.error('{} does not exist, cannot create follicles'.format(surface_name))
+        return
+
+
+def create_follicle_grid(surface_name, num_u, num_v, create_joints=True, mode='follicle', uniform=False):
+    """Creates num_u x num_v follicles evenly spaced in parameter space, rows of U and V
+
+    A row count of 1 places the row in the middle of the surface.  mode 'pin' attaches
+    transforms with create_surface_pins() instead of follicle nodes, uniform spaces them
+    evenly by arc length instead of by parameter
+
+    create_follicle_grid('cn_cable_srf1', 35, 2, create_joints=True)
+    """
+    if cmds.objExists(surface_name):
+        params = grid_parameters(num_u, num_v, surface_name if uniform else None)
+        return _create_attachments(surface_name, params, create_joints, mode)
     else:
-        LOG.error('{} does not exist, cannot create follicles')
+        LOG.error('{} does not exist, cannot create follicles'.format(surface_name))
         return
+
+
+def _create_attachments(surface_name, params, create_joints, mode):
+    """Creates follicles or pins (mode 'follicle' or 'pin') at params"""
+    if mode == 'pin':
+        return create_surface_pins(surface_name, params, create_joints=create_joints)
+    return create_follicles(surface_name, params, create_joints=create_joints)
+
+
+def get_surface_shape(surface_name):
+    """Returns MDagPath of a NURBS surface shape from its transform or shape name"""
+    surf_path = om.MGlobal.getSelectionListByName(surface_name).getDagPath(0)
+    if surf_path.hasFn(om.MFn.kTransform):
+        surf_path.extendToShape()
+    return surf_path
+
+
+def row_parameters(count):
+    """Returns count normalized parameters evenly spaced from 0 to 1, a single parameter is 0.5"""
+    if count == 1:
+        return [0.5]
+    return [i / float(count - 1) for i in range(count)]
+
+
+def grid_parameters(num_u, num_v, surface_name=None):
+    """Returns flat array('d') of [u, v, u, v, ...] normalized parameters of a num_u x num_v grid, U varying fastest
+
+    With surface_name the parameters are spaced evenly by arc length on that surface, U along each
+    V row and V along the middle of the surface.
+    """
+    params = array('d')
+    if surface_name:
+        v_params = arc_length_parameters(surface_name, num_v, direction='v') if num_v > 1 else [0.5]
+    else:
+        v_params = row_parameters(num_v)
+
+    for v_val in v_params:
+        if surface_name and num_u > 1:
+            u_params = arc_length_parameters(surface_name, num_u, direction='u', fixed_param=v_val)
+        else:
+            u_params = row_parameters(num_u)
+        for u_val in u_params:
+            params.extend([u_val, v_val])
+    return params
+
+
+def _surface_fingerprint(surf_path):
+    """Returns a hash of a surface's CVs, knots and world matrix, changes whenever its shape does"""
+    fn_surf = om.MFnNurbsSurface(surf_path)
+    values = [coord for pnt in fn_surf.cvPositions(om.MSpace.kObject) for coord in (pnt.x, pnt.y, pnt.z)]
+    values.extend(fn_surf.knotsInU())
+    values.extend(fn_surf.knotsInV())
+    mtx = surf_path.inclusiveMatrix()
+    values.extend(mtx.getElement(row, column) for row in range(4) for column in range(4))
+    return hash(tuple(values))
+
+
+def arc_length_table(surface_name, direction='u', fixed_param=0.5):
+    """Returns cumulative world space arc lengths sampled evenly in parameter along one direction
+
+    Sample i of n is at normalized parameter i / n.  Tables are cached per surface, direction
+    and fixed parameter, and resampled only when the surface's CVs, knots or transform change.
+
+    Args:
+        surface_name:  NURBS surface transform or shape
+        direction:     'u' or 'v', the direction the lengths are measured in
+        fixed_param:   Normalized parameter of the other direction
+    """
+    surf_path = get_surface_shape(surface_name)
+    key = (surf_path.fullPathName(), direction, fixed_param)
+    fingerprint = _surface_fingerprint(surf_path)
+    if key in _ARC_LENGTH_CACHE and _ARC_LENGTH_CACHE[key][0] == fingerprint:
+        return _ARC_LENGTH_CACHE[key][1]
+
+    fn_surf = om.MFnNurbsSurface(surf_path)
+    u_min, u_max = fn_surf.knotDomainInU
+    v_min, v_max = fn_surf.knotDomainInV
+    spans = fn_surf.numSpansInU if direction == 'u' else fn_surf.numSpansInV
+    num_samples = max(spans * SAMPLES_PER_SPAN, 2)
+
+    lengths = array('d')
+    prev = None
+    for i in range(num_samples + 1):
+        param = i / float(num_samples)
+        if direction == 'u':
+            pnt = fn_surf.getPointAtParam(u_min + param * (u_max - u_min), v_min + fixed_param * (v_max - v_min),
+                                          om.MSpace.kWorld)
+        else:
+            pnt = fn_surf.getPointAtParam(u_min + fixed_param * (u_max - u_min), v_min + param * (v_max - v_min),
+                                          om.MSpace.kWorld)
+        lengths.append(lengths[-1] + pnt.distanceTo(prev) if prev is not None else 0.0)
+        prev = pnt
+
+    _ARC_LENGTH_CACHE[key] = (fingerprint, lengths)
+    return lengths
+
+
+def invert_arc_lengths(lengths, count):
+    """Returns count normalized parameters evenly spaced by length in a cumulative arc length table"""
+    total = lengths[-1]
+    num_samples = len(lengths) - 1
+    params = list()
+    for target in row_parameters(count):
+        target *= total
+        idx = min(max(bisect.bisect_left(lengths, target), 1), num_samples)
+        segment = lengths[idx] - lengths[idx - 1]
+        fraction = (target - lengths[idx - 1]) / segment if segment > 0.0 else 0.0
+        params.append((idx - 1 + fraction) / num_samples)
+    return params
+
+
+def arc_length_parameters(surface_name, count, direction='u', fixed_param=0.5):
+    """Returns count normalized parameters evenly spaced by arc length along one direction of a surface
+
+    arc_length_parameters('cn_cable_srf1', 35, direction='u')
+    """
+    return invert_arc_lengths(arc_length_table(surface_name, direction, fixed_param), count)
+
+
+def create_follicles(surface_name, params, create_joints=False, name=None):
+    """Creates a follicle for each [u, v] parameter pair on surface_name with a single DAG modifier
+
+    All follicles, their connections, parameters and optional joints are created in one modifier
+    instead of createNode/connectAttr/setAttr calls per follicle.  The modifier is committed to
+    Maya's undo queue with apiundo, so the follicles are removed with a single undo.
+
+    Args:
+        surface_name:   NURBS surface transform or shape
+        params:         Flat [u, v, u, v, ...] normalized parameters
+        create_joints:  Create a joint under each follicle
+        name:           Base name of the follicles and group, defaults to surface_name
+
+    Returns:
+        List of follicle transform names
+
+    Example:
+        create_follicles('cn_cable_srf1', grid_parameters(35, 1), create_joints=True)
+    """
+    name = name or surface_name
+    fn_surf = om.MFnDagNode(get_surface_shape(surface_name))
+    surf_matrix = fn_surf.findPlug('worldMatrix', False).elementByLogicalIndex(0)
+    surf_local = fn_surf.findPlug('local', False)
+    num_fols = len(params) // 2
+
+    # Pass 1 - create group, follicle transforms, follicle shapes and joints
+    mod = om.MDagModifier()
+    fol_grp = mod.createNode('transform')
+    fol_tfms = [mod.createNode('transform', fol_grp) for i in range(num_fols)]
+    fols = [mod.createNode('follicle', fol_tfm) for fol_tfm in fol_tfms]
+    fol_jnts = [mod.createNode('joint', fol_tfm) for fol_tfm in fol_tfms] if create_joints else list()
+    mod.doIt()
+
+    # Pass 2 - names, connections and parameters
+    mod.renameNode(fol_grp, '{}_follicle_grp'.format(name))
+    for i, (fol_tfm, fol) in enumerate(zip(fol_tfms, fols)):
+        fol_name = '{}_follicle{}'.format(name, i + 1)
+        mod.renameNode(fol_tfm, fol_name)
+        mod.renameNode(fol, '{}Shape'.format(fol_name))
+        if create_joints:
+            mod.renameNode(fol_jnts[i], '{}_jnt'.format(fol_name))
+
+        fn_fol = om.MFnDependencyNode(fol)
+        fn_tfm = om.MFnDependencyNode(fol_tfm)
+        mod.connect(surf_matrix, fn_fol.findPlug('inputWorldMatrix', False))
+        mod.connect(surf_local, fn_fol.findPlug('inputSurface', False))
+        mod.connect(fn_fol.findPlug('outTranslate', False), fn_tfm.findPlug('translate', False))
+        mod.connect(fn_fol.findPlug('outRotate', False), fn_tfm.findPlug('rotate', False))
+        mod.newPlugValueDouble(fn_fol.findPlug('parameterU', False), params[i * 2])
+        mod.newPlugValueDouble(fn_fol.findPlug('parameterV', False), params[i * 2 + 1])
+    apiundo.do_it(mod)
+
+    return [om.MFnDagNode(fol_tfm).partialPathName() for fol_tfm in fol_tfms]
+
+
+def create_surface_pins(surface_name, params, create_joints=False, name=None, offset_parent_matrix=None):
+    """Attaches a transform to surface_name at each [u, v] parameter pair without follicle nodes
+
+    Each pin is driven by pointOnSurfaceInfo -> vectorProduct -> fourByFourMatrix, X along the U
+    tangent, Y along the normal and Z their cross product.  Pins share nothing but the surface so
+    they evaluate in parallel, and skip the follicle's hair system code path.  All nodes are
+    created with one DG and one DAG modifier, committed to Maya's undo queue as one step.
+
+    Args:
+        surface_name:          NURBS surface transform or shape
+        params:                Flat [u, v, u, v, ...] normalized parameters
+        create_joints:         Create a joint under each pin
+        name:                  Base name of the pins and group, defaults to surface_name
+        offset_parent_matrix:  Drive the pin's offsetParentMatrix (Maya 2020+), otherwise its
+                               translate/rotate through a decomposeMatrix.  Defaults to whatever
+                               the running Maya supports
+
+    Returns:
+        List of pin transform names
+
+    Example:
+        create_surface_pins('cn_cable_srf1', grid_parameters(200, 1))
+    """
+    name = name or surface_name
+    if offset_parent_matrix is None:
+        offset_parent_matrix = int(cmds.about(apiVersion=True)) >= 20200000
+    surf_world = om.MFnDagNode(get_surface_shape(surface_name)).findPlug('worldSpace', False).elementByLogicalIndex(0)
+    num_pins = len(params) // 2
+
+    # Pass 1 - create pin transforms and their DG networks
+    dag_mod = om.MDagModifier()
+    pin_grp = dag_mod.createNode('transform')
+    pin_tfms = [dag_mod.createNode('transform', pin_grp) for i in range(num_pins)]
+    pin_jnts = [dag_mod.createNode('joint', pin_tfm) for pin_tfm in pin_tfms] if create_joints else list()
+    dag_mod.doIt()
+
+    dg_mod = om.MDGModifier()
+    networks = list()
+    for i in range(num_pins):
+        networks.append([dg_mod.createNode(node_type) for node_type in ['pointOnSurfaceInfo', 'vectorProduct',
+                                                                        'fourByFourMatrix']])
+        if not offset_parent_matrix:
+            networks[-1].append(dg_mod.createNode('decomposeMatrix'))
+    dg_mod.doIt()
+
+    # Pass 2 - names, connections and parameters
+    dag_mod.renameNode(pin_grp, '{}_pin_grp'.format(name))
+    dag_mod.newPlugValueBool(om.MFnDependencyNode(pin_grp).findPlug('inheritsTransform', False), False)
+    for i, pin_tfm in enumerate(pin_tfms):
+        pin_name = '{}_pin{}'.format(name, i + 1)
+        dag_mod.renameNode(pin_tfm, pin_name)
+        if create_joints:
+            dag_mod.renameNode(pin_jnts[i], '{}_jnt'.format(pin_name))
+
+        fn_poi, fn_vp, fn_fbf = [om.MFnDependencyNode(node) for node in networks[i][:3]]
+        for node, suffix in zip(networks[i], ['poi', 'vp', 'fbf', 'dcm']):
+            dg_mod.renameNode(node, '{}_{}'.format(pin_name, suffix))
+
+        dg_mod.connect(surf_world, fn_poi.findPlug('inputSurface', False))
+        dg_mod.newPlugValueBool(fn_poi.findPlug('turnOnPercentage', False), True)
+        dg_mod.newPlugValueDouble(fn_poi.findPlug('parameterU', False), params[i * 2])
+        dg_mod.newPlugValueDouble(fn_poi.findPlug('parameterV', False), params[i * 2 + 1])
+
+        # Z axis is tangent U x normal
+        dg_mod.newPlugValueInt(fn_vp.findPlug('operation', False), 2)
+        dg_mod.newPlugValueBool(fn_vp.findPlug('normalizeOutput', False), True)
+        dg_mod.connect(fn_poi.findPlug('normalizedTangentU', False), fn_vp.findPlug('input1', False))
+        dg_mod.connect(fn_poi.findPlug('normalizedNormal', False), fn_vp.findPlug('input2', False))
+
+        # Matrix rows X, Y, Z axes and position
+        rows = [(fn_poi, 'normalizedTangentU'), (fn_poi, 'normalizedNormal'), (fn_vp, 'output'), (fn_poi, 'position')]
+        for row, (fn_src, attr) in enumerate(rows):
+            for column, axis in enumerate('XYZ'):
+                dg_mod.connect(fn_src.findPlug('{}{}'.format(attr, axis), False),
+                               fn_fbf.findPlug('in{}{}'.format(row, column), False))
+
+        fn_tfm = om.MFnDependencyNode(pin_tfm)
+        if offset_parent_matrix:
+            dg_mod.connect(fn_fbf.findPlug('output', False), fn_tfm.findPlug('offsetParentMatrix', False))
+        else:
+            fn_dcm = om.MFnDependencyNode(networks[i][3])
+            dg_mod.connect(fn_fbf.findPlug('output', False), fn_dcm.findPlug('inputMatrix', False))
+            dg_mod.connect(fn_dcm.findPlug('outputTranslate', False), fn_tfm.findPlug('translate', False))
+            dg_mod.connect(fn_dcm.findPlug('outputRotate', False), fn_tfm.findPlug('rotate', False))
+    dag_mod.doIt()
+    dg_mod.doIt()
+
+    # The DG network connects to the DAG nodes, it is undone first and redone last
+    apiundo.commit(lambda: (dg_mod.undoIt(), dag_mod.undoIt()), lambda: (dag_mod.doIt(), dg_mod.doIt()))
+
+    return [om.MFnDagNode(pin_tfm).partialPathName() for pin_tfm in pin_tfms]
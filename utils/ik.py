@@ -1,12 +1,29 @@
 import logging
+import os
 
 LOG = logging.getLogger(__name__)
 LOG.setLevel(logging.DEBUG)
 from maya import cmds
+from maya.api import OpenMaya as om
 
 from mechRig_toolkit.utils import common
 reload(common)
 
+from mechRig_toolkit.utils import orient
+reload(orient)
+
+from mechRig_toolkit.utils import softik
+reload(softik)
+
+from mechRig_toolkit.utils import chain
+reload(chain)
+
+from mechRig_toolkit.utils import points
+reload(points)
+
+from mechRig_toolkit.utils import locator
+reload(locator)
+
 def create_pole_vector(pv_ctl, ik_handle):
     """Positions pv_ctl and creates pole vector constraint for ik_handle to prevent any joint rotation
 
@@ -22,21 +39,22 @@ def create_pole_vector(pv_ctl, ik_handle):
     start_joint = cmds.ikHandle(ik_handle, q=True, startJoint=True)
     mid_joint = cmds.listRelatives(start_joint, children=True, type='joint')
 
-    # Constrain the pole vector control transform between start joint and ik_handle
-    cmds.delete(cmds.pointConstraint(start_joint, ik_handle, pv_ctl))
+    # Pole vector starts halfway between start joint and ik_handle (where a point constraint would put it)
+    start_pos = cmds.xform(start_joint, q=True, ws=True, rp=True)
+    end_pos = cmds.xform(ik_handle, q=True, ws=True, rp=True)
+    mid_pos = cmds.xform(mid_joint[0], q=True, ws=True, t=True)
+    pv_pos = [(start_pos[i] + end_pos[i]) * 0.5 for i in range(3)]
 
-    # Aim pole vector control to mid_joint - Aim X-axis
-    cmds.delete(cmds.aimConstraint(mid_joint[0], pv_ctl, aim=[1, 0, 0], u=[0, 0, 1], wut='none'))
+    # Aim pole vector control to mid_joint - Aim X-axis, no up vector
+    pv_rot = orient.rotate_between([1, 0, 0], orient.subtract(mid_pos, pv_pos))
 
     # Find distance from pole vector control to mid_joint
-    pv_pos = cmds.xform(pv_ctl, q=True, ws=True, t=True)
-    mid_pos = cmds.xform(mid_joint[0], q=True, ws=True, t=True)
     pv_dist = (pv_pos[0] - mid_pos[0], pv_pos[1] - mid_pos[1], pv_pos[2] - mid_pos[2])
 
     # Add offset away from mid position
     # - Moves pole vector to mid position PLUS original distance from initial position to mid position
     pv_pos_off = (mid_pos[0] - pv_dist[0], mid_pos[1] - pv_dist[1], mid_pos[2] - pv_dist[2])
-    cmds.xform(pv_ctl, t=pv_pos_off)
+    cmds.xform(pv_ctl, ws=True, matrix=orient.compose_matrix(pv_rot, pv_pos_off))
 
     # Add group node above pole vector control to zero it out
     grp_name = '{}_grp'.format(pv_ctl)
@@ -51,6 +69,141 @@ def create_pole_vector(pv_ctl, ik_handle):
     return pv_pos_off
 
 
+def pole_vector_position(start_pos, mid_pos, end_pos, distance=None):
+    """Returns the pole vector position of a start, mid, end joint triangle, None for a straight chain
+
+    The mid position is projected onto the start to end line, the pole vector is placed distance
+    away from the mid joint along the projection direction, in the plane of the chain.
+
+    Args:
+        distance:  Distance from the mid joint, defaults to half the chain length
+
+    Example:
+        pole_vector_position([0, 10, 0], [0, 5, 1], [0, 0, 0])
+        # Result: [0.0, 5.0, 6.099...] #
+    """
+    start_end = orient.subtract(end_pos, start_pos)
+    start_mid = orient.subtract(mid_pos, start_pos)
+    line_len_sq = orient.dot(start_end, start_end)
+    if line_len_sq < orient.EPSILON:
+        return None
+
+    # Projection of the mid position onto the start to end line
+    t = orient.dot(start_mid, start_end) / line_len_sq
+    projected = [start_pos[i] + start_end[i] * t for i in range(3)]
+    offset = orient.subtract(mid_pos, projected)
+    if orient.length(offset) < orient.EPSILON:
+        return None
+
+    if distance is None:
+        distance = 0.5 * (orient.length(start_mid) + orient.length(orient.subtract(end_pos, mid_pos)))
+    direction = orient.normalize(offset)
+    return [mid_pos[i] + direction[i] * distance for i in range(3)]
+
+
+def _pole_vector_name(ik_handle):
+    """Returns pole vector control name of an ik handle, lf_legFrontUpper_ikh -> lf_legFrontUpperPV_ctl"""
+    base_name = ik_handle[:-len('_ikh')] if ik_handle.endswith('_ikh') else ik_handle
+    return '{}PV{}'.format(base_name, common.CTL)
+
+
+def create_pole_vectors(ik_handles, pv_ctls=None, distance=None):
+    """Places pole vector controls for many ik handles and pole vector constrains them in one pass
+
+    All start, mid and end positions are read with a single query, the pole vector positions are
+    solved with pole_vector_position() and controls aim X at the mid joint with Z towards the
+    handle.  Each control gets a zero group above it, like create_pole_vector().  Selection is
+    not used, so it can be called from build scripts and batch mode.
+
+    Args:
+        ik_handles:  Two bone ik handles
+        pv_ctls:     Existing transforms to use as pole vector controls, one per handle.  Locators
+                     named after the handles are created when not given ("lf_legUpper_ikh" ->
+                     "lf_legUpperPV_ctl")
+        distance:    Distance of the pole vectors from the mid joints, a single distance or one
+                     per handle, defaults to half the chain length of each handle
+
+    Returns:
+        List of pole vector controls, None for handles with a straight chain or no mid joint
+
+    Example:
+        create_pole_vectors(['lf_legFrontUpper_ikh', 'rt_legFrontUpper_ikh'])
+    """
+    ik_handles = list(ik_handles)
+    if pv_ctls and len(pv_ctls) != len(ik_handles):
+        LOG.error('Got {} pole vector controls for {} ik handles'.format(len(pv_ctls), len(ik_handles)))
+        return None
+
+    # Start and mid joints are the first two joints each handle controls
+    start_joints = list()
+    mid_joints = list()
+    for handle in ik_handles:
+        joint_list = cmds.ikHandle(handle, q=True, jointList=True) or list()
+        if not joint_list:
+            LOG.error('No start joint found for {}'.format(handle))
+            return None
+        if len(joint_list) < 2:
+            LOG.warning('{} does not control a mid joint, skipping...'.format(handle))
+        start_joints.append(joint_list[0])
+        mid_joints.append(joint_list[1] if len(joint_list) > 1 else None)
+
+    # One bulk position query for every start, mid and end
+    num = len(ik_handles)
+    distances = distance if isinstance(distance, (list, tuple)) else [distance] * num
+    queried = [i for i in range(num) if mid_joints[i]]
+    nodes = [start_joints[i] for i in queried] + [mid_joints[i] for i in queried] + [ik_handles[i] for i in queried]
+    positions = list(points.iter_points(points.get_positions(nodes))) if queried else list()
+
+    matrices = [None] * num
+    for j, i in enumerate(queried):
+        start_pos, mid_pos, end_pos = positions[j], positions[len(queried) + j], positions[2 * len(queried) + j]
+        pv_pos = pole_vector_position(start_pos, mid_pos, end_pos, distances[i])
+        if pv_pos is None:
+            LOG.warning('{} has a straight chain, no pole vector direction, skipping...'.format(ik_handles[i]))
+            continue
+        rot = orient.aim_matrix(orient.subtract(mid_pos, pv_pos), orient.subtract(end_pos, pv_pos),
+                                aim_vector=(1, 0, 0), up_vector=(0, 0, 1))
+        matrices[i] = (rot, pv_pos)
+
+    valid = [i for i in range(num) if matrices[i] is not None]
+    if not pv_ctls:
+        pv_ctls = [None] * num
+        flat_positions = list()
+        flat_rotations = list()
+        for i in valid:
+            flat_positions.extend(matrices[i][1])
+            flat_rotations.extend(orient.matrix_to_euler_xyz(matrices[i][0]))
+        names = [_pole_vector_name(ik_handles[i]) for i in valid]
+        for i, loc in zip(valid, locator.create_locators(flat_positions, flat_rotations, names=names)):
+            pv_ctls[i] = loc
+    else:
+        pv_ctls = list(pv_ctls)
+        for i in valid:
+            cmds.xform(pv_ctls[i], ws=True, matrix=orient.compose_matrix(*matrices[i]))
+
+    results = list()
+    for i in range(num):
+        if matrices[i] is None:
+            results.append(None)
+            continue
+        pv_ctl = pv_ctls[i]
+
+        # Add group node above pole vector control to zero it out
+        grp_name = '{}_grp'.format(pv_ctl)
+        if common.CTL in pv_ctl:
+            grp_name = pv_ctl.replace(common.CTL, common.GRP)
+        parent = cmds.listRelatives(pv_ctl, parent=True)
+        pv_grp = cmds.createNode('transform', name=grp_name, parent=parent[0] if parent else None)
+        cmds.xform(pv_grp, ws=True, matrix=orient.compose_matrix(*matrices[i]))
+        pv_ctl = cmds.parent(pv_ctl, pv_grp)[0]
+
+        cmds.poleVectorConstraint(pv_ctl, ik_handles[i])
+        results.append(pv_ctl)
+
+    LOG.info('Created {} pole vectors'.format(len(valid)))
+    return results
+
+
 def get_aim_axis(joint_name):
     """Returns the axis pointed down the chain as a string
 
@@ -68,37 +221,9 @@ def get_aim_axis(joint_name):
         return False
 
     else:
-        # Get translate values for child joint
-        tx = cmds.getAttr('{}.translateX'.format(child_joint[0]))
-        ty = cmds.getAttr('{}.translateY'.format(child_joint[0]))
-        tz = cmds.getAttr('{}.translateZ'.format(child_joint[0]))
-
-        # Absolute translate values (basically always gives you a positive value
-        atx = abs(tx)
-        aty = abs(ty)
-        atz = abs(tz)
-
-        # Max function returns the largest value of the input values
-        axis_tmp_val = max(atx, aty)
-        axis_val = max(axis_tmp_val, atz)
-
-        axes = ['x', 'y', 'z']
-        trans = [tx, ty, tz]
-        abs_trans = [atx, aty, atz]
-
-        # Loop through abs translate values -
-        # compare max trans value with each trans axis value
-        for i in range(len(abs_trans)):
-            if axis_val == abs_trans[i]:
-                # if our highest trans axis value matches the current trans value
-                # then we've found our axis, next determine if that axis is
-                # positive or negative by checking if it's less than 0.0
-                axis_tmp = axes[i]
-                if trans[i] < 0.0:
-                    axis = ('-{}'.format(axis_tmp))
-                else:
-                    axis = axis_tmp
-        return (axis)
+        # The largest child translate value is the aim axis, its sign tells if the axis is negative
+        translate = chain.get_chain_data([child_joint[0]])['translates'][0]
+        return chain.axis_name(*chain.aim_axis(translate))
 
 
 def add_attribute_separator(object, attr_name):
@@ -130,7 +255,57 @@ def add_attribute_separator(object, attr_name):
     return ('{}.{}'.format(object, attr_name))
 
 
-def add_softIK(ik_handle, ik_ctl, base_name):
+SOFT_IK_PLUGIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'plugins',
+                              'mechRig_softIk.py')
+SOFT_IK_METHODS = ('network', 'node')
+
+
+def load_softIK_plugin():
+    """Loads the mechRigSoftIk node plug-in used by add_softIK(method='node')"""
+    if not cmds.pluginInfo(SOFT_IK_PLUGIN, q=True, loaded=True):
+        cmds.loadPlugin(SOFT_IK_PLUGIN, quiet=True)
+
+
+def get_softIK_chain(ik_handle):
+    """Returns the chain values add_softIK() builds its network from
+
+    Returns:
+        (ik_joints, aim_axis, neg_axis, chain_length, tip_length), aim_axis is 'X', 'Y' or 'Z'
+        and neg_axis is True when the chain points down the negative axis
+
+    Example:
+        get_softIK_chain('ikHandle2')
+    """
+    # Get list of joints controlled by ik_handle
+    ik_joints = cmds.ikHandle(ik_handle, q=True, jointList=True)
+    if len(ik_joints) != 2:
+        LOG.error('IK handle does not control enough joints, make sure this is a two bone IK setup')
+    else:
+        ik_joints.append(cmds.listRelatives(ik_joints[1], children=True, type='joint')[0])
+    LOG.debug('IK joint list: {}'.format(ik_joints))
+
+    # Find the first joints aim axis (primary axis), handle if axis is negative as well
+    aim_axis = get_aim_axis(ik_joints[0])
+    aim_axis = aim_axis.capitalize()
+    LOG.debug('IK joint aim axis: {}'.format(aim_axis))
+
+    neg_axis = False
+    if '-' in aim_axis:
+        neg_axis = True
+        aim_axis = aim_axis.replace('-', '')
+        aim_axis = aim_axis.capitalize()
+
+    # Get abs ik mid and tip joints translate values to find that bones length
+    translates = chain.get_chain_data(ik_joints)['translates']
+    axis_index = chain.AXES.index(aim_axis.lower())
+    mid_trans_axis_val = abs(translates[1][axis_index])
+    tip_trans_axis_val = abs(translates[2][axis_index])
+    chain_length = mid_trans_axis_val + tip_trans_axis_val
+
+    return ik_joints, aim_axis, neg_axis, chain_length, tip_trans_axis_val
+
+
+def add_softIK(ik_handle, ik_ctl, base_name, method='network'):
     """Adds softIK to ikHandle to help avoid "popping" behavior as
     joint chain straightens.
 
@@ -142,37 +317,26 @@ def add_softIK(ik_handle, ik_ctl, base_name):
         ik_handle:  IK handle that the soft ik effect will be added
         ik_ctl:  The anim control the ik_handle is constrained to
         base_name:  Base naming convention that will be used for newly created nodes
+        method:  'network' builds utility nodes, 'node' uses a single mechRigSoftIk plug-in node
+                 with the same control attributes
 
     Example:
         add_softIK( 'ikHandle2', 'ik_ctl', 'lf_arm')
+        add_softIK( 'ikHandle2', 'ik_ctl', 'lf_arm', method='node')
     """
+    if method not in SOFT_IK_METHODS:
+        LOG.error('Unknown soft IK method "{}", use one of {}'.format(method, SOFT_IK_METHODS))
+        return None
+
     if cmds.objExists(ik_handle):
         # Get end effector node from ik_handle
         end_effector = cmds.listConnections('{}.endEffector'.format(ik_handle))[0]
 
-        # Get list of joints controlled by ik_handle
-        ik_joints = cmds.ikHandle(ik_handle, q=True, jointList=True)
-        if len(ik_joints) != 2:
-            LOG.error('IK handle does not control enough joints, make sure this is a two bone IK setup')
-        else:
-            ik_joints.append(cmds.listRelatives(ik_joints[1], children=True, type='joint')[0])
-        LOG.debug('IK joint list: {}'.format(ik_joints))
-
-        # Find the first joints aim axis (primary axis), handle if axis is negative as well
-        aim_axis = get_aim_axis(ik_joints[0])
-        aim_axis = aim_axis.capitalize()
-        LOG.debug('IK joint aim axis: {}'.format(aim_axis))
-
-        neg_axis = False
-        if '-' in aim_axis:
-            neg_axis = True
-            aim_axis = aim_axis.replace('-', '')
-            aim_axis = aim_axis.capitalize()
+        ik_joints, aim_axis, neg_axis, chain_length, tip_trans_axis_val = get_softIK_chain(ik_handle)
 
-        # Get abs ik mid and tip joints translate values to find that bones length
-        mid_trans_axis_val = abs(cmds.getAttr('{}.translate{}'.format(ik_joints[1], aim_axis)))
-        tip_trans_axis_val = abs(cmds.getAttr('{}.translate{}'.format(ik_joints[2], aim_axis)))
-        chain_length = mid_trans_axis_val + tip_trans_axis_val
+        if method == 'node':
+            return _add_softIK_node(ik_ctl, base_name, end_effector, ik_joints, aim_axis, neg_axis, chain_length,
+                                    tip_trans_axis_val)
 
         # Create distance setup to track distance from start joint to controller
         start_pos_tfm = cmds.createNode('transform', name='{}_startPos_tfm'.format(base_name))
@@ -294,3 +458,114 @@ def add_softIK(ik_handle, ik_ctl, base_name):
     else:
         LOG.error('IK handle {} does not exist in scene'.format(ik_handle))
 
+
+def _add_softIK_node(ik_ctl, base_name, end_effector, ik_joints, aim_axis, neg_axis, chain_length, tip_length):
+    """Node method of add_softIK(), one mechRigSoftIk node replaces the network and its transforms"""
+    load_softIK_plugin()
+
+    soft_node = cmds.createNode('mechRigSoftIk', name='{}_softIk'.format(base_name))
+    cmds.setAttr('{}.chainLength'.format(soft_node), chain_length)
+    cmds.setAttr('{}.tipLength'.format(soft_node), tip_length)
+    cmds.setAttr('{}.negate'.format(soft_node), neg_axis)
+
+    # Start joint parentMatrix and translate rather than its worldMatrix, which depends on the IK solve
+    cmds.connectAttr('{}.parentMatrix[0]'.format(ik_joints[0]), '{}.startParentMatrix'.format(soft_node))
+    cmds.connectAttr('{}.translate'.format(ik_joints[0]), '{}.startTranslate'.format(soft_node))
+    cmds.connectAttr('{}.worldMatrix[0]'.format(ik_ctl), '{}.endMatrix'.format(soft_node))
+
+    # Same control attributes as the network
+    add_attribute_separator(ik_ctl, '___')
+    cmds.addAttr(ik_ctl, ln='soft_value', at="double", min=0.001, max=2, dv=0.001, k=True, hidden=False)
+    cmds.addAttr(ik_ctl, ln='dist_value', at="double", dv=0, k=True, hidden=False)
+    cmds.addAttr(ik_ctl, ln='softIk', at="double", min=0, max=20, dv=0, k=True)
+    cmds.connectAttr('{}.softIk'.format(ik_ctl), '{}.softIk'.format(soft_node))
+    cmds.connectAttr('{}.softValue'.format(soft_node), '{}.soft_value'.format(ik_ctl))
+    cmds.connectAttr('{}.distance'.format(soft_node), '{}.dist_value'.format(ik_ctl))
+
+    cmds.connectAttr('{}.effectorTranslate'.format(soft_node), '{}.translate{}'.format(end_effector, aim_axis),
+                     force=True)
+
+    cmds.select(ik_ctl)
+    return ik_ctl
+
+
+def validate_softIK(ik_handle, ik_ctl, num_samples=20, soft_ik_values=(0, 1, 5, 10, 20), scales=(1.0, 2.0),
+                    tolerance=1.0e-4):
+    """Checks the add_softIK() network or node against softik.end_effector() on sampled poses
+
+    The control is moved along the line from the start joint through its current position from
+    half to 1.2 times the chain length, for every softIk value and control scale.  The measured
+    distance is compared against the start to control distance in the control's space, and the
+    end effector translate against the evaluator fed with that distance.  The control's position,
+    scale and softIk value are restored afterwards.
+
+    Args:
+        scales:     Uniform control scales to sample, scaled samples are skipped when the
+                    control's scale is locked
+
+    Returns:
+        Largest absolute difference found, None if the network could not be sampled
+
+    Example:
+        validate_softIK('ikHandle2', 'ik_ctl')
+    """
+    if not cmds.objExists('{}.softIk'.format(ik_ctl)):
+        LOG.error('{} has no softIk attribute, run add_softIK first'.format(ik_ctl))
+        return None
+
+    end_effector = cmds.listConnections('{}.endEffector'.format(ik_handle))[0]
+    ik_joints, aim_axis, neg_axis, chain_length, tip_length = get_softIK_chain(ik_handle)
+    effector_attr = '{}.translate{}'.format(end_effector, aim_axis)
+
+    start_pos = cmds.xform(ik_joints[0], q=True, ws=True, t=True)
+    ctl_pos = cmds.xform(ik_ctl, q=True, ws=True, t=True)
+    ctl_scale = cmds.getAttr('{}.scale'.format(ik_ctl))[0]
+    direction = orient.normalize(orient.subtract(ctl_pos, start_pos))
+    soft_ik = cmds.getAttr('{}.softIk'.format(ik_ctl))
+
+    if any(cmds.getAttr('{}.scale{}'.format(ik_ctl, axis), lock=True) for axis in 'XYZ'):
+        LOG.warning('{} scale is locked, only sampling its current scale'.format(ik_ctl))
+        scales = [None]
+
+    max_error = 0.0
+    failures = 0
+    num_checks = 0
+    try:
+        for scale in scales:
+            if scale is not None:
+                cmds.setAttr('{}.scale'.format(ik_ctl), scale, scale, scale)
+            for value in soft_ik_values:
+                cmds.setAttr('{}.softIk'.format(ik_ctl), value)
+                for i in range(num_samples):
+                    ratio = 0.5 + 0.7 * i / max(num_samples - 1, 1)
+                    cmds.xform(ik_ctl, ws=True,
+                               t=[start_pos[j] + direction[j] * chain_length * ratio for j in range(3)])
+
+                    # The network's transforms are point constrained under the control, so the
+                    # distance is the one between the start joint and the control's pivot in its space
+                    ctl_inverse = om.MMatrix(cmds.getAttr('{}.worldInverseMatrix[0]'.format(ik_ctl)))
+                    pivot = om.MPoint(cmds.xform(ik_ctl, q=True, ws=True, rp=True))
+                    dist = (om.MPoint(start_pos) * ctl_inverse).distanceTo(pivot * ctl_inverse)
+                    expected = softik.end_effector(dist, value, chain_length, tip_length, negative=neg_axis)
+
+                    measured = cmds.getAttr('{}.dist_value'.format(ik_ctl))
+                    effector = cmds.getAttr(effector_attr)
+                    error = max(abs(measured - dist), abs(effector - expected))
+                    max_error = max(max_error, error)
+                    num_checks += 1
+                    if error > tolerance:
+                        failures += 1
+                        LOG.warning('scale {} softIk {} distance {:.4f} (measured {:.4f}): effector {:.6f}, '
+                                    'evaluator {:.6f}'.format(scale, value, dist, measured, effector, expected))
+    finally:
+        if None not in scales:
+            cmds.setAttr('{}.scale'.format(ik_ctl), *ctl_scale)
+        cmds.xform(ik_ctl, ws=True, t=ctl_pos)
+        cmds.setAttr('{}.softIk'.format(ik_ctl), soft_ik)
+
+    if failures:
+        LOG.error('Soft IK validation failed on {} of {} samples, max error {:.6g}'.format(failures, num_checks,
+                                                                                           max_error))
+    else:
+        LOG.info('Soft IK validation passed {} samples, max error {:.6g}'.format(num_checks, max_error))
+    return max_error
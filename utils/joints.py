@@ -15,7 +15,20 @@ logging.basicConfig()
 LOG = logging.getLogger(__name__)
 LOG.setLevel(logging.INFO)
 
+import math
+
 from maya import cmds
+from maya.api import OpenMaya as om
+
+from mechRig_toolkit.utils import orient
+reload(orient)
+
+from mechRig_toolkit.utils import apiundo
+reload(apiundo)
+
+# World space frame (rotation, scale, position, matrix) of nodes parented to the world
+WORLD_FRAME = ([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]], [1.0, 1.0, 1.0], [0.0, 0.0, 0.0],
+               [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0])
 
 
 def orientJoint(joints, aimAxis, upAxis, worldUpAxis):
@@ -57,21 +70,158 @@ def orientJoint(joints, aimAxis, upAxis, worldUpAxis):
                     break
 
         if aimTarget != '':
-            aCons = cmds.aimConstraint(aimTarget, joints[i], aim=aimAxis, upVector=upAxis, worldUpVector=worldUpAxis, worldUpType='vector')
-            cmds.delete(aCons)
+            jnt_pos = cmds.xform(joints[i], q=True, ws=True, t=True)
+            aim_pos = cmds.xform(aimTarget, q=True, ws=True, t=True)
+            world_rot = orient.aim_matrix(orient.subtract(aim_pos, jnt_pos), worldUpAxis, aimAxis, upAxis)
 
         elif parent:
             # If there is no target, dup orientation of parent
-            oCons = cmds.orientConstraint(parent, joints[i])
-            cmds.delete(oCons)
+            world_rot = orient.rotation_matrix(cmds.xform(parent, q=True, ws=True, matrix=True))
+
+        else:
+            world_rot = orient.rotation_matrix(cmds.xform(joints[i], q=True, ws=True, matrix=True))
 
         cmds.joint(joints[i], edit=True, zso=1)
-        cmds.makeIdentity(joints[i], apply=1, r=True)
+        set_joint_orientation(joints[i], world_rot)
 
         if children and (len(children) > 0):
             cmds.parent(children, joints[i])
 
 
+def orientJointHierarchy(joints, aimAxis, upAxis, worldUpAxis, batch=None):
+    """Orient joints without unparenting/reparenting their children.
+
+    Same orientation rules as orientJoint(), but new jointOrient values are computed for the
+    whole hierarchy in one top-down pass.  Child joint translates are recomputed from their
+    original world positions so nothing moves and no node is ever reparented.  Children that
+    are not in the joints list keep their world transform.
+
+    Args:
+        joints: List of joints to orient, can be given in any order.
+        aimAxis: Array(x, y, z) of what axis of joint does aim.
+        upAxis: Array(x, y, z) of what axis of joint does up.
+        worldUpAxis: World axis used for up direction.
+        batch: Solve aim and joint orient rotations of all joints at once with the NumPy batch
+            functions of orient.py, defaults to True when NumPy is available.
+    Returns:
+        List of oriented joints (long names).
+    """
+    joints = cmds.ls(joints, long=True, type='joint')
+    if not joints:
+        LOG.warning('No joints to orient.')
+        return
+
+    # Parents are always solved before their children
+    joints.sort(key=lambda jnt: jnt.count('|'))
+    oriented = set(joints)
+
+    children = cmds.listRelatives(joints, children=True, type='transform', fullPath=True) or list()
+    child_joints = set(cmds.ls(children, type='joint', long=True))
+    kept_children = [child for child in children if child not in oriented]
+
+    # Read every world matrix up front, nothing is re-evaluated while orienting
+    frame_nodes = list(joints) + kept_children
+    frame_node_set = set(frame_nodes)
+    for jnt in joints:
+        parent = jnt.rsplit('|', 1)[0]
+        if parent and parent not in frame_node_set:
+            frame_nodes.append(parent)
+            frame_node_set.add(parent)
+    frames = _world_frames(frame_nodes)
+
+    first_child_joint = dict()
+    for child in children:
+        parent = child.rsplit('|', 1)[0]
+        if child in child_joints and parent not in first_child_joint:
+            first_child_joint[parent] = child
+
+    if batch is None:
+        batch = orient.np is not None
+
+    # Aim rotations only depend on the original positions, solve them all at once
+    aimed = [jnt for jnt in joints if jnt in first_child_joint]
+    aim_directions = [orient.subtract(frames[first_child_joint[jnt]][2], frames[jnt][2]) for jnt in aimed]
+    if batch and aimed:
+        aim_rots = orient.aim_matrices(aim_directions, worldUpAxis, aimAxis, upAxis).tolist()
+    else:
+        aim_rots = [orient.aim_matrix(direction, worldUpAxis, aimAxis, upAxis) for direction in aim_directions]
+    aim_rots = dict(zip(aimed, aim_rots))
+
+    rots = list()
+    parent_rots = list()
+    translates = list()
+    for jnt in joints:
+        parent = jnt.rsplit('|', 1)[0]
+        parent_rot, parent_scale, parent_pos = frames.get(parent, WORLD_FRAME)[:3]
+        rot, scale, pos, mtx = frames[jnt]
+
+        if jnt in aim_rots:
+            rot = aim_rots[jnt]
+        elif parent:
+            # If there is no target, dup orientation of parent
+            rot = parent_rot
+
+        # Store the solved frame so children are computed against the new orientation
+        frames[jnt] = (rot, scale, pos, mtx)
+
+        offset = orient.subtract(pos, parent_pos)
+        rots.append(rot)
+        parent_rots.append(parent_rot)
+        translates.append([orient.dot(offset, parent_rot[i]) / parent_scale[i] for i in range(3)])
+
+    if batch:
+        joint_orients = orient.matrices_to_euler_xyz(orient.local_rotations(rots, parent_rots)).tolist()
+    else:
+        joint_orients = [orient.matrix_to_euler_xyz(orient.local_rotation(rot, parent_rot))
+                         for rot, parent_rot in zip(rots, parent_rots)]
+
+    mod = om.MDGModifier()
+    for jnt, joint_orient, translate in zip(joints, joint_orients, translates):
+        parent = jnt.rsplit('|', 1)[0]
+        fn_jnt = om.MFnDependencyNode(_get_mobject(jnt))
+        for i, axis in enumerate('XYZ'):
+            mod.newPlugValueDouble(fn_jnt.findPlug('jointOrient' + axis, False), math.radians(joint_orient[i]))
+            mod.newPlugValueDouble(fn_jnt.findPlug('rotate' + axis, False), 0.0)
+            mod.newPlugValueDouble(fn_jnt.findPlug('rotateAxis' + axis, False), 0.0)
+            if parent in oriented:
+                mod.newPlugValueDouble(fn_jnt.findPlug('translate' + axis, False), translate[i])
+
+    # One modifier committed to the undo queue, zeroing rotateAxis replaces joint -zeroScaleOrient.
+    # The modifier and the child restore below are undone together as one chunk
+    cmds.undoInfo(openChunk=True, chunkName='orientJointHierarchy')
+    try:
+        apiundo.do_it(mod)
+
+        # Children that were not oriented go back to where they were
+        for child in kept_children:
+            cmds.xform(child, worldSpace=True, matrix=frames[child][3])
+    finally:
+        cmds.undoInfo(closeChunk=True)
+
+    return joints
+
+
+def _get_mobject(node):
+    """Returns MObject for node name"""
+    sel = om.MSelectionList()
+    sel.add(node)
+    return sel.getDependNode(0)
+
+
+def _world_frames(nodes):
+    """Returns {node: (rotation, scale, position, matrix)} world frames for nodes using the API"""
+    frames = dict()
+    sel = om.MSelectionList()
+    for node in nodes:
+        sel.add(node)
+    for i, node in enumerate(nodes):
+        mtx = sel.getDagPath(i).inclusiveMatrix()
+        flat = [mtx.getElement(r, c) for r in range(4) for c in range(4)]
+        scale = [orient.length(flat[0:3]), orient.length(flat[4:7]), orient.length(flat[8:11])]
+        frames[node] = (orient.rotation_matrix(flat), scale, flat[12:15], flat)
+    return frames
+
+
 def orientTo():
     """Match specified joint orientation to a target transform.
 
@@ -93,6 +243,8 @@ def orientTo():
         if not cmds.objectType(jnt, isType="joint"):
             LOG.warning('Please select joints only.')
 
+    src_rot = orient.rotation_matrix(cmds.xform(sel[0], q=True, ws=True, matrix=True))
+
     for i in xrange(1, len(sel)):
         # Find unparent children
         children = cmds.listRelatives(sel[i], children=1, type='transform')
@@ -100,16 +252,35 @@ def orientTo():
             # Unparent and get names of the objects(possibly renamed)
             children = cmds.parent(children, w=1)
 
-        oCons = cmds.orientConstraint(sel[0], sel[i])
-        cmds.delete(oCons)
-
         cmds.joint(sel[i], edit=True, zso=1)
-        cmds.makeIdentity(sel[i], apply=1, r=True)
+        set_joint_orientation(sel[i], src_rot)
 
         if children and (len(children) > 0):
             cmds.parent(children, sel[i])
 
 
+def set_joint_orientation(joint, world_rotation):
+    """Sets jointOrient so joint has world_rotation, zeroing rotate and rotateAxis
+
+    Same result as constraining the joint's rotation and freezing it with makeIdentity, without
+    creating a constraint.
+
+    Args:
+        joint: Joint to orient.
+        world_rotation: 3x3 world rotation matrix (rows are world space X, Y, Z axes).
+    Returns:
+        New jointOrient values.
+    """
+    parent_rot = orient.rotation_matrix(cmds.getAttr('{}.parentMatrix[0]'.format(joint)))
+    joint_orient = orient.matrix_to_euler_xyz(orient.local_rotation(world_rotation, parent_rot))
+
+    cmds.setAttr('{}.rotate'.format(joint), 0, 0, 0)
+    cmds.setAttr('{}.rotateAxis'.format(joint), 0, 0, 0)
+    cmds.setAttr('{}.jointOrient'.format(joint), *joint_orient)
+
+    return joint_orient
+
+
 def planarOrient(joints, aimAxis, upAxis):
     """Adjust the joint orientation of three joints to their invisible plane.
 
@@ -0,0 +1,171 @@
+"""
+kdtree.py
+
+Closest point lookups for large point sets.
+
+SciPy's cKDTree is used when it is available, otherwise a pure Python KD-tree is built.  Either
+way the tree is built once and every query point is looked up against it, instead of searching
+all points per query.  This module does not import Maya.
+
+    from mechRig_toolkit.utils import kdtree
+
+    # Index of the closest point in points for each query point, both flat [x, y, z, ...] lists
+    kdtree.nearest_indices([0, 0, 0, 10, 0, 0], [1, 0, 0, 9, 1, 0])
+    # Result: [0, 1] #
+
+    # Indices of the 2 closest points, closest first
+    kdtree.nearest_indices([0, 0, 0, 10, 0, 0, 4, 0, 0], [1, 0, 0], k=2)
+    # Result: [[0, 2]] #
+
+"""
+import heapq
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+# Points per leaf of the pure Python tree, larger leaves mean fewer Python level node visits
+LEAF_SIZE = 8
+
+
+class KDTree(object):
+    """Pure Python KD-tree of 3D points
+
+    Usage:
+        tree = KDTree([0, 0, 0, 10, 0, 0])
+        index, distance_squared = tree.nearest([1, 0, 0])
+    """
+
+    def __init__(self, positions):
+        """positions is a flat [x, y, z, x, y, z, ...] sequence"""
+        self.points = list(zip(positions[0::3], positions[1::3], positions[2::3]))
+        # Nodes are (axis, split, left, right), leaves are (-1, None, indices, None)
+        self.nodes = list()
+        if self.points:
+            self._build(list(range(len(self.points))))
+
+    def _build(self, indices):
+        """Adds a node for indices and its children, returns the node's index"""
+        node = len(self.nodes)
+        if len(indices) <= LEAF_SIZE:
+            self.nodes.append((-1, None, indices, None))
+            return node
+
+        # Split on the axis with the largest spread at the median point
+        points = self.points
+        spreads = list()
+        for axis in range(3):
+            values = [points[i][axis] for i in indices]
+            spreads.append(max(values) - min(values))
+        axis = spreads.index(max(spreads))
+        indices.sort(key=lambda i: points[i][axis])
+        mid = len(indices) // 2
+
+        self.nodes.append(None)
+        left = self._build(indices[:mid])
+        right = self._build(indices[mid:])
+        self.nodes[node] = (axis, points[indices[mid]][axis], left, right)
+        return node
+
+    def nearest(self, point):
+        """Returns (index, squared distance) of the closest point, (-1, inf) for an empty tree"""
+        px, py, pz = point[0], point[1], point[2]
+        nodes = self.nodes
+        points = self.points
+        best = -1
+        best_dist = float('inf')
+
+        stack = [(0, 0.0)] if nodes else list()
+        while stack:
+            node, bound = stack.pop()
+            if bound >= best_dist:
+                continue
+            axis, split, left, right = nodes[node]
+            if axis < 0:
+                for i in left:
+                    x, y, z = points[i]
+                    dist = (x - px) * (x - px) + (y - py) * (y - py) + (z - pz) * (z - pz)
+                    if dist < best_dist:
+                        best = i
+                        best_dist = dist
+                continue
+
+            diff = point[axis] - split
+            if diff < 0.0:
+                near, far = left, right
+            else:
+                near, far = right, left
+            # Far side is pushed first so the near side is searched first
+            stack.append((far, diff * diff))
+            stack.append((near, bound))
+
+        return best, best_dist
+
+
+    def nearest_k(self, point, k):
+        """Returns [(squared distance, index), ...] of the k closest points, closest first"""
+        px, py, pz = point[0], point[1], point[2]
+        nodes = self.nodes
+        points = self.points
+        # Max heap of the k best so far as (-distance, index), the worst of them on top
+        best = list()
+        worst = float('inf')
+
+        stack = [(0, 0.0)] if nodes else list()
+        while stack:
+            node, bound = stack.pop()
+            if bound >= worst:
+                continue
+            axis, split, left, right = nodes[node]
+            if axis < 0:
+                for i in left:
+                    x, y, z = points[i]
+                    dist = (x - px) * (x - px) + (y - py) * (y - py) + (z - pz) * (z - pz)
+                    if len(best) < k:
+                        heapq.heappush(best, (-dist, i))
+                    elif dist < -best[0][0]:
+                        heapq.heapreplace(best, (-dist, i))
+                    if len(best) == k:
+                        worst = -best[0][0]
+                continue
+
+            diff = point[axis] - split
+            if diff < 0.0:
+                near, far = left, right
+            else:
+                near, far = right, left
+            stack.append((far, diff * diff))
+            stack.append((near, bound))
+
+        return [(-dist, i) for dist, i in sorted(best, reverse=True)]
+
+
+def nearest_indices(positions, query_positions, k=1):
+    """Returns the index of the closest point in positions for every query point
+
+    Args:
+        positions:        Flat [x, y, z, ...] points to search
+        query_positions:  Flat [x, y, z, ...] points to look up
+        k:                Number of closest points to return per query point, at most the
+                          number of points
+
+    Returns:
+        List of point indices, one per query point, or lists of k indices closest first when k > 1
+    """
+    queries = zip(query_positions[0::3], query_positions[1::3], query_positions[2::3])
+    k = min(k, len(positions) // 3)
+    if cKDTree is not None and np is not None:
+        tree = cKDTree(np.asarray(positions, dtype=np.float64).reshape(-1, 3))
+        distances, indices = tree.query(np.asarray(query_positions, dtype=np.float64).reshape(-1, 3), k=k)
+        return indices.tolist()
+
+    tree = KDTree(positions)
+    if k > 1:
+        return [[i for dist, i in tree.nearest_k(query, k)] for query in queries]
+    return [tree.nearest(query)[0] for query in queries]
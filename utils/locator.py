@@ -11,6 +11,12 @@ Various functions for creating locators at positions in a variety of ways.
     # Create locator at center of selected objects/points
     locator.center_selection()
 
+    # Create many locators at once from precomputed positions/rotations
+    locator.create_locators([0, 0, 0, 1, 2, 3], names=['a_loc', 'b_loc'])
+
+    # Create up vector locators offset from joints in their local space, without parenting
+    locator.create_up_locators(['lf_legFrontLowerPiston_jnt', 'lf_legFrontUpperPiston_jnt'], [0, 0, 1])
+
     # Create locator at first selection's position, aimed at second and using third for up vector
     locator.aim_selection(aim_vec=[1, 0, 0], up_vec=[0, 1, 0])
 
@@ -21,7 +27,23 @@ logging.basicConfig()
 LOG = logging.getLogger(__name__)
 LOG.setLevel(logging.INFO)
 
+import math
+
 from maya import cmds
+from maya.api import OpenMaya as om
+
+from mechRig_toolkit.utils import points
+reload(points)
+
+from mechRig_toolkit.utils import orient
+reload(orient)
+
+from mechRig_toolkit.utils import chain
+reload(chain)
+
+from mechRig_toolkit.utils import apiundo
+reload(apiundo)
+
 
 def enable_track_selections():
     # Enable trackSelectionOrder to get proper selection order for aim_selection()
@@ -32,32 +54,17 @@ def enable_track_selections():
 
 def selected_points():
     """Locator created at each selected object/joint/vertex position"""
-    sel = cmds.ls(selection=True, flatten=True)
+    sel = cmds.ls(selection=True)
 
     # If there is a valid selection
     if sel:
 
-        # Loop through the selected nodes
-        for i in range(0, len(sel)):
-
-            # We'll store the position data returned by the xform command in the "pos" variable
-            pos = list()
+        # Query all positions in one pass, transforms/joints use their pivot, components their position
+        positions = points.get_positions(sel)
 
-            # Check if node is a transform/joint OR a component vertex/CV
-            # If a transform, we'll use the "piv" flag in the xform command for accuracy
-            if 'transform' in cmds.nodeType(sel[i]) or 'joint' in cmds.nodeType(sel[i]):
-                LOG.info('{} is a transform/joint'.format(sel[i]))
-                pos = cmds.xform(sel[i], query=True, worldSpace=True, piv=True)
+        # Create a locator at each position we just obtained
+        create_locators(positions)
 
-            # Otherwise, we'll use the "translation" flag for all else, including components
-            else:
-                LOG.info('{} is a component'.format(sel[i]))
-                pos = cmds.xform(sel[i], query=True, worldSpace=True, translation=True)
-
-            # Create a locator and move it to the node's position we just obtained
-            loc = cmds.spaceLocator(p=[0, 0, 0])
-            cmds.setAttr(loc[0] + '.translate', pos[0], pos[1], pos[2])
-            
         LOG.info('Created locators at selected positions.')
         return True
 
@@ -96,27 +103,36 @@ def center_selection():
     """Creates locator at bounding box center of objects or components
 
     Note:
-        Uses function "convert_joint_selection_to_loc()" to "convert" any selected joints to locators temporarily.
-    Joints don't work with bbox calculations accurately for this use
+        Joints don't work with bbox calculations accurately for this use, so selected joints
+    contribute their world position to the bounding box instead
 
     Tested with transforms, joints, vertices, edges
     *Does not center locator on polygon "faces"
     """
     selection = cmds.ls(selection=True)
     if selection:
-        filter_sel = convert_joint_selection_to_loc()
-        if filter_sel:
-            bbx = cmds.exactWorldBoundingBox(filter_sel[0])
-            centerX = (bbx[0] + bbx[3]) / 2.0
-            centerY = (bbx[1] + bbx[4]) / 2.0
-            centerZ = (bbx[2] + bbx[5]) / 2.0
-            bbox_center = [centerX, centerY, centerZ]
-            loc = cmds.spaceLocator()[0]
-            cmds.setAttr('{}.translate'.format(loc), *bbox_center)
-            if filter_sel[1]:
-                cmds.delete(filter_sel[1])
-            cmds.select(loc)
-            return loc
+        joint_list = cmds.ls(selection, type='joint')
+        non_joint_list = [item for item in selection if item not in joint_list]
+
+        bbx = None
+        if non_joint_list:
+            bbx = cmds.exactWorldBoundingBox(non_joint_list)
+
+        # Grow bounding box to include joint positions
+        for pos in points.iter_points(points.get_positions(joint_list)):
+            if bbx is None:
+                bbx = list(pos) + list(pos)
+            bbx = [min(bbx[0], pos[0]), min(bbx[1], pos[1]), min(bbx[2], pos[2]),
+                   max(bbx[3], pos[0]), max(bbx[4], pos[1]), max(bbx[5], pos[2])]
+
+        centerX = (bbx[0] + bbx[3]) / 2.0
+        centerY = (bbx[1] + bbx[4]) / 2.0
+        centerZ = (bbx[2] + bbx[5]) / 2.0
+        bbox_center = [centerX, centerY, centerZ]
+        loc = cmds.spaceLocator()[0]
+        cmds.setAttr('{}.translate'.format(loc), *bbox_center)
+        cmds.select(loc)
+        return loc
 
 
 def center_selection_manip():
@@ -139,33 +155,20 @@ def center_selection_manip():
 
 def center_selection_weighted_average():
     """Locator created at center position of selected"""
-    sel = cmds.ls(orderedSelection=True, flatten=True)
+    sel = cmds.ls(orderedSelection=True)
 
     if sel:
-        # Initialize our cntr_pos variable to "0" to start, these 3 values represent XYZ positions
-        cntr_pos = [0.0, 0.0, 0.0]
-
-        # Loop through each selection and add it's XYZ position to cntr_pos
-        for i in range(0, len(sel)):
-            # Check if node is a transform/joint OR a component vertex/CV
-            # If a transform, we'll use the "piv" flag in the xform command for accuracy
-            if 'transform' in cmds.nodeType(sel[i]) or 'joint' in cmds.nodeType(sel[i]):
-                LOG.info('{} is a transform/joint'.format(sel[i]))
-                pos = cmds.xform(sel[i], query=True, worldSpace=True, piv=True)
-
-            # Otherwise, we'll use the "translation" flag for all else, including components
-            else:
-                LOG.info('{} is a component'.format(sel[i]))
-                pos = cmds.xform(sel[i], query=True, worldSpace=True, translation=True)
-
-            cntr_pos[0] = pos[0] + cntr_pos[0]
-            cntr_pos[1] = pos[1] + cntr_pos[1]
-            cntr_pos[2] = pos[2] + cntr_pos[2]
-
-        # Now divide the sum of all the positions by the number of selected items
-        cntr_pos[0] = cntr_pos[0] / len(sel)
-        cntr_pos[1] = cntr_pos[1] / len(sel)
-        cntr_pos[2] = cntr_pos[2] / len(sel)
+        # Query all selected positions at once
+        positions = points.get_positions(sel)
+        num_points = len(positions) / 3
+        if not num_points:
+            LOG.error('No positions found in selection!')
+            return
+
+        # Average the XYZ positions of every selected item
+        cntr_pos = [sum(positions[0::3]) / num_points,
+                    sum(positions[1::3]) / num_points,
+                    sum(positions[2::3]) / num_points]
 
         # Create a locator and set it's position to the final cntr_pos value
         loc = cmds.spaceLocator(p=[0, 0, 0])
@@ -189,26 +192,14 @@ def aim_selection(aim_vec=[1,0,0], up_vec=[0,1,0]):
     if len(sel) == 3:
 
         # Get the positions of each vector
-        pos = cmds.xform(sel[0], query=True, ws=True, translation=True)
-        aim = cmds.xform(sel[1], query=True, ws=True, translation=True)
-        up = cmds.xform(sel[2], query=True, ws=True, translation=True)
-
-        # Create a locator and move it to the position
-        pos_loc = cmds.spaceLocator(p=[0, 0, 0])
-        cmds.setAttr(pos_loc[0] + '.translate', pos[0], pos[1], pos[2])
+        pos, aim, up = points.iter_points(points.get_positions(sel, pivot=False))
 
-        # Create a temp AIM locator and move it to the aim position
-        aim_loc = cmds.spaceLocator(p=[0, 0, 0], name='aimTEMP')
-        cmds.setAttr(aim_loc[0] + '.translate', aim[0], aim[1], aim[2])
+        # Solve the aim rotation directly, the up position is used like an aimConstraint "object" world up
+        aim_rot = orient.aim_matrix(orient.subtract(aim, pos), orient.subtract(up, pos), aim_vec, up_vec)
 
-        # Create a temp UP locator and move it to the up position
-        up_loc = cmds.spaceLocator(p=[0, 0, 0], name='upTEMP')
-        cmds.setAttr(up_loc[0] + '.translate', up[0], up[1], up[2])
+        # Create a locator at the position with the solved rotation
+        pos_loc = create_locators(pos, rotations=orient.matrix_to_euler_xyz(aim_rot))
 
-        # Aim constrain pos_loc to aim_loc while using our up position as up vector
-        cmds.aimConstraint(aim_loc, pos_loc, aimVector=aim_vec, upVector=up_vec, worldUpType='object', worldUpObject=up_loc[0], worldUpVector=[up[0], up[1], up[2]])
-
-        cmds.delete(aim_loc, up_loc)
         cmds.setAttr('{}.displayLocalAxis'.format(pos_loc[0]), 1)
         cmds.select(sel, pos_loc[0])
 
@@ -218,15 +209,106 @@ def aim_selection(aim_vec=[1,0,0], up_vec=[0,1,0]):
 
 def create_locator_snap():
     """Creates new locator and snaps to selected"""
-    created_locs = list()
-    selection = cmds.ls(selection=True)
-    for item in selection:
-        loc = cmds.spaceLocator()
-        cmds.select(loc[0], item)
-        snap_object()
-        created_locs.append(loc[0])
-        LOG.info('Created {} and snapped to {}'.format(loc[0], item))
-    cmds.select(created_locs)
+    # Flattened so compacted components (pCube1.vtx[0:5]) give one position and rotation each
+    selection = cmds.ls(selection=True, flatten=True)
+    if selection:
+        created_locs = create_locators(points.get_positions(selection, pivot=False),
+                                       rotations=points.get_rotations(selection))
+        for loc, item in zip(created_locs, selection):
+            LOG.info('Created {} and snapped to {}'.format(loc, item))
+        return created_locs
+
+
+def create_locators(positions, rotations=None, names=None, base_name='locator'):
+    """Creates a locator for each position with a single DAG modifier
+
+    All locators are created, named and positioned in one modifier pass rather than a
+    spaceLocator/setAttr pair per locator.  The modifier is committed to Maya's undo queue
+    with apiundo, so the locators are removed with a single undo.
+
+    Args:
+        positions:  Flat [x, y, z, x, y, z, ...] world positions, one locator is created per point
+        rotations:  Optional flat [rx, ry, rz, ...] rotations in degrees, same length as positions
+        names:      Optional list of locator names, otherwise base_name is numbered like spaceLocator
+        base_name:  Base name used when names are not given
+
+    Returns:
+        List of created locator transform names
+
+    Example:
+        create_locators([0, 0, 0, 1, 2, 3], rotations=[0, 0, 0, 0, 90, 0], names=['a_loc', 'b_loc'])
+    """
+    num_locs = len(positions) // 3
+    if not names:
+        names = _unique_names(base_name, num_locs)
+
+    # Pass 1 - create nodes, the locator's parent transform is created along with it
+    mod = om.MDagModifier()
+    loc_tfms = [mod.createNode('locator') for i in range(num_locs)]
+    mod.doIt()
+
+    # Pass 2 - rename and set transforms, plug values are angles in radians
+    for i, loc_tfm in enumerate(loc_tfms):
+        fn_tfm = om.MFnDagNode(loc_tfm)
+        mod.renameNode(loc_tfm, names[i])
+        mod.renameNode(fn_tfm.child(0), '{}Shape'.format(names[i]))
+        for j, attr in enumerate(['translateX', 'translateY', 'translateZ']):
+            mod.newPlugValueDouble(fn_tfm.findPlug(attr, False), positions[i * 3 + j])
+        if rotations:
+            for j, attr in enumerate(['rotateX', 'rotateY', 'rotateZ']):
+                mod.newPlugValueDouble(fn_tfm.findPlug(attr, False), math.radians(rotations[i * 3 + j]))
+    apiundo.do_it(mod)
+
+    created_locs = [om.MFnDagNode(loc_tfm).partialPathName() for loc_tfm in loc_tfms]
+    if created_locs:
+        cmds.select(created_locs)
+    return created_locs
+
+
+def create_up_locators(nodes, up_vectors, names=None):
+    """Creates a world space locator per node at the node's local up_vector offset, with the node's rotation
+
+    Same result as parenting a locator under the node, setting its translate to up_vector and its
+    rotate to zero then unparenting it, but positions are computed from the nodes' world matrices
+    (read in one API pass) and all locators are created with create_locators().  Node scale is
+    not carried over to the locators.
+
+    Args:
+        nodes:      Transforms/joints to offset from
+        up_vectors: [x, y, z] local offset per node, or a single [x, y, z] used for every node
+        names:      Optional locator names, defaults to "<node>_up"
+
+    Example:
+        create_up_locators(['lf_legFrontLowerPiston_jnt', 'lf_legFrontUpperPiston_jnt'], [0, 0, 1])
+    """
+    if up_vectors and not isinstance(up_vectors[0], (list, tuple)):
+        up_vectors = [up_vectors] * len(nodes)
+    if not names:
+        names = ['{}_up'.format(node) for node in nodes]
+
+    matrices = chain.get_chain_data(nodes)['matrices']
+    positions = list()
+    rotations = list()
+    for up, mtx in zip(up_vectors, matrices):
+        # Row vector point transform, up * world matrix
+        positions.extend([up[0] * mtx[c] + up[1] * mtx[4 + c] + up[2] * mtx[8 + c] + mtx[12 + c] for c in range(3)])
+        rotations.extend(orient.matrix_to_euler_xyz(orient.rotation_matrix(mtx)))
+
+    return create_locators(positions, rotations=rotations, names=names)
+
+
+def _unique_names(base_name, count):
+    """Returns count numbered names "base_name1", "base_name2"... that don't exist in the scene"""
+    existing = set(cmds.ls('{}*'.format(base_name)))
+    names = list()
+    i = 1
+    while len(names) < count:
+        name = '{}{}'.format(base_name, i)
+        if name not in existing:
+            names.append(name)
+        i += 1
+    return names
+
 
 def snap_object():
     """Snaps first selected objects to last selected object"""
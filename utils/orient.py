@@ -0,0 +1,220 @@
+"""
+orient.py
+
+Closed-form aim/orient math used in place of temporary aim, orient and point constraints.
+
+Matrices follow Maya's row vector convention, each row of a rotation matrix is a world space
+axis (X, Y, Z) of the oriented object.  This module does not import Maya so it can be used
+and tested outside of Maya.  NumPy is optional, it is only needed by the batch functions.
+
+    from mechRig_toolkit.utils import orient
+
+    # Rotation aiming X down the direction with Y up, as an aimConstraint with worldUpType 'vector'
+    rot = orient.aim_matrix([1, 1, 0], [0, 1, 0], aim_vector=[1, 0, 0], up_vector=[0, 1, 0])
+    orient.matrix_to_euler_xyz(rot)
+    # Result: [0.0, 0.0, 45.0] #
+
+    # Same for many joints at once with NumPy
+    rots = orient.aim_matrices(aim_directions, up_directions)
+    orient.matrices_to_euler_xyz(rots)
+
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Below this length a vector is treated as zero length
+EPSILON = 1.0e-10
+
+
+def subtract(a, b):
+    """Returns vector a - b"""
+    return [a[0] - b[0], a[1] - b[1], a[2] - b[2]]
+
+
+def dot(a, b):
+    """Returns dot product of vectors a and b"""
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def cross(a, b):
+    """Returns cross product of vectors a and b"""
+    return [a[1] * b[2] - a[2] * b[1],
+            a[2] * b[0] - a[0] * b[2],
+            a[0] * b[1] - a[1] * b[0]]
+
+
+def length(a):
+    """Returns length of vector a"""
+    return math.sqrt(dot(a, a))
+
+
+def normalize(a):
+    """Returns unit length copy of vector a, zero vectors are returned unchanged"""
+    vec_len = length(a)
+    if vec_len < EPSILON:
+        return [float(a[0]), float(a[1]), float(a[2])]
+    return [a[0] / vec_len, a[1] / vec_len, a[2] / vec_len]
+
+
+def transpose(m):
+    """Returns transpose of 3x3 matrix m, the inverse for pure rotation matrices"""
+    return [[m[0][0], m[1][0], m[2][0]],
+            [m[0][1], m[1][1], m[2][1]],
+            [m[0][2], m[1][2], m[2][2]]]
+
+
+def multiply(a, b):
+    """Returns 3x3 matrix product a * b, with row vectors this applies a first then b"""
+    return [[sum(a[r][k] * b[k][c] for k in range(3)) for c in range(3)] for r in range(3)]
+
+
+def rotation_matrix(matrix):
+    """Returns the scale-free 3x3 rotation of a 4x4 matrix given as a flat list of 16 values
+
+    Accepts matrices as returned by xform(q=True, ws=True, matrix=True) or getAttr('.worldMatrix')
+    """
+    return [normalize(matrix[0:3]), normalize(matrix[4:7]), normalize(matrix[8:11])]
+
+
+def compose_matrix(rotation, position, scale=(1.0, 1.0, 1.0)):
+    """Returns flat 16 value matrix from 3x3 rotation, position and optional scale, usable by xform(matrix=)"""
+    matrix = list()
+    for i in range(3):
+        matrix.extend([rotation[i][0] * scale[i], rotation[i][1] * scale[i], rotation[i][2] * scale[i], 0.0])
+    matrix.extend([position[0], position[1], position[2], 1.0])
+    return matrix
+
+
+def frame(primary, secondary):
+    """Returns orthonormal rows [primary, secondary, tertiary] with primary kept exact
+
+    The secondary axis is made perpendicular to primary, tertiary is primary x secondary
+    """
+    prim = normalize(primary)
+    tert = normalize(cross(prim, secondary))
+    sec = cross(tert, prim)
+    return [prim, sec, tert]
+
+
+def aim_matrix(aim_direction, up_direction, aim_vector=(1, 0, 0), up_vector=(0, 1, 0)):
+    """Returns world rotation pointing aim_vector down aim_direction and up_vector towards up_direction
+
+    Matches aimConstraint, up_direction is the worldUpVector for worldUpType 'vector' or
+    (worldUpObject position - constrained position) for worldUpType 'object'.
+
+    Args:
+        aim_direction:  World space direction to aim at (target position - position)
+        up_direction:   World space up direction
+        aim_vector:     Local axis of the object that aims
+        up_vector:      Local axis of the object that points up
+
+    Example:
+        aim_matrix([1, 1, 0], [0, 1, 0], aim_vector=[1, 0, 0], up_vector=[0, 1, 0])
+    """
+    local_frame = frame(aim_vector, up_vector)
+    world_frame = frame(aim_direction, up_direction)
+    return multiply(transpose(local_frame), world_frame)
+
+
+def rotate_between(vec_a, vec_b):
+    """Returns the shortest arc rotation taking vec_a to vec_b
+
+    Matches aimConstraint with worldUpType 'none', where only the aim axis is solved
+    """
+    a = normalize(vec_a)
+    b = normalize(vec_b)
+    axis = cross(a, b)
+    sin_a = length(axis)
+    cos_a = dot(a, b)
+
+    if sin_a < EPSILON:
+        if cos_a > 0.0:
+            return [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+        # Opposite vectors, rotate 180 degrees around any axis perpendicular to a
+        axis = cross(a, [1.0, 0.0, 0.0])
+        if length(axis) < EPSILON:
+            axis = cross(a, [0.0, 1.0, 0.0])
+        sin_a = 0.0
+
+    x, y, z = normalize(axis)
+    t = 1.0 - cos_a
+    # Axis/angle (Rodrigues) rotation, transposed for row vectors
+    return [[t * x * x + cos_a, t * x * y + sin_a * z, t * x * z - sin_a * y],
+            [t * x * y - sin_a * z, t * y * y + cos_a, t * y * z + sin_a * x],
+            [t * x * z + sin_a * y, t * y * z - sin_a * x, t * z * z + cos_a]]
+
+
+def local_rotation(world_rotation, parent_rotation):
+    """Returns rotation relative to parent, world = local * parent"""
+    return multiply(world_rotation, transpose(parent_rotation))
+
+
+def matrix_to_euler_xyz(m):
+    """Returns [rx, ry, rz] degrees for rotate order xyz (the rotate order of jointOrient)"""
+    sin_y = max(-1.0, min(1.0, -m[0][2]))
+    ry = math.asin(sin_y)
+    if abs(sin_y) < 1.0 - EPSILON:
+        rx = math.atan2(m[1][2], m[2][2])
+        rz = math.atan2(m[0][1], m[0][0])
+    else:
+        # Gimbal lock, put all of the rotation into X
+        rx = math.atan2(sin_y * m[1][0], m[1][1])
+        rz = 0.0
+    return [math.degrees(rx), math.degrees(ry), math.degrees(rz)]
+
+
+# =================================================
+# NumPy batch versions, arrays of N vectors (N, 3) and N matrices (N, 3, 3)
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('NumPy is required for batch orientation, use the single matrix functions instead')
+
+
+def _normalize_rows(vecs):
+    lengths = np.sqrt(np.einsum('ij,ij->i', vecs, vecs))
+    lengths[lengths < EPSILON] = 1.0
+    return vecs / lengths[:, np.newaxis]
+
+
+def frames(primaries, secondaries):
+    """Batch version of frame(), returns (N, 3, 3) orthonormal rows"""
+    _require_numpy()
+    prim = _normalize_rows(np.asarray(primaries, dtype=float).reshape(-1, 3))
+    sec = np.broadcast_to(np.asarray(secondaries, dtype=float).reshape(-1, 3), prim.shape)
+    tert = _normalize_rows(np.cross(prim, sec))
+    return np.stack([prim, np.cross(tert, prim), tert], axis=1)
+
+
+def aim_matrices(aim_directions, up_directions, aim_vector=(1, 0, 0), up_vector=(0, 1, 0)):
+    """Batch version of aim_matrix(), up_directions can be (N, 3) or a single shared up vector
+
+    Example:
+        aim_matrices([[1, 0, 0], [0, 1, 0]], [0, 0, 1])
+    """
+    _require_numpy()
+    local_frame = np.array(frame(aim_vector, up_vector))
+    return np.einsum('ji,njk->nik', local_frame, frames(aim_directions, up_directions))
+
+
+def local_rotations(world_rotations, parent_rotations):
+    """Batch version of local_rotation()"""
+    _require_numpy()
+    return np.einsum('nij,nkj->nik', np.asarray(world_rotations, dtype=float),
+                     np.asarray(parent_rotations, dtype=float))
+
+
+def matrices_to_euler_xyz(matrices):
+    """Batch version of matrix_to_euler_xyz(), returns (N, 3) degrees"""
+    _require_numpy()
+    m = np.asarray(matrices, dtype=float).reshape(-1, 3, 3)
+    sin_y = np.clip(-m[:, 0, 2], -1.0, 1.0)
+    gimbal = np.abs(sin_y) >= 1.0 - EPSILON
+    rx = np.where(gimbal, np.arctan2(sin_y * m[:, 1, 0], m[:, 1, 1]), np.arctan2(m[:, 1, 2], m[:, 2, 2]))
+    rz = np.where(gimbal, 0.0, np.arctan2(m[:, 0, 1], m[:, 0, 0]))
+    return np.degrees(np.stack([rx, np.arcsin(sin_y), rz], axis=1))
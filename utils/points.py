@@ -0,0 +1,187 @@
+"""
+points.py
+
+Bulk world space position queries for mixed selections of transforms, joints and components.
+
+Positions are gathered per selection item through the OpenMaya API, so a compact component
+selection like "pPlane1.vtx[0:19999]" is read with a single getPoints() call instead of
+20k individual xform commands.
+
+    from mechRig_toolkit.utils import points
+
+    # Flat [x, y, z, x, y, z, ...] array of every selected object/component position
+    positions = points.get_positions()
+
+    # Loop over the positions as (x, y, z) tuples
+    for pos in points.iter_points(positions):
+        print(pos)
+
+"""
+import logging
+
+logging.basicConfig()
+LOG = logging.getLogger(__name__)
+LOG.setLevel(logging.INFO)
+
+import math
+import re
+from array import array
+
+from maya import cmds
+from maya.api import OpenMaya as om
+
+# Surface points ("nurbsPlane1.uv[0.5][0.25]") are not real components in the API, so parse them
+SURFACE_POINT_RE = re.compile(r'^(?P<node>[^.]+)\.uv\[(?P<u>[^\]:]+)\]\[(?P<v>[^\]:]+)\]$')
+
+
+def get_positions(items=None, pivot=True):
+    """Returns world space positions of items as a flat array('d') of [x, y, z, x, y, z, ...] values
+
+    Transforms and joints return their world rotate pivot (same as xform's "piv" flag) unless pivot
+    is False, in which case their world translation is used.  Vertices, curve CVs, surface CVs and
+    surface points are read in bulk per shape, any other component type falls back to xform.
+
+    Args:
+        items:  List of objects/components, uses the current selection (in selection order) if None
+        pivot:  Use the rotate pivot of transforms instead of their translation
+
+    Example:
+        get_positions(['pSphere1.vtx[0:381]', 'joint1', 'curve1.cv[2]'])
+    """
+    if items is None:
+        items = cmds.ls(orderedSelection=True) or list()
+
+    positions = array('d')
+    point_cache = dict()
+    for item in items:
+        positions.extend(_item_positions(item, pivot, point_cache))
+
+    return positions
+
+
+def get_rotations(items):
+    """Returns world space rotations (xyz rotate order, degrees) of items as a flat array('d')
+
+    Items without a transform (components, DG nodes) return a zero rotation so the result always
+    lines up with get_positions(items) for single, non-compacted items.
+
+    Example:
+        get_rotations(['joint1', 'locator1'])
+    """
+    rotations = array('d')
+    for item in items:
+        try:
+            dag_path, component = om.MGlobal.getSelectionListByName(item).getComponent(0)
+        except (RuntimeError, TypeError):
+            rotations.extend([0.0, 0.0, 0.0])
+            continue
+
+        if component.isNull() and dag_path.hasFn(om.MFn.kTransform):
+            rot = om.MTransformationMatrix(dag_path.inclusiveMatrix()).rotation()
+            rotations.extend([math.degrees(rot.x), math.degrees(rot.y), math.degrees(rot.z)])
+        else:
+            rotations.extend([0.0, 0.0, 0.0])
+
+    return rotations
+
+
+def iter_points(positions):
+    """Yields (x, y, z) tuples from a flat position array returned by get_positions()"""
+    return zip(positions[0::3], positions[1::3], positions[2::3])
+
+
+def get_dag_path(node):
+    """Returns MDagPath for node name"""
+    sel = om.MSelectionList()
+    sel.add(node)
+    return sel.getDagPath(0)
+
+
+def get_shape_path(dag_path):
+    """Returns a copy of dag_path extended to its shape if dag_path is a transform"""
+    shape_path = om.MDagPath(dag_path)
+    if shape_path.hasFn(om.MFn.kTransform) and not shape_path.hasFn(om.MFn.kShape):
+        shape_path.extendToShape()
+    return shape_path
+
+
+def _item_positions(item, pivot, point_cache):
+    """Returns flat list of positions for a single (possibly compacted) selection item"""
+    match = SURFACE_POINT_RE.match(item)
+    if match:
+        surf_path = get_shape_path(get_dag_path(match.group('node')))
+        pnt = om.MFnNurbsSurface(surf_path).getPointAtParam(float(match.group('u')), float(match.group('v')),
+                                                            om.MSpace.kWorld)
+        return [pnt.x, pnt.y, pnt.z]
+
+    try:
+        sel = om.MGlobal.getSelectionListByName(item)
+    except RuntimeError:
+        LOG.warning('{} does not exist, skipping'.format(item))
+        return list()
+
+    result = list()
+    for i in range(sel.length()):
+        try:
+            dag_path, component = sel.getComponent(i)
+        except (RuntimeError, TypeError):
+            # Not a DAG node, let xform sort it out
+            result.extend(_xform_positions(sel.getSelectionStrings(i), pivot))
+            continue
+
+        if component.isNull():
+            if dag_path.hasFn(om.MFn.kTransform):
+                if pivot:
+                    pnt = om.MFnTransform(dag_path).rotatePivot(om.MSpace.kWorld)
+                    result.extend([pnt.x, pnt.y, pnt.z])
+                else:
+                    mtx = dag_path.inclusiveMatrix()
+                    result.extend([mtx.getElement(3, 0), mtx.getElement(3, 1), mtx.getElement(3, 2)])
+            else:
+                result.extend(_xform_positions(sel.getSelectionStrings(i), pivot))
+
+        elif component.hasFn(om.MFn.kMeshVertComponent):
+            pnts = _cached_points(point_cache, dag_path, om.MFnMesh)
+            for idx in om.MFnSingleIndexedComponent(component).getElements():
+                result.extend([pnts[idx].x, pnts[idx].y, pnts[idx].z])
+
+        elif component.hasFn(om.MFn.kCurveCVComponent):
+            pnts = _cached_points(point_cache, dag_path, om.MFnNurbsCurve)
+            for idx in om.MFnSingleIndexedComponent(component).getElements():
+                result.extend([pnts[idx].x, pnts[idx].y, pnts[idx].z])
+
+        elif component.hasFn(om.MFn.kSurfaceCVComponent):
+            fn_surf = om.MFnNurbsSurface(get_shape_path(dag_path))
+            for u, v in om.MFnDoubleIndexedComponent(component).getElements():
+                pnt = fn_surf.cvPosition(u, v, om.MSpace.kWorld)
+                result.extend([pnt.x, pnt.y, pnt.z])
+
+        else:
+            # Edges, faces, lattice points etc. keep the original per-item behavior
+            result.extend(_xform_positions(sel.getSelectionStrings(i), pivot))
+
+    return result
+
+
+def _cached_points(point_cache, dag_path, fn_type):
+    """Returns world space points of a mesh/curve shape, only read once per shape per query"""
+    shape_path = get_shape_path(dag_path)
+    key = shape_path.fullPathName()
+    if key not in point_cache:
+        if fn_type is om.MFnMesh:
+            point_cache[key] = om.MFnMesh(shape_path).getPoints(om.MSpace.kWorld)
+        else:
+            point_cache[key] = fn_type(shape_path).cvPositions(om.MSpace.kWorld)
+    return point_cache[key]
+
+
+def _xform_positions(items, pivot=True):
+    """Per-item xform position query, used as fallback for anything the API path does not handle"""
+    result = list()
+    for item in cmds.ls(items, flatten=True):
+        if pivot and cmds.nodeType(item) in ['transform', 'joint']:
+            pos = cmds.xform(item, query=True, worldSpace=True, piv=True)
+        else:
+            pos = cmds.xform(item, query=True, worldSpace=True, translation=True)
+        result.extend(pos[:3])
+    return result
@@ -5,6 +5,9 @@ Various skinning functions.
 
     from mechRig_toolkit.utils import skin
 
+    # Skin every mesh listed in a skin manifest and apply its weights in one pass
+    skin.skin_from_manifest('C:/project/builds/Cambot_rig/skin_manifest.json')
+
 """
 import logging
 
@@ -12,9 +15,20 @@ logging.basicConfig()
 LOG = logging.getLogger(__name__)
 LOG.setLevel(logging.INFO)
 
+import json
 import os.path
+import timeit
+
+from maya import cmds
+
+from mechRig_toolkit.utils import skincluster
+reload(skincluster)
 
-from maya import cmds, mel
+from mechRig_toolkit.utils import skin_io
+reload(skin_io)
+
+from mechRig_toolkit.utils import skin_transfer
+reload(skin_transfer)
 
 def do_transfer_skin():
     """Transfer skin of first selected object to second selected object"""
@@ -28,20 +42,29 @@ def do_transfer_skin():
         return
 
 
-def transfer_skin(source, target):
-    """Transfer the skinning from source object to target object"""
+def transfer_skin(source, target, barycentric=True):
+    """Transfer the skinning from source object to target object
+
+    Weights are transferred by closest point on the source surface in one bulk pass (see
+    skin_transfer), like copySkinWeights' closestPoint.  With barycentric=False the weights of
+    the closest source vertex are copied.  The rebind and weights are undone in one step.
+    """
     src_geom = source
-    src_skin = mel.eval('findRelatedSkinCluster("{}")'.format(src_geom))
+    src_skin = skincluster.find_skin_cluster(src_geom)
 
     if src_skin:
         src_infs = cmds.skinCluster(src_skin, query=True, influence=True)
 
-        tgt_geom = target
-        tgt_skin = mel.eval('findRelatedSkinCluster("{}")'.format(tgt_geom))
-        if tgt_skin:
-            cmds.delete(tgt_skin)
-        tgt_skin = cmds.skinCluster(src_infs, tgt_geom, name=tgt_geom + '_skinCluster', toSelectedBones=True)[0]
-        cmds.copySkinWeights(sourceSkin=src_skin, destinationSkin=tgt_skin, surfaceAssociation='closestPoint', influenceAssociation='oneToOne', noMirror=True, smooth=False)
+        cmds.undoInfo(openChunk=True, chunkName='transfer_skin')
+        try:
+            tgt_geom = target
+            tgt_skin = skincluster.find_skin_cluster(tgt_geom)
+            if tgt_skin:
+                cmds.delete(tgt_skin)
+            tgt_skin = cmds.skinCluster(src_infs, tgt_geom, name=tgt_geom + '_skinCluster', toSelectedBones=True)[0]
+            skin_transfer.transfer_weights(src_skin, tgt_skin, barycentric=barycentric)
+        finally:
+            cmds.undoInfo(closeChunk=True)
 
         LOG.info('Successfully transferred skinning from {} to {}'.format(source, target))
 
@@ -91,8 +114,9 @@ def return_skin_command():
     """Returns skinCluster command to replicate selected objects skinning"""
     selection = cmds.ls(selection=True)
     if selection:
+        skin_clusters = skincluster.find_skin_clusters(selection)
         for item in selection:
-            sc = mel.eval('findRelatedSkinCluster("{}")'.format(item))
+            sc = skin_clusters[item]
             if sc:
                 infs = cmds.skinCluster(sc, q=True, inf=True)
                 str_infs = " ".join(infs)
@@ -101,58 +125,212 @@ def return_skin_command():
 
 
 def import_skin_weights_selected():
-    """Imports skin weights on selected meshes from Maya Project's "data" directory
-    using Maya's deformerWeights command.
+    """Imports skin weights on selected meshes from Maya Project's "data" directory, see import_skin_weights()"""
+    selection = cmds.ls(selection=True)
+    if selection:
+        import_skin_weights(selection)
+
+
+def import_skin_weights(meshes):
+    """Imports skin weights on meshes from Maya Project's "data" directory.
 
     Skin weights should be exported using the meshes name, for instance, the skin weight
-    file for the mesh "cn_head_mesh" should be exported as "cn_head_mesh.xml'
+    file for the mesh "cn_head_mesh" should be exported as "cn_head_mesh.skw' (binary) or
+    "cn_head_mesh.xml' (deformerWeights).  Binary files are used when both exist and are
+    loaded in parallel, XML files are imported with Maya's deformerWeights command as a fallback.
 
     If a skin weight file is not found, the process is skipped without error
     """
     PROJ_PATH = cmds.workspace(query=True, rd=True)
     DATA_PATH = PROJ_PATH + 'data/'
 
-    selection = cmds.ls(selection=True)
-    if selection:
-        for mesh in selection:
+    if meshes:
+        skin_clusters = skincluster.find_skin_clusters(meshes)
+        binary_items = list()
+        for mesh in meshes:
             # Check if there's a skin cluster on mesh
-            sc = mel.eval('findRelatedSkinCluster("{}")'.format(mesh))
+            sc = skin_clusters[mesh]
             if sc:
-                # Check if the skin weight xml file exist
-                if os.path.exists(DATA_PATH+"{}.xml".format(mesh)):
+                # Check if the binary or xml skin weight file exist
+                if os.path.exists(DATA_PATH + mesh + skin_io.FILE_EXT):
+                    binary_items.append((sc, DATA_PATH + mesh + skin_io.FILE_EXT))
+                elif os.path.exists(DATA_PATH+"{}.xml".format(mesh)):
                     cmds.deformerWeights("{}.xml".format(mesh), im=True, method='index', deformer=sc, path=DATA_PATH)
                     cmds.skinCluster(sc, edit=True, forceNormalizeWeights=True)
                     LOG.info('Imported skin weight file {}'.format((DATA_PATH+"{}.xml".format(mesh))))
                 else:
-                    LOG.warning('No skin weight XML file found for {}'.format(mesh))
+                    LOG.warning('No skin weight file found for {}'.format(mesh))
             else:
                 LOG.warning('No skin cluster found on {}'.format(mesh))
 
+        if binary_items:
+            skin_io.import_weights_batch(binary_items)
+
+
+def export_skin_weights_selected(file_format='binary', compress=False, force=False, dry_run=False):
+    """Exports skin weights on selected meshes to Maya Project's "data" directory, see export_skin_weights()"""
+    selection = cmds.ls(selection=True)
+    if selection:
+        return export_skin_weights(selection, file_format=file_format, compress=compress, force=force,
+                                   dry_run=dry_run)
+
 
-def export_skin_weights_selected():
-    """Exports skin weights on selected meshes to Maya Project's "data" directory
-    using Maya's deformerWeights command.
+def export_skin_weights(meshes, file_format='binary', compress=False, force=False, dry_run=False):
+    """Exports skin weights on meshes to Maya Project's "data" directory.
 
     Skin weights are exported using the meshes name, for instance, the skin weight
-    file for the mesh "cn_head_mesh" would be exported as "cn_head_mesh.xml'
+    file for the mesh "cn_head_mesh" would be exported as "cn_head_mesh.skw'
+
+    Binary files are written in batch, weights are gathered from every mesh first while
+    serialization and file writes run in parallel.  A per-mesh timing summary is logged.
+    Binary files whose weights and influences have not changed since the last export are
+    skipped, their content hashes are kept in a manifest in the "data" directory.
+
+    Args:
+        file_format:  'binary' for compact skin_io files or 'xml' for Maya's deformerWeights
+        compress:     zlib compress binary files, for archiving only, compressed files cannot be
+                      memory-mapped when they are read back
+        force:        Rewrite binary files even if their weights have not changed
+        dry_run:      Only log which binary files would be rewritten
 
     If a skin cluster is not found on a mesh, the process is skipped without error
     """
     PROJ_PATH = cmds.workspace(query=True, rd=True)
     DATA_PATH = PROJ_PATH + 'data/'
 
-    selection = cmds.ls(selection=True)
-    if selection:
-        for mesh in selection:
+    if meshes:
+        # Check if the data directory exists
+        if not os.path.exists(DATA_PATH):
+            LOG.warning('No data directory found under {} to save skin weight file to'.format(PROJ_PATH))
+            return
+
+        skin_clusters = skincluster.find_skin_clusters(meshes)
+        binary_items = list()
+        for mesh in meshes:
             # Check if there's a skin cluster on mesh
-            sc = mel.eval('findRelatedSkinCluster("{}")'.format(mesh))
+            sc = skin_clusters[mesh]
             if sc:
-                # Check if the skin weight xml file exist
-                if os.path.exists(DATA_PATH):
+                if file_format == 'xml':
                     cmds.deformerWeights("{}.xml".format(mesh), export=True, method='index', deformer=sc, path=DATA_PATH)
                     LOG.info('Exported skin weight data to {}'.format((DATA_PATH+"{}.xml".format(mesh))))
                 else:
-                    LOG.warning('No data directory found under {} to save skin weight file to'.format(PROJ_PATH))
+                    binary_items.append((sc, DATA_PATH + mesh + skin_io.FILE_EXT))
             else:
                 LOG.warning('No skin cluster found on {}'.format(mesh))
 
+        if binary_items:
+            return skin_io.export_weights_batch(binary_items, compress=compress, force=force, dry_run=dry_run)
+
+
+def read_skin_manifest(path):
+    """Returns the list of skin manifest entries in a JSON skin manifest file
+
+    A skin manifest describes the skinning of an asset, one entry per mesh:
+
+        {"meshes": [{"mesh": "cn_head_mesh",
+                     "influences": ["cn_head_jnt", "lf_antenna_jnt"],
+                     "name": "cn_head_mesh_sc",
+                     "weights": "cn_head_mesh.skw"}]}
+
+    "name" defaults to "<mesh>_sc", "weights" is a .skw or .xml file in the data directory and
+    defaults to "<mesh>.skw" or "<mesh>.xml", whichever exists.
+    """
+    with open(path, 'r') as f:
+        return json.loads(f.read())['meshes']
+
+
+def write_skin_manifest(path, meshes):
+    """Writes a skin manifest of the current skinning of meshes, see read_skin_manifest()
+
+    An existing manifest is updated in place, entries keep their other keys ("name", "weights")
+    and only their influences are refreshed.  Entries of meshes not listed are kept as they are,
+    new meshes are added with the name of their current skinCluster.
+
+    Example:
+        write_skin_manifest('C:/project/builds/Cambot_rig/skin_manifest.json', cmds.ls(selection=True))
+    """
+    entries = read_skin_manifest(path) if os.path.exists(path) else list()
+    existing = dict((entry['mesh'], entry) for entry in entries)
+
+    num_written = 0
+    skin_clusters = skincluster.find_skin_clusters(meshes)
+    for mesh in meshes:
+        sc = skin_clusters[mesh]
+        if sc:
+            entry = existing.get(mesh)
+            if entry is None:
+                entry = {'mesh': mesh, 'name': sc}
+                entries.append(entry)
+                existing[mesh] = entry
+            entry['influences'] = cmds.skinCluster(sc, q=True, inf=True)
+            num_written += 1
+        else:
+            LOG.warning('No skin cluster found on {}'.format(mesh))
+
+    with open(path, 'w') as f:
+        f.write(json.dumps({'meshes': entries}, sort_keys=1, indent=4, separators=(",", ":")))
+    LOG.info('Wrote skin manifest for {} meshes to {}'.format(num_written, path))
+    return path
+
+
+def skin_from_manifest(path, data_path=None):
+    """Creates every skinCluster in a skin manifest and applies the weight files in one pass
+
+    Binary weight files are read on a thread pool and applied with a single setWeights call per
+    mesh, XML files fall back to deformerWeights.  Logs a per-mesh timing summary.
+
+    Args:
+        path:       Skin manifest JSON file, see read_skin_manifest()
+        data_path:  Directory of the weight files, defaults to the Maya Project's "data" directory
+
+    Returns:
+        dict of {mesh: {step: seconds}}
+
+    Example:
+        skin_from_manifest('C:/project/builds/Cambot_rig/skin_manifest.json')
+    """
+    if data_path is None:
+        data_path = cmds.workspace(query=True, rd=True) + 'data/'
+
+    timings = dict()
+    binary_items = list()
+    binary_meshes = dict()
+    for entry in read_skin_manifest(path):
+        mesh = entry['mesh']
+        if not cmds.objExists(mesh):
+            LOG.warning('{} in skin manifest does not exist, skipping'.format(mesh))
+            continue
+
+        start = timeit.default_timer()
+        sc = skincluster.find_skin_cluster(mesh)
+        if sc:
+            LOG.warning('{} is already skinned by {}, applying weights to it'.format(mesh, sc))
+        else:
+            sc = cmds.skinCluster(entry['influences'], mesh, name=entry.get('name', '{}_sc'.format(mesh)),
+                                  toSelectedBones=True)[0]
+        timings[mesh] = {'create': timeit.default_timer() - start}
+
+        weights = entry.get('weights')
+        candidates = [weights] if weights else [mesh + skin_io.FILE_EXT, '{}.xml'.format(mesh)]
+        weight_files = [f for f in candidates if os.path.exists(os.path.join(data_path, f))]
+        if not weight_files:
+            if weights:
+                LOG.warning('Weight file {} for {} not found in {}'.format(weights, mesh, data_path))
+            continue
+
+        if weight_files[0].endswith(skin_io.FILE_EXT):
+            binary_items.append((sc, os.path.join(data_path, weight_files[0])))
+            binary_meshes[binary_items[-1][1]] = mesh
+        else:
+            start = timeit.default_timer()
+            cmds.deformerWeights(weight_files[0], im=True, method='index', deformer=sc, path=data_path)
+            cmds.skinCluster(sc, edit=True, forceNormalizeWeights=True)
+            timings[mesh]['apply'] = timeit.default_timer() - start
+            LOG.info('Imported skin weight file {}'.format(os.path.join(data_path, weight_files[0])))
+
+    if binary_items:
+        for weight_file, steps in skin_io.import_weights_batch(binary_items).items():
+            timings[binary_meshes[weight_file]].update(steps)
+
+    skin_io.log_timings('Skinning {}'.format(os.path.basename(path)), timings)
+    return timings
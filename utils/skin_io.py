@@ -0,0 +1,576 @@
+"""
+skin_io.py
+
+Compact binary skin weight files, a faster alternative to deformerWeights XML.
+
+Weights are stored sparse (CSR style), only non-zero vertex/influence weights are written:
+
+    header       magic "MRSW", version, flags, vertex count, influence count, weight count, name table size
+    names        influence names, null separated
+    offsets      uint32 * (vertex count + 1), weights of vertex i are offsets[i]:offsets[i + 1]
+    influences   uint16 (or uint32) influence index of each weight
+    weights      float32 weight values
+
+Every section starts on an 8 byte boundary so the arrays can be memory-mapped straight from
+the file.  Files can optionally be zlib compressed after the header, compressed files are
+smaller but are decompressed into memory rather than memory-mapped.  NumPy is used when
+available, otherwise the standard array module is used.
+
+    from mechRig_toolkit.utils import skin_io
+
+    skin_io.export_weights('cn_head_mesh_sc', 'C:/project/data/cn_head_mesh.skw')
+    skin_io.import_weights('cn_head_mesh_sc', 'C:/project/data/cn_head_mesh.skw')
+
+    # Many skinClusters at once, files are written on a thread pool
+    skin_io.export_weights_batch([('cn_head_mesh_sc', 'C:/project/data/cn_head_mesh.skw'),
+                                  ('cn_body_mesh_sc', 'C:/project/data/cn_body_mesh.skw')])
+
+    # Only list which files would be rewritten, unchanged weights are skipped when exporting
+    skin_io.export_weights_batch(items, dry_run=True)
+
+"""
+import logging
+
+logging.basicConfig()
+LOG = logging.getLogger(__name__)
+LOG.setLevel(logging.INFO)
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import timeit
+import zlib
+from array import array
+from multiprocessing.pool import ThreadPool
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from maya import cmds
+from maya.api import OpenMaya as om
+from maya.api import OpenMayaAnim as oma
+
+from mechRig_toolkit.utils import apiundo
+reload(apiundo)
+
+FILE_EXT = '.skw'
+MAGIC = b'MRSW'
+VERSION = 1
+
+# Header: magic, version, flags, vertex count, influence count, weight count, name table bytes
+HEADER = struct.Struct('<4sHHIIII')
+ALIGNMENT = 8
+
+# Flags
+FLAG_WIDE_INDICES = 1
+FLAG_ZLIB = 2
+
+# zlib level used for compressed files, favours speed over size
+COMPRESS_LEVEL = 1
+
+# Worker threads used by the batch functions
+THREADS = 4
+
+# Sidecar file next to exported weights storing the content hash of each weight file
+MANIFEST_NAME = 'skin_weights_manifest.json'
+
+# Weights below this value are not stored
+WEIGHT_THRESHOLD = 1.0e-6
+
+
+def get_skin_cluster_fn(skin_cluster):
+    """Returns MFnSkinCluster for skin_cluster name"""
+    sel = om.MSelectionList()
+    sel.add(skin_cluster)
+    return oma.MFnSkinCluster(sel.getDependNode(0))
+
+
+def get_geometry_path(fn_skin):
+    """Returns MDagPath of the geometry deformed by MFnSkinCluster fn_skin"""
+    return fn_skin.getPathAtIndex(fn_skin.indexForOutputConnection(0))
+
+
+def get_all_vertices(geo_path):
+    """Returns (component MObject, vertex count) covering every point of the skinned geometry
+
+    Mesh vertices, curve and surface CVs and lattice points are supported, other shapes raise a
+    ValueError.
+    """
+    num_verts = om.MItGeometry(geo_path).exactCount()
+    if geo_path.hasFn(om.MFn.kMesh):
+        fn_comp = om.MFnSingleIndexedComponent()
+        component = fn_comp.create(om.MFn.kMeshVertComponent)
+        fn_comp.setCompleteData(num_verts)
+    elif geo_path.hasFn(om.MFn.kNurbsCurve):
+        fn_comp = om.MFnSingleIndexedComponent()
+        component = fn_comp.create(om.MFn.kCurveCVComponent)
+        fn_comp.setCompleteData(num_verts)
+    elif geo_path.hasFn(om.MFn.kNurbsSurface):
+        fn_surface = om.MFnNurbsSurface(geo_path)
+        fn_comp = om.MFnDoubleIndexedComponent()
+        component = fn_comp.create(om.MFn.kSurfaceCVComponent)
+        fn_comp.setCompleteData(fn_surface.numCVsInU, fn_surface.numCVsInV)
+    elif geo_path.hasFn(om.MFn.kLattice):
+        fn_comp = om.MFnTripleIndexedComponent()
+        component = fn_comp.create(om.MFn.kLatticeComponent)
+        fn_comp.setCompleteData(*[cmds.getAttr('{}.{}Divisions'.format(geo_path.fullPathName(), axis))
+                                  for axis in 'stu'])
+    else:
+        raise ValueError('Unsupported skinned geometry {} ({})'.format(geo_path.partialPathName(),
+                                                                      geo_path.node().apiTypeStr))
+    return component, num_verts
+
+
+def get_skin_weights(skin_cluster):
+    """Returns sparse skin weight data of skin_cluster
+
+    Returns:
+        dict with keys
+            influences:    List of influence names
+            num_vertices:  Vertex count of the skinned geometry
+            offsets:       Weights of vertex i are offsets[i]:offsets[i + 1] in indices/weights
+            indices:       Influence index of each weight
+            weights:       Weight values
+    """
+    fn_skin = get_skin_cluster_fn(skin_cluster)
+    geo_path = get_geometry_path(fn_skin)
+    component, num_verts = get_all_vertices(geo_path)
+
+    influences = [inf.partialPathName() for inf in fn_skin.influenceObjects()]
+    dense, num_infs = fn_skin.getWeights(geo_path, component)
+
+    data = {'influences': influences, 'num_vertices': num_verts}
+    data.update(dense_to_sparse(dense, num_verts, num_infs))
+    return data
+
+
+def set_skin_weights(skin_cluster, data, normalize=True):
+    """Applies sparse skin weight data to skin_cluster with a single MFnSkinCluster.setWeights call
+
+    Influences are matched by name, influences missing from skin_cluster are skipped with a warning.
+    The previous weights are kept on Maya's undo queue (apiundo), so the write can be undone.
+
+    Returns:
+        True if weights were applied
+    """
+    fn_skin = get_skin_cluster_fn(skin_cluster)
+    geo_path = get_geometry_path(fn_skin)
+    component, num_verts = get_all_vertices(geo_path)
+
+    if num_verts != data['num_vertices']:
+        LOG.error('Vertex count mismatch on {}, skinned geometry has {} but weight data has {}'.format(
+            skin_cluster, num_verts, data['num_vertices']))
+        return False
+
+    # Map influence index in the data to influence index in the skinCluster
+    sc_influences = [inf.partialPathName() for inf in fn_skin.influenceObjects()]
+    sc_short_names = [inf.split('|')[-1] for inf in sc_influences]
+    inf_map = list()
+    for inf in data['influences']:
+        short_name = inf.split('|')[-1]
+        if short_name in sc_short_names:
+            inf_map.append(sc_short_names.index(short_name))
+        else:
+            LOG.warning('Influence {} is not in {}, skipping its weights'.format(inf, skin_cluster))
+            inf_map.append(-1)
+
+    dense = sparse_to_dense(data, inf_map, len(sc_influences))
+    inf_indices = om.MIntArray(list(range(len(sc_influences))))
+    old_weights = fn_skin.setWeights(geo_path, component, inf_indices, dense, False, True)
+    apiundo.commit(lambda: fn_skin.setWeights(geo_path, component, inf_indices, old_weights, False),
+                   lambda: fn_skin.setWeights(geo_path, component, inf_indices, dense, False))
+
+    if normalize:
+        cmds.skinCluster(skin_cluster, edit=True, forceNormalizeWeights=True)
+    return True
+
+
+def dense_to_sparse(dense, num_verts, num_infs):
+    """Converts dense vertex * influence weights to sparse offsets/indices/weights arrays"""
+    if np is not None:
+        values = np.array(dense, dtype=np.float64).reshape(num_verts, num_infs)
+        mask = values > WEIGHT_THRESHOLD
+        offsets = np.zeros(num_verts + 1, dtype=np.uint32)
+        offsets[1:] = np.cumsum(mask.sum(axis=1))
+        index_type = np.uint32 if num_infs > 0xFFFF else np.uint16
+        return {'offsets': offsets,
+                'indices': np.nonzero(mask)[1].astype(index_type),
+                'weights': values[mask].astype(np.float32)}
+
+    offsets = array('I', [0])
+    indices = array('I' if num_infs > 0xFFFF else 'H')
+    weights = array('f')
+    values = list(dense)
+    for vtx in range(num_verts):
+        base = vtx * num_infs
+        for inf in range(num_infs):
+            weight = values[base + inf]
+            if weight > WEIGHT_THRESHOLD:
+                indices.append(inf)
+                weights.append(weight)
+        offsets.append(len(weights))
+    return {'offsets': offsets, 'indices': indices, 'weights': weights}
+
+
+def sparse_to_dense(data, inf_map, num_infs):
+    """Returns MDoubleArray of vertex * num_infs weights, inf_map maps data influence index to column
+
+    The array is allocated zeroed and only the stored (non-zero) weights are set, the dense
+    weights are never built as a Python list.
+    """
+    offsets = data['offsets']
+    num_verts = data['num_vertices']
+    dense = om.MDoubleArray(num_verts * num_infs, 0.0)
+
+    if np is not None:
+        columns = np.asarray(inf_map, dtype=np.int64)[np.asarray(data['indices'], dtype=np.int64)]
+        rows = np.repeat(np.arange(num_verts), np.diff(np.asarray(offsets, dtype=np.int64)))
+        valid = columns >= 0
+        positions = rows[valid] * num_infs + columns[valid]
+        weights = np.asarray(data['weights'], dtype=np.float64)[valid]
+        for i, weight in zip(positions.tolist(), weights.tolist()):
+            dense[i] = weight
+        return dense
+
+    indices = data['indices']
+    weights = data['weights']
+    for vtx in range(num_verts):
+        base = vtx * num_infs
+        for i in range(offsets[vtx], offsets[vtx + 1]):
+            column = inf_map[indices[i]]
+            if column >= 0:
+                dense[base + column] = weights[i]
+    return dense
+
+
+def _padding(size):
+    return b'\0' * (-size % ALIGNMENT)
+
+
+def _to_bytes(values, typecode):
+    """Returns little endian bytes of a NumPy array or array.array"""
+    if np is not None:
+        dtype = {'I': '<u4', 'H': '<u2', 'f': '<f4'}[typecode]
+        return np.asarray(values).astype(dtype).tobytes()
+
+    values = array(typecode, values)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes() if hasattr(values, 'tobytes') else values.tostring()
+
+
+def serialize(data, compress=False):
+    """Returns the binary file contents of sparse skin weight data as bytes
+
+    Args:
+        data:      Sparse skin weight data as returned by get_skin_weights()
+        compress:  zlib compress everything after the header
+    """
+    num_infs = len(data['influences'])
+    wide = num_infs > 0xFFFF
+    names = b'\0'.join(inf.encode('utf-8') for inf in data['influences'])
+    flags = (FLAG_WIDE_INDICES if wide else 0) | (FLAG_ZLIB if compress else 0)
+
+    # The header size is a multiple of ALIGNMENT so body offsets stay aligned in the file
+    chunks = [names, _padding(len(names))]
+    for values, typecode in [(data['offsets'], 'I'), (data['indices'], 'I' if wide else 'H'), (data['weights'], 'f')]:
+        raw = _to_bytes(values, typecode)
+        chunks.extend([raw, _padding(len(raw))])
+    body = b''.join(chunks)
+    if compress:
+        body = zlib.compress(body, COMPRESS_LEVEL)
+
+    return HEADER.pack(MAGIC, VERSION, flags, data['num_vertices'], num_infs, len(data['weights']),
+                       len(names)) + body
+
+
+def deserialize(buf):
+    """Returns sparse skin weight data from file contents, buf can be bytes or an mmap
+
+    With NumPy the offsets/indices/weights arrays of uncompressed files are views into buf,
+    no data is copied
+    """
+    magic, version, flags, num_verts, num_infs, num_weights, names_size = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError('Not a skin weight file, bad header {}'.format(magic))
+    if version > VERSION:
+        raise ValueError('Skin weight file version {} is newer than supported version {}'.format(version, VERSION))
+
+    pos = HEADER.size
+    if flags & FLAG_ZLIB:
+        buf = zlib.decompress(buf[pos:])
+        pos = 0
+
+    names = buf[pos:pos + names_size]
+    influences = [name.decode('utf-8') for name in names.split(b'\0')] if num_infs else list()
+    pos += names_size + len(_padding(names_size))
+
+    data = {'influences': influences, 'num_vertices': num_verts}
+    index_type = 'I' if flags & FLAG_WIDE_INDICES else 'H'
+    for key, typecode, count in [('offsets', 'I', num_verts + 1), ('indices', index_type, num_weights),
+                                 ('weights', 'f', num_weights)]:
+        size = count * struct.calcsize('<' + typecode)
+        if np is not None:
+            dtype = {'I': '<u4', 'H': '<u2', 'f': '<f4'}[typecode]
+            data[key] = np.frombuffer(buf, dtype=dtype, count=count, offset=pos)
+        else:
+            values = array(typecode)
+            raw = buf[pos:pos + size]
+            values.frombytes(raw) if hasattr(values, 'frombytes') else values.fromstring(raw)
+            if sys.byteorder == 'big':
+                values.byteswap()
+            data[key] = values
+        pos += size + len(_padding(size))
+
+    return data
+
+
+def write_weights(path, data, compress=False):
+    """Writes sparse skin weight data to a binary skin weight file"""
+    with open(path, 'wb') as f:
+        f.write(serialize(data, compress))
+    return path
+
+
+def read_weights(path, use_mmap=True):
+    """Reads a binary skin weight file, memory-mapping it unless use_mmap is False
+
+    Note: with NumPy and use_mmap the returned arrays reference the mapped file, apply them
+    before the data goes out of scope
+    """
+    with open(path, 'rb') as f:
+        if use_mmap:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buf = f.read()
+    return deserialize(buf)
+
+
+def export_weights(skin_cluster, path):
+    """Exports skin_cluster weights to a binary skin weight file
+
+    export_weights('cn_head_mesh_sc', 'C:/project/data/cn_head_mesh.skw')
+    """
+    write_weights(path, get_skin_weights(skin_cluster))
+    LOG.info('Exported skin weight data to {}'.format(path))
+    return path
+
+
+def import_weights(skin_cluster, path):
+    """Imports binary skin weight file onto skin_cluster
+
+    import_weights('cn_head_mesh_sc', 'C:/project/data/cn_head_mesh.skw')
+    """
+    result = set_skin_weights(skin_cluster, read_weights(path))
+    if result:
+        LOG.info('Imported skin weight file {}'.format(path))
+    return result
+
+
+# =================================================
+# Batch export/import
+#
+# Maya's API is only safe to use from the main thread, so weights are always read and applied
+# there.  Serialization, compression and file IO run on a thread pool, zlib and file IO release
+# the GIL so they overlap with the main thread's work on the next skinCluster.
+
+
+def _progress_start(title, count):
+    """Shows a progress window unless Maya is running in batch mode, returns True if shown"""
+    if cmds.about(batch=True):
+        return False
+    cmds.progressWindow(title=title, progress=0, maxValue=max(count, 1), status='', isInterruptable=False)
+    return True
+
+
+def _progress_step(shown, status):
+    if shown:
+        cmds.progressWindow(edit=True, step=1, status=status)
+
+
+def _progress_end(shown):
+    if shown:
+        cmds.progressWindow(endProgress=True)
+
+
+def hash_weights(data):
+    """Returns a hex digest of sparse skin weight data's influences and weights
+
+    Weights are hashed as stored in the file (float32), so the digest only changes when the
+    exported file would change.
+    """
+    wide = len(data['influences']) > 0xFFFF
+    digest = hashlib.sha1(struct.pack('<HII', VERSION, data['num_vertices'], len(data['influences'])))
+    digest.update(b'\0'.join(inf.encode('utf-8') for inf in data['influences']))
+    for values, typecode in [(data['offsets'], 'I'), (data['indices'], 'I' if wide else 'H'), (data['weights'], 'f')]:
+        digest.update(_to_bytes(values, typecode))
+    return digest.hexdigest()
+
+
+def read_manifest(directory):
+    """Returns {file name: digest} from the manifest in directory, empty if there is none"""
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return dict()
+    with open(path, 'r') as f:
+        return json.loads(f.read())
+
+
+def write_manifest(directory, manifest):
+    """Writes {file name: digest} to the manifest in directory"""
+    with open(os.path.join(directory, MANIFEST_NAME), 'w') as f:
+        f.write(json.dumps(manifest, sort_keys=1, indent=4, separators=(",", ":")))
+
+
+def _write_job(job):
+    """Thread pool worker, hashes then serializes and writes one file if its weights changed
+
+    Returns:
+        (path, status, digest, seconds, bytes), status is one of 'new', 'changed', 'unchanged'
+    """
+    path, data, compress, old_digest, dry_run = job
+    start = timeit.default_timer()
+    digest = hash_weights(data)
+    if old_digest is None or not os.path.exists(path):
+        status = 'new'
+    elif digest != old_digest:
+        status = 'changed'
+    else:
+        status = 'unchanged'
+
+    size = 0
+    if status != 'unchanged' and not dry_run:
+        buf = serialize(data, compress)
+        with open(path, 'wb') as f:
+            f.write(buf)
+        size = len(buf)
+    return path, status, digest, timeit.default_timer() - start, size
+
+
+def _read_job(path):
+    """Thread pool worker, reads and parses one file, returns (path, data, seconds)"""
+    start = timeit.default_timer()
+    data = read_weights(path)
+    return path, data, timeit.default_timer() - start
+
+
+def log_timings(title, timings):
+    """Logs per item timings {item: {step: seconds}} slowest first, with the totals per step"""
+    LOG.info('===== {} ({} items) ====='.format(title, len(timings)))
+    totals = dict()
+    for item in sorted(timings, key=lambda i: sum(timings[i].values()), reverse=True):
+        LOG.info('{:<60} {}'.format(item, '  '.join('{} {:.3f}s'.format(step, secs)
+                                                        for step, secs in sorted(timings[item].items()))))
+        for step, secs in timings[item].items():
+            totals[step] = totals.get(step, 0.0) + secs
+    LOG.info('{:<60} {}'.format('Total', '  '.join('{} {:.3f}s'.format(step, secs)
+                                                   for step, secs in sorted(totals.items()))))
+
+
+def export_weights_batch(items, compress=False, threads=THREADS, force=False, dry_run=False):
+    """Exports the weights of many skinClusters, hashing and file writes run on a thread pool
+
+    A content hash of each file is kept in a manifest next to the files, files whose weights and
+    influences have not changed since the last export are not rewritten.
+
+    Args:
+        items:     List of (skin_cluster, path) pairs
+        compress:  zlib compress the files, for archiving only as compressed files are not memory-mapped
+        threads:   Number of writer threads
+        force:     Rewrite every file even if its weights have not changed
+        dry_run:   Only log which files would be written, nothing is written
+
+    Returns:
+        dict of {path: {'gather': seconds, 'write': seconds}}, or {path: status} for a dry run
+
+    Example:
+        export_weights_batch([('cn_head_mesh_sc', 'C:/project/data/cn_head_mesh.skw')], dry_run=True)
+    """
+    manifests = dict()
+    for skin_cluster, path in items:
+        directory = os.path.dirname(path)
+        if directory not in manifests:
+            manifests[directory] = read_manifest(directory)
+
+    timings = dict()
+    statuses = dict()
+    shown = _progress_start('Exporting skin weights', len(items))
+    pool = ThreadPool(max(threads, 1))
+    try:
+        pending = list()
+        for skin_cluster, path in items:
+            start = timeit.default_timer()
+            data = get_skin_weights(skin_cluster)
+            timings[path] = {'gather': timeit.default_timer() - start}
+            old_digest = None if force else manifests[os.path.dirname(path)].get(os.path.basename(path))
+            pending.append(pool.apply_async(_write_job, [(path, data, compress, old_digest, dry_run)]))
+            _progress_step(shown, 'Gathered {}'.format(skin_cluster))
+
+        for result in pending:
+            path, status, digest, secs, size = result.get()
+            timings[path]['write'] = secs
+            statuses[path] = status
+            manifests[os.path.dirname(path)][os.path.basename(path)] = digest
+            if size:
+                LOG.info('Exported skin weight data to {} ({:.1f} KB)'.format(path, size / 1024.0))
+    finally:
+        pool.close()
+        pool.join()
+        _progress_end(shown)
+
+    if dry_run:
+        LOG.info('===== Skin weight export dry run ({} files) ====='.format(len(statuses)))
+        for path in sorted(statuses):
+            LOG.info('{:<10} {}'.format(statuses[path], path))
+        LOG.info('{} of {} files would be written'.format(
+            len([path for path in statuses if statuses[path] != 'unchanged']), len(statuses)))
+        return statuses
+
+    for directory, manifest in manifests.items():
+        write_manifest(directory, manifest)
+
+    skipped = [path for path in statuses if statuses[path] == 'unchanged']
+    if skipped:
+        LOG.info('Skipped {} unchanged skin weight files'.format(len(skipped)))
+    log_timings('Skin weight export', timings)
+    return timings
+
+
+def import_weights_batch(items, threads=THREADS):
+    """Imports the weights of many skinClusters, file reads run on a thread pool
+
+    Files are applied on the main thread in the order they finish loading.
+
+    Args:
+        items:    List of (skin_cluster, path) pairs
+        threads:  Number of reader threads
+
+    Returns:
+        dict of {path: {'read': seconds, 'apply': seconds}}
+
+    Example:
+        import_weights_batch([('cn_head_mesh_sc', 'C:/project/data/cn_head_mesh.skw')])
+    """
+    skin_clusters = dict((path, skin_cluster) for skin_cluster, path in items)
+    timings = dict()
+    shown = _progress_start('Importing skin weights', len(items))
+    pool = ThreadPool(max(threads, 1))
+    try:
+        for path, data, secs in pool.imap_unordered(_read_job, [path for skin_cluster, path in items]):
+            start = timeit.default_timer()
+            if set_skin_weights(skin_clusters[path], data):
+                LOG.info('Imported skin weight file {}'.format(path))
+            timings[path] = {'read': secs, 'apply': timeit.default_timer() - start}
+            _progress_step(shown, 'Applied {}'.format(skin_clusters[path]))
+    finally:
+        pool.close()
+        pool.join()
+        _progress_end(shown)
+
+    log_timings('Skin weight import', timings)
+    return timings
@@ -0,0 +1,272 @@
+"""
+skin_transfer.py
+
+Closest point skin weight transfer between skinned meshes, a faster alternative to
+copySkinWeights(surfaceAssociation='closestPoint') on dense meshes.
+
+The source mesh is indexed once (KD-tree) and every target vertex is looked up against it in
+bulk.  By default weights are interpolated barycentrically at the closest point on the source
+surface, like copySkinWeights' closestPoint, optionally the weights of the closest source vertex
+are copied instead.  The resulting weights are applied to the target with one setWeights call.
+
+    from mechRig_toolkit.utils import skin_transfer
+
+    # Blend weights at the closest point on the source surface
+    skin_transfer.transfer_weights('body_skinCluster', 'shirt_skinCluster')
+
+    # Copy weights of the closest source vertex, faster but differs on mismatched topology
+    skin_transfer.transfer_weights('body_skinCluster', 'shirt_skinCluster', barycentric=False)
+
+"""
+import logging
+
+logging.basicConfig()
+LOG = logging.getLogger(__name__)
+LOG.setLevel(logging.INFO)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from maya.api import OpenMaya as om
+
+from mechRig_toolkit.utils import kdtree
+reload(kdtree)
+
+from mechRig_toolkit.utils import orient
+reload(orient)
+
+from mechRig_toolkit.utils import skin_io
+reload(skin_io)
+
+
+# Closest triangle centroids tested per query point by the bulk closest_triangles()
+TRIANGLE_CANDIDATES = 8
+
+# Query points solved together by the bulk closest_triangles(), bounds temporary array memory
+CHUNK_SIZE = 10000
+
+
+def get_world_points(geo_path):
+    """Returns flat [x, y, z, ...] world positions of every vertex of a mesh"""
+    positions = list()
+    for pnt in om.MFnMesh(geo_path).getPoints(om.MSpace.kWorld):
+        positions.extend([pnt.x, pnt.y, pnt.z])
+    return positions
+
+
+def get_dense_weights(skin_cluster):
+    """Returns (influence names, vertex weight rows) of skin_cluster
+
+    Rows are a (vertices, influences) NumPy array, or a list of lists without NumPy
+    """
+    fn_skin = skin_io.get_skin_cluster_fn(skin_cluster)
+    geo_path = skin_io.get_geometry_path(fn_skin)
+    component, num_verts = skin_io.get_all_vertices(geo_path)
+    influences = [inf.partialPathName() for inf in fn_skin.influenceObjects()]
+    dense, num_infs = fn_skin.getWeights(geo_path, component)
+
+    if np is not None:
+        return influences, np.array(dense, dtype=np.float64).reshape(num_verts, num_infs)
+    values = list(dense)
+    return influences, [values[i * num_infs:(i + 1) * num_infs] for i in range(num_verts)]
+
+
+def barycentric_coords(point, tri_a, tri_b, tri_c):
+    """Returns barycentric weights of point projected onto triangle a, b, c
+
+    Weights are clamped to the triangle, so points outside of it blend the closest edge
+    """
+    edge_b = orient.subtract(tri_b, tri_a)
+    edge_c = orient.subtract(tri_c, tri_a)
+    offset = orient.subtract(point, tri_a)
+    d_bb = orient.dot(edge_b, edge_b)
+    d_bc = orient.dot(edge_b, edge_c)
+    d_cc = orient.dot(edge_c, edge_c)
+    d_ob = orient.dot(offset, edge_b)
+    d_oc = orient.dot(offset, edge_c)
+    denom = d_bb * d_cc - d_bc * d_bc
+    if abs(denom) < orient.EPSILON:
+        # Degenerate triangle, use the first vertex
+        return [1.0, 0.0, 0.0]
+
+    w_b = (d_cc * d_ob - d_bc * d_oc) / denom
+    w_c = (d_bb * d_oc - d_bc * d_ob) / denom
+    weights = [max(1.0 - w_b - w_c, 0.0), max(w_b, 0.0), max(w_c, 0.0)]
+    total = sum(weights)
+    return [w / total for w in weights]
+
+
+def get_triangles(geo_path):
+    """Returns flat [a, b, c, a, b, c, ...] vertex indices of every triangle of a mesh"""
+    counts, vertices = om.MFnMesh(geo_path).getTriangles()
+    return list(vertices)
+
+
+def _closest_on_triangles(points, tri_a, tri_b, tri_c):
+    """Returns (M, 3) barycentric weights of the closest point on each triangle to each point
+
+    All arguments are (M, 3) arrays, the Voronoi region tests of Ericson's "Real-Time Collision
+    Detection" 5.1.5 are evaluated for every point at once.
+    """
+    edge_b = tri_b - tri_a
+    edge_c = tri_c - tri_a
+    dot = lambda u, v: np.einsum('ij,ij->i', u, v)
+    d1 = dot(edge_b, points - tri_a)
+    d2 = dot(edge_c, points - tri_a)
+    d3 = dot(edge_b, points - tri_b)
+    d4 = dot(edge_c, points - tri_b)
+    d5 = dot(edge_b, points - tri_c)
+    d6 = dot(edge_c, points - tri_c)
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    def ratio(num, den):
+        return np.where(np.abs(den) > orient.EPSILON, num / np.where(den == 0.0, 1.0, den), 0.0)
+
+    # Inside the triangle, then each region overrides it, checked in reverse so the first region wins
+    v = ratio(vb, va + vb + vc)
+    w = ratio(vc, va + vb + vc)
+    weights = np.stack([1.0 - v - w, v, w], axis=1)
+
+    w_bc = ratio(d4 - d3, (d4 - d3) + (d5 - d6))
+    w_ac = ratio(d2, d2 - d6)
+    v_ab = ratio(d1, d1 - d3)
+    zeros = np.zeros(len(points))
+    ones = np.ones(len(points))
+    regions = [((va <= 0.0) & (d4 - d3 >= 0.0) & (d5 - d6 >= 0.0), [zeros, 1.0 - w_bc, w_bc]),
+               ((vb <= 0.0) & (d2 >= 0.0) & (d6 <= 0.0), [1.0 - w_ac, zeros, w_ac]),
+               ((d6 >= 0.0) & (d5 <= d6), [zeros, zeros, ones]),
+               ((vc <= 0.0) & (d1 >= 0.0) & (d3 <= 0.0), [1.0 - v_ab, v_ab, zeros]),
+               ((d3 >= 0.0) & (d4 <= d3), [zeros, ones, zeros]),
+               ((d1 <= 0.0) & (d2 <= 0.0), [ones, zeros, zeros])]
+    for mask, region_weights in regions:
+        weights[mask] = np.stack(region_weights, axis=1)[mask]
+    return weights
+
+
+def _vertex_triangles(triangles, num_verts):
+    """Returns (vertices, max valence) array of the triangles using each vertex, padded with -1"""
+    flat = triangles.ravel()
+    order = np.argsort(flat, kind='mergesort')
+    verts = flat[order]
+    tris = order // 3
+    counts = np.bincount(flat, minlength=num_verts)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    adjacency = np.full((num_verts, max(counts.max(), 1)), -1, dtype=np.int64)
+    adjacency[verts, np.arange(len(flat)) - starts[verts]] = tris
+    return adjacency
+
+
+def closest_triangles(src_path, query_positions):
+    """Returns (vertex indices, barycentric weights) of the closest source triangle per query point
+
+    With NumPy every query point is solved in bulk, candidate triangles are the triangles whose
+    centroids are closest (KD-tree) and the triangles around the closest source vertex, the
+    closest point on each candidate is computed for all query points at once.  Without NumPy
+    MMeshIntersector builds its spatial index of the source mesh once and every query reuses it.
+    """
+    if np is not None:
+        return _closest_triangles_bulk(src_path, query_positions)
+
+    intersector = om.MMeshIntersector()
+    intersector.create(src_path.node(), src_path.inclusiveMatrix())
+    fn_mesh = om.MFnMesh(src_path)
+    src_points = fn_mesh.getPoints(om.MSpace.kWorld)
+
+    triangles = list()
+    blend = list()
+    triangle_cache = dict()
+    for query in zip(query_positions[0::3], query_positions[1::3], query_positions[2::3]):
+        pom = intersector.getClosestPoint(om.MPoint(query[0], query[1], query[2]))
+        key = (pom.face, pom.triangle)
+        if key not in triangle_cache:
+            triangle_cache[key] = list(fn_mesh.getPolygonTriangleVertices(pom.face, pom.triangle))
+        verts = triangle_cache[key]
+        corners = [[src_points[v].x, src_points[v].y, src_points[v].z] for v in verts]
+        triangles.append(verts)
+        blend.append(barycentric_coords(query, *corners))
+    return triangles, blend
+
+
+def _closest_triangles_bulk(src_path, query_positions):
+    """NumPy version of closest_triangles(), returns (N, 3) vertex indices and (N, 3) weights"""
+    src_points = np.asarray(get_world_points(src_path), dtype=np.float64).reshape(-1, 3)
+    triangles = np.asarray(get_triangles(src_path), dtype=np.int64).reshape(-1, 3)
+    queries = np.asarray(query_positions, dtype=np.float64).reshape(-1, 3)
+
+    centroids = src_points[triangles].mean(axis=1)
+    near_tris = np.asarray(kdtree.nearest_indices(centroids.ravel(), query_positions, k=TRIANGLE_CANDIDATES),
+                           dtype=np.int64).reshape(len(queries), -1)
+    near_verts = np.asarray(kdtree.nearest_indices(src_points.ravel(), query_positions), dtype=np.int64)
+    candidates = np.concatenate([near_tris, _vertex_triangles(triangles, len(src_points))[near_verts]], axis=1)
+    # Padding is replaced by the closest centroid's triangle, solving it twice is harmless
+    candidates = np.where(candidates < 0, near_tris[:, :1], candidates)
+
+    result_tris = np.zeros((len(queries), 3), dtype=np.int64)
+    result_blend = np.zeros((len(queries), 3))
+    num_candidates = candidates.shape[1]
+    for start in range(0, len(queries), CHUNK_SIZE):
+        chunk = slice(start, start + CHUNK_SIZE)
+        chunk_tris = candidates[chunk].ravel()
+        corners = src_points[triangles[chunk_tris]]
+        points = np.repeat(queries[chunk], num_candidates, axis=0)
+        blend = _closest_on_triangles(points, corners[:, 0], corners[:, 1], corners[:, 2])
+        closest = np.einsum('nk,nki->ni', blend, corners)
+        dists = ((closest - points) ** 2).sum(axis=1).reshape(-1, num_candidates)
+        best = np.argmin(dists, axis=1) + np.arange(len(dists)) * num_candidates
+        result_tris[chunk] = triangles[chunk_tris[best]]
+        result_blend[chunk] = blend[best]
+    return result_tris, result_blend
+
+
+def transfer_weights(src_skin, tgt_skin, barycentric=True):
+    """Transfers weights from src_skin to tgt_skin by closest point in world space
+
+    Target influences are matched to source influences by name, the target skinCluster should
+    have the source influences (see skin.transfer_skin()).
+
+    Args:
+        src_skin:     Source skinCluster
+        tgt_skin:     Target skinCluster
+        barycentric:  Blend weights at the closest point on the source surface (copySkinWeights'
+                      closestPoint), False copies the weights of the closest source vertex
+
+    Example:
+        transfer_weights('body_skinCluster', 'shirt_skinCluster', barycentric=False)
+    """
+    src_path = skin_io.get_geometry_path(skin_io.get_skin_cluster_fn(src_skin))
+    tgt_path = skin_io.get_geometry_path(skin_io.get_skin_cluster_fn(tgt_skin))
+    tgt_positions = get_world_points(tgt_path)
+    num_verts = len(tgt_positions) // 3
+    influences, src_weights = get_dense_weights(src_skin)
+    num_infs = len(influences)
+
+    if barycentric:
+        triangles, blend = closest_triangles(src_path, tgt_positions)
+        if np is not None:
+            triangles = np.asarray(triangles)
+            blend = np.asarray(blend)
+            tgt_weights = np.einsum('nk,nki->ni', blend, src_weights[triangles])
+        else:
+            tgt_weights = list()
+            for verts, vert_blend in zip(triangles, blend):
+                rows = [src_weights[v] for v in verts]
+                tgt_weights.append([sum(vert_blend[k] * rows[k][i] for k in range(3)) for i in range(num_infs)])
+    else:
+        closest = kdtree.nearest_indices(get_world_points(src_path), tgt_positions)
+        if np is not None:
+            tgt_weights = src_weights[np.asarray(closest)]
+        else:
+            tgt_weights = [src_weights[v] for v in closest]
+
+    if np is not None:
+        dense = tgt_weights.ravel()
+    else:
+        dense = [weight for row in tgt_weights for weight in row]
+
+    data = {'influences': influences, 'num_vertices': num_verts}
+    data.update(skin_io.dense_to_sparse(dense, num_verts, num_infs))
+    return skin_io.set_skin_weights(tgt_skin, data)
@@ -0,0 +1,201 @@
+"""
+skincluster.py
+
+Python replacement for mel's findRelatedSkinCluster with a mesh -> skinCluster cache.
+
+Deformer history is walked once per mesh through the API, later lookups come from the cache.
+The cache is keyed by the node itself rather than its name, so renamed and reused names are
+never mixed up, and a cached skinCluster is only returned while it still deforms the node.
+Scene callbacks clear the cache when skinClusters are created or deleted and when a scene is
+opened, and deleted nodes are detected from their object handles.
+
+    from mechRig_toolkit.utils import skincluster
+
+    # Same as mel.eval('findRelatedSkinCluster("cn_head_mesh")'), but cached
+    skincluster.find_skin_cluster('cn_head_mesh')
+
+    # Every mesh under the geo group in one pass, {mesh: skinCluster or None}
+    skincluster.find_skin_clusters_in_group('geo')
+
+"""
+import logging
+
+logging.basicConfig()
+LOG = logging.getLogger(__name__)
+LOG.setLevel(logging.INFO)
+
+from maya import cmds
+from maya.api import OpenMaya as om
+from maya.api import OpenMayaAnim as oma
+
+# {node MObjectHandle hash code: (node handle, skinCluster handle or None)}
+_CACHE = dict()
+
+# Callback ids survive reload() of this module so callbacks are never registered twice
+try:
+    _CALLBACK_IDS
+except NameError:
+    _CALLBACK_IDS = list()
+
+
+def clear_cache(*args):
+    """Clears the skinCluster cache, also used as the scene callback"""
+    _CACHE.clear()
+
+
+def install_callbacks():
+    """Registers the callbacks that clear the cache, called automatically on first lookup"""
+    if _CALLBACK_IDS:
+        return
+    _CALLBACK_IDS.append(om.MDGMessage.addNodeAddedCallback(clear_cache, 'skinCluster'))
+    _CALLBACK_IDS.append(om.MDGMessage.addNodeRemovedCallback(clear_cache, 'skinCluster'))
+    _CALLBACK_IDS.append(om.MSceneMessage.addCallback(om.MSceneMessage.kAfterOpen, clear_cache))
+    _CALLBACK_IDS.append(om.MSceneMessage.addCallback(om.MSceneMessage.kAfterNew, clear_cache))
+
+
+def remove_callbacks():
+    """Removes the cache callbacks and clears the cache"""
+    if _CALLBACK_IDS:
+        om.MMessage.removeCallbacks(_CALLBACK_IDS)
+        del _CALLBACK_IDS[:]
+    clear_cache()
+
+
+def _get_node(node):
+    """Returns MObject of node name, None if it does not exist"""
+    try:
+        return om.MGlobal.getSelectionListByName(node).getDependNode(0)
+    except RuntimeError:
+        return None
+
+
+def _get_shapes(node_obj):
+    """Returns the non-intermediate shape MObjects of a transform, or the shape itself"""
+    if not node_obj.hasFn(om.MFn.kTransform):
+        return [node_obj]
+    fn_dag = om.MFnDagNode(node_obj)
+    shapes = list()
+    for i in range(fn_dag.childCount()):
+        child = fn_dag.child(i)
+        if child.hasFn(om.MFn.kShape) and not om.MFnDagNode(child).isIntermediateObject:
+            shapes.append(child)
+    return shapes
+
+
+def _skin_cluster_of_shape(shape_obj):
+    """Walks the deformer history upstream of a shape, returns the skinCluster deforming it or None"""
+    it_dg = om.MItDependencyGraph(shape_obj, om.MFn.kSkinClusterFilter, om.MItDependencyGraph.kUpstream,
+                                  om.MItDependencyGraph.kDepthFirst, om.MItDependencyGraph.kNodeLevel)
+    while not it_dg.isDone():
+        sc_obj = it_dg.currentNode()
+        # History can reach skinClusters of other meshes (blendShape targets etc.), check the output
+        try:
+            oma.MFnSkinCluster(sc_obj).indexForOutputShape(shape_obj)
+            return sc_obj
+        except RuntimeError:
+            pass
+        it_dg.next()
+    return None
+
+
+def _deforms(sc_obj, node_obj):
+    """Returns True if skinCluster sc_obj deforms a shape of node_obj"""
+    fn_skin = oma.MFnSkinCluster(sc_obj)
+    for shape_obj in _get_shapes(node_obj):
+        try:
+            fn_skin.indexForOutputShape(shape_obj)
+            return True
+        except RuntimeError:
+            pass
+    return False
+
+
+def _cached_name(entry, node_obj):
+    """Returns the current skinCluster name of a cache entry, False if the entry is stale"""
+    node_handle, sc_handle = entry
+    if not node_handle.isValid() or node_handle.object() != node_obj:
+        return False
+    if sc_handle is None:
+        return None
+    if not sc_handle.isValid() or not _deforms(sc_handle.object(), node_obj):
+        return False
+    return om.MFnDependencyNode(sc_handle.object()).name()
+
+
+def find_skin_cluster(node):
+    """Returns the skinCluster deforming node (a transform or shape), None if it is not skinned
+
+    Example:
+        find_skin_cluster('cn_head_mesh')
+    """
+    install_callbacks()
+    node_obj = _get_node(node)
+    if node_obj is None:
+        LOG.warning('{} does not exist'.format(node))
+        return None
+
+    key = om.MObjectHandle(node_obj).hashCode()
+    if key in _CACHE:
+        name = _cached_name(_CACHE[key], node_obj)
+        if name is not False:
+            return name
+
+    sc_obj = None
+    for shape_obj in _get_shapes(node_obj):
+        sc_obj = _skin_cluster_of_shape(shape_obj)
+        if sc_obj is not None:
+            break
+
+    _CACHE[key] = (om.MObjectHandle(node_obj), om.MObjectHandle(sc_obj) if sc_obj is not None else None)
+    return om.MFnDependencyNode(sc_obj).name() if sc_obj is not None else None
+
+
+def find_skin_clusters(nodes):
+    """Returns {node: skinCluster or None} for a list of transforms/shapes
+
+    Example:
+        find_skin_clusters(cmds.ls(selection=True))
+    """
+    return dict((node, find_skin_cluster(node)) for node in nodes)
+
+
+def find_skin_clusters_in_group(group):
+    """Returns {transform: skinCluster or None} for every mesh/curve transform below group
+
+    Resolved in one pass over the scene's skinClusters and their output geometry instead of a
+    history walk per mesh, the results are added to the cache.
+
+    Example:
+        find_skin_clusters_in_group('geo')
+    """
+    install_callbacks()
+    shapes = cmds.listRelatives(group, allDescendents=True, type=['mesh', 'nurbsCurve', 'nurbsSurface'],
+                                noIntermediate=True, fullPath=True) or list()
+    transforms = list()
+    for shape in shapes:
+        transform = cmds.listRelatives(shape, parent=True, fullPath=True)[0]
+        if transform not in transforms:
+            transforms.append(transform)
+
+    # Map every skinned shape in the scene to its skinCluster
+    shape_handles = dict()
+    for sc in cmds.ls(type='skinCluster'):
+        sc_obj = _get_node(sc)
+        for geo_obj in oma.MFnSkinCluster(sc_obj).getOutputGeometry():
+            shape_handles[om.MFnDagNode(geo_obj).fullPathName()] = om.MObjectHandle(sc_obj)
+
+    results = dict()
+    for transform in transforms:
+        node_obj = _get_node(transform)
+        sc_handle = None
+        for shape_obj in _get_shapes(node_obj):
+            sc_handle = shape_handles.get(om.MFnDagNode(shape_obj).fullPathName())
+            if sc_handle is not None:
+                break
+
+        short_name = cmds.ls(transform)[0]
+        node_handle = om.MObjectHandle(node_obj)
+        _CACHE[node_handle.hashCode()] = (node_handle, sc_handle)
+        results[short_name] = om.MFnDependencyNode(sc_handle.object()).name() if sc_handle else None
+
+    return results
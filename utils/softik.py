@@ -0,0 +1,137 @@
+"""
+softik.py
+
+Soft IK math of ik.add_softIK() evaluated outside of Maya.
+
+Mirrors the utility node network node by node, including the network's rounded e constant and
+the 32 bit float precision of the plusMinusAverage, multiplyDivide, condition and remapValue
+nodes, so results can be compared exactly against the rig.  This module does not import Maya.
+NumPy is optional, it is only needed by the batch functions.
+
+    from mechRig_toolkit.utils import softik
+
+    # End effector translate of a 10 + 10 unit leg with the control 19.5 units from the hip
+    softik.end_effector(19.5, soft_ik=5.0, chain_length=20.0, tip_length=10.0)
+
+    # Every combination of 200 distances and 21 softIk values at once, shape (200, 21)
+    dists = numpy.linspace(10.0, 25.0, 200)
+    softik.end_effectors(dists[:, None], numpy.arange(21.0)[None, :], 20.0, 10.0)
+
+"""
+import struct
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Constant used by the network's pow multiplyDivide, not math.e
+E = 2.718281828
+
+# remapValue range of the control's softIk attribute
+SOFT_IK_MIN = 0.0
+SOFT_IK_MAX = 20.0
+SOFT_MIN = 0.001
+SOFT_MAX = 2.0
+
+
+def _f32(value):
+    """Rounds a Python float to 32 bit float precision, as stored by float node attributes"""
+    return struct.unpack('f', struct.pack('f', value))[0]
+
+
+def soft_value(soft_ik, precise=False):
+    """Returns the remapValue output of the control's softIk attribute, clamped to 0.001 - 2.0"""
+    rnd = float if precise else _f32
+    t = min(max((soft_ik - SOFT_IK_MIN) / (SOFT_IK_MAX - SOFT_IK_MIN), 0.0), 1.0)
+    return rnd(SOFT_MIN + t * (SOFT_MAX - SOFT_MIN))
+
+
+def soft_distance(dist, soft_ik, chain_length, precise=False):
+    """Returns the softened start to effector distance, the condition node output of the network
+
+    Args:
+        dist:           Distance from the start joint to the IK control
+        soft_ik:        softIk attribute value of the control, 0 - 20
+        chain_length:   Summed length of the two bones
+        precise:        Evaluate in double precision instead of the nodes' float precision
+    """
+    rnd = float if precise else _f32
+    dist = rnd(dist)
+    soft = soft_value(soft_ik, precise)
+    len_minus_soft = rnd(chain_length - soft)
+    if len_minus_soft > dist:
+        return dist
+    exponent = rnd(rnd(-rnd(dist - len_minus_soft)) / soft)
+    return rnd(rnd(rnd(1.0 - rnd(E ** exponent)) * soft) + len_minus_soft)
+
+
+def end_effector(dist, soft_ik, chain_length, tip_length, negative=False, precise=False):
+    """Returns the end effector translate along the aim axis driven by the network
+
+    Example:
+        end_effector(19.5, soft_ik=5.0, chain_length=20.0, tip_length=10.0)
+    """
+    rnd = float if precise else _f32
+    out = soft_distance(dist, soft_ik, chain_length, precise)
+    value = rnd(0.0 - rnd(out - rnd(dist))) + tip_length
+    # Negative axes go through a multiplyDivide, back to float precision
+    return rnd(-value) if negative else value
+
+
+# =================================================
+# NumPy batch versions, arguments broadcast against each other
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('NumPy is required for batch soft IK evaluation, use the single value functions instead')
+
+
+def soft_values(soft_ik, precise=False):
+    """Batch version of soft_value()"""
+    _require_numpy()
+    dtype = np.float64 if precise else np.float32
+    t = np.clip((np.asarray(soft_ik, dtype=np.float64) - SOFT_IK_MIN) / (SOFT_IK_MAX - SOFT_IK_MIN), 0.0, 1.0)
+    return (SOFT_MIN + t * (SOFT_MAX - SOFT_MIN)).astype(dtype)
+
+
+def soft_distances(dists, soft_ik, chain_length, precise=False):
+    """Batch version of soft_distance()"""
+    _require_numpy()
+    dtype = np.float64 if precise else np.float32
+    dists = np.asarray(dists, dtype=np.float64).astype(dtype)
+    soft = soft_values(soft_ik, precise)
+    len_minus_soft = (np.asarray(chain_length, dtype=np.float64) - soft).astype(dtype)
+    exponent = ((len_minus_soft - dists) / soft).astype(dtype)
+    # Values past the condition's switch are discarded, only silence their overflow
+    with np.errstate(over='ignore'):
+        power = np.power(E, exponent.astype(np.float64)).astype(dtype)
+    softened = (1 - power) * soft + len_minus_soft
+    return np.where(len_minus_soft <= dists, softened, dists).astype(dtype)
+
+
+def end_effectors(dists, soft_ik, chain_length, tip_length, negative=False, precise=False):
+    """Batch version of end_effector(), returns float64 values holding the network's output precision
+
+    Example:
+        end_effectors(numpy.linspace(10.0, 25.0, 200), 5.0, 20.0, 10.0)
+    """
+    _require_numpy()
+    dtype = np.float64 if precise else np.float32
+    dists = np.asarray(dists, dtype=np.float64).astype(dtype)
+    out = soft_distances(dists, soft_ik, chain_length, precise)
+    value = (dists - out).astype(np.float64) + np.asarray(tip_length, dtype=np.float64)
+    # Negative axes go through a multiplyDivide, back to float precision
+    return (-value).astype(dtype).astype(np.float64) if negative else value
+
+
+def curve(chain_length, tip_length, soft_ik, num_samples=100, min_ratio=0.5, max_ratio=1.2):
+    """Returns (distances, end effector values) sampled from min_ratio to max_ratio of the chain length
+
+    Example:
+        dists, effectors = curve(20.0, 10.0, soft_ik=5.0)
+    """
+    _require_numpy()
+    dists = np.linspace(chain_length * min_ratio, chain_length * max_ratio, num_samples)
+    return dists, end_effectors(dists, soft_ik, chain_length, tip_length)
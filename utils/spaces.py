@@ -14,6 +14,13 @@ LOG = logging.getLogger(__name__)
 LOG.setLevel(logging.INFO)
 
 from maya import cmds
+from maya.api import OpenMaya as om
+
+from mechRig_toolkit.utils import anim
+reload(anim)
+
+# Attributes of the space offset transform keyed by attach/bake_attach
+OFFSET_ATTRS = ['translateX', 'translateY', 'translateZ', 'rotateX', 'rotateY', 'rotateZ']
 
 '''
 def get_parent_constraint(space_constraint_node):
@@ -68,12 +75,18 @@ def _set_world_location(obj, pos_rot):
 '''
 
 # Attach animation control to an object
-def attach(source, target):
+def attach(source, target, frame_range=None):
     """
 
     attach( 'anim_ctl', 'spaceA')
     attach( 'anim_ctl', 'spaceB')
+
+    With a frame_range (start, end) the switch is baked over the range instead, see bake_attach()
+    attach( 'anim_ctl', 'spaceB', frame_range=(1, 120))
     """
+    if frame_range:
+        return bake_attach(source, target, frame_range[0], frame_range[1])
+
     # Get space transforms
     space_constrain = get_message_attribute_connections(source, attrName="space_constraint")
     space_offset = get_message_attribute_connections(source, attrName="space_offset")
@@ -152,6 +165,99 @@ def attach(source, target):
     return space_constrain
 
 
+def bake_attach(source, target, start, end):
+    """Attaches source to target from start to end, keeping source's world animation on every frame
+
+    The world matrices needed for every frame are evaluated with DG contexts without changing the
+    current time, the compensating space offsets are computed in bulk and every attribute gets
+    all of its keys from a single anim curve call.  Keys on the frames before start and after end
+    hold the previous space, so the rest of the shot is unchanged.  The constraint edits and the
+    keys, set through the API with anim.set_keys(), are undone as a single step.
+
+    bake_attach('anim_ctl', 'spaceB', 1, 120)
+    """
+    # Get space transforms
+    space_constrain = get_message_attribute_connections(source, attrName="space_constraint")
+    space_offset = get_message_attribute_connections(source, attrName="space_offset")
+
+    if not space_constrain:
+        LOG.error('There are no space transforms setup on {}'.format(source))
+        return
+
+    constrain = space_constrain[0]
+    offset = space_offset[0]
+    start = int(start)
+    end = int(end)
+    frames = list(range(start, end + 1))
+    offset_attrs = ['{}.{}'.format(offset, attr) for attr in OFFSET_ATTRS]
+
+    # Evaluate everything needed from the current setup before the constraint changes
+    matrices = anim.evaluate_world_matrices([offset, target], frames)
+    held_offsets = anim.evaluate_values(offset_attrs, [start - 1, end + 1])
+    par_cons = get_parent_constraints(constrain)
+    held_weights = dict()
+    if par_cons:
+        weight_attrs = ['{}.w{}'.format(par_cons[0], i)
+                        for i in range(len(cmds.parentConstraint(par_cons[0], q=True, tl=True)))]
+        held_weights = anim.evaluate_values(weight_attrs, [start - 1, end + 1])
+
+    # Constraint edits and keys are undone together as one step
+    cmds.undoInfo(openChunk=True, chunkName='bake_attach')
+    try:
+        # Add target to the constraint
+        if par_cons:
+            par_con = par_cons[0]
+            if target not in cmds.parentConstraint(par_con, q=True, tl=True):
+                add_target_to_constraint(par_con, target)
+        else:
+            par_con = create_parent_constraint(constrain, target, '{}_parcon'.format(constrain))
+        target_list = cmds.parentConstraint(par_con, q=True, tl=True)
+        target_id = target_list.index(target)
+
+        # Constrained world matrix is the target's world rotation at its world rotate pivot, the offset
+        # is its old world matrix relative to that
+        target_pivot = om.MFnTransform(om.MGlobal.getSelectionListByName(target).getDagPath(0)).rotatePivot(
+            om.MSpace.kTransform)
+        rotate_order = cmds.getAttr('{}.rotateOrder'.format(offset))
+        values = dict((attr, [held_offsets[attr][0]]) for attr in offset_attrs)
+        prev_rot = None
+        for offset_world, target_world in zip(matrices[offset], matrices[target]):
+            tfm = om.MTransformationMatrix(target_world)
+            constrain_world = om.MTransformationMatrix()
+            constrain_world.setRotation(tfm.rotation(asQuaternion=True))
+            constrain_world.setTranslation(om.MVector(om.MPoint(target_pivot) * target_world), om.MSpace.kTransform)
+
+            local = om.MTransformationMatrix(offset_world * constrain_world.asMatrixInverse())
+            rot = local.rotation().reorder(rotate_order)
+            if prev_rot is not None:
+                rot = rot.closestSolution(prev_rot)
+            prev_rot = rot
+            pos = local.translation(om.MSpace.kTransform)
+            for attr, value in zip(offset_attrs, [pos.x, pos.y, pos.z, rot.x, rot.y, rot.z]):
+                values[attr].append(value)
+
+        # Key offsets on every frame, holding the old values before and after the range
+        key_frames = [start - 1] + frames + [end + 1]
+        for attr in offset_attrs:
+            values[attr].append(held_offsets[attr][1])
+            anim.set_keys(attr, key_frames, values[attr], step=True)
+
+        # Key weights, target is the only active one inside the range
+        for i in range(len(target_list)):
+            weight_attr = '{}.w{}'.format(par_con, i)
+            held = held_weights.get(weight_attr, [0.0, 0.0])
+            anim.set_keys(weight_attr, [start - 1, start, end + 1], [held[0], 1.0 if i == target_id else 0.0, held[1]],
+                          step=True)
+
+        # set keyframes to green
+        cmds.keyframe([offset, par_con], tds=True)
+    finally:
+        cmds.undoInfo(closeChunk=True)
+
+    LOG.info('Baked {} into {} space from frame {} to {}'.format(source, target, start, end))
+    return space_constrain
+
+
 def get_obj_name(obj):
     idx = max(obj.rfind('|'), obj.rfind(':'))
     return obj[idx + 1:]
@@ -325,10 +431,13 @@ def add_message_attribute(src, tgts, attrName):
         if not cmds.attributeQuery(attrName, exists=True, node=src):
             cmds.addAttr(src, sn=attrName, at='message', m=True)
 
+        # Fetch connected indices once and allocate from them, instead of probing per target
+        used = get_connected_multi_indices("{}.{}".format(src, attrName))
         i = 0
         while i < len(tgts):
-            idx = get_next_free_multi_index("{}.{}".format(src, attrName), i)
+            idx = get_next_free_multi_index("{}.{}".format(src, attrName), i, used)
             cmds.connectAttr("%s.message" % (tgts[i]), "%s.%s[%s]" % (src, attrName, str(idx)), f=True)
+            used.add(idx)
             i = i + 1
 
     except RuntimeError:
@@ -355,14 +464,25 @@ def get_message_attribute_connections(src, attrName):
         raise
 
 
-def get_next_free_multi_index(attr_name, start_index):
-    '''Find the next unconnected multi index starting at the passed in index.'''
-    # assume a max of 10 million connections
-    while start_index < 10000000:
-        if len(cmds.connectionInfo('{}[{}]'.format(attr_name, start_index), sfd=True) or []) == 0:
-            return start_index
-        start_index += 1
+def get_connected_multi_indices(attr_name):
+    """Returns set of logical indices of a multi attribute that have an incoming connection
+
+    get_connected_multi_indices('box_fk_ctrl.pivot_node')
+    """
+    plug = om.MGlobal.getSelectionListByName(attr_name).getPlug(0)
+    return set(idx for idx in plug.getExistingArrayAttributeIndices()
+               if plug.elementByLogicalIndex(idx).isDestination)
+
 
-    # No connections means the first index is available
-    return 0
+def get_next_free_multi_index(attr_name, start_index, used=None):
+    '''Find the next unconnected multi index starting at the passed in index.
 
+    Pass the set from get_connected_multi_indices() as used when allocating many indices, so the
+    connections are only fetched once
+    '''
+    if used is None:
+        used = get_connected_multi_indices(attr_name)
+
+    while start_index in used:
+        start_index += 1
+    return start_index